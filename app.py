@@ -1,16 +1,18 @@
 # app.py
+import time
 
-from database import init_db
-
-init_db()
+_T0 = time.perf_counter()
 
+import os
 import sys
+from importlib import import_module
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import (
     QApplication,
     QHBoxLayout,
     QMainWindow,
+    QProgressBar,
     QPushButton,
     QStackedWidget,
     QVBoxLayout,
@@ -18,13 +20,16 @@ from PySide6.QtWidgets import (
 )
 
 from database import init_db
-from views.add_details import AddDetailsWidget  # ladu
-from views.history import HistoryWidget  # ajalugu
-from views.manage_projects import ManageProjectsWidget  # tootmisplaan
+from query_executor import executor
 
-# vaated
-from views.overview import OverviewWidget
-from views.tooted import ProductsWidget  # tooted
+# vaated – moodul imporditakse ja vaade ehitatakse esimesel avamisel
+VIEW_CLASSES = {
+    "overview": ("views.overview", "OverviewWidget"),
+    "production_plan": ("views.manage_projects", "ManageProjectsWidget"),
+    "products": ("views.tooted", "ProductsWidget"),
+    "warehouse": ("views.add_details", "AddDetailsWidget"),
+    "history": ("views.history", "HistoryWidget"),
+}
 
 
 class MainWindow(QMainWindow):
@@ -49,13 +54,7 @@ class MainWindow(QMainWindow):
         root.addWidget(self.stack, 1)
 
         # ---------- vaated ----------
-        self.views = {
-            "overview": OverviewWidget(),
-            "production_plan": ManageProjectsWidget(),
-            "products": ProductsWidget(),
-            "warehouse": AddDetailsWidget(),
-            "history": HistoryWidget(),
-        }
+        self.views = {}
 
         # ---------- nupud ----------
         buttons = [
@@ -75,24 +74,71 @@ class MainWindow(QMainWindow):
 
         nav.addStretch()
 
-        # lisa vaated pinu
-        for w in self.views.values():
-            self.stack.addWidget(w)
+        # ---------- staatusriba: taustapäringute indikaator ----------
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)  # lõputu animatsioon
+        self.busy_bar.setMaximumWidth(120)
+        self.busy_bar.setVisible(False)
+        self.statusBar().addPermanentWidget(self.busy_bar)
+        executor().busy_changed.connect(self.busy_bar.setVisible)
 
         self.show_view("overview")
 
+    def flush_pending(self, sync: bool = False):
+        # vaated, mis hoiavad muudatusi kirjutusjärjekorras
+        for w in self.views.values():
+            if hasattr(w, "flush"):
+                w.flush(sync)
+
+    def show_status_message(self, message: str, timeout: int = 3000):
+        self.statusBar().showMessage(message, timeout)
+
     # ---------- helper ----------
     def show_view(self, key: str):
-        widget = self.views[key]
+        self.flush_pending()
+        widget = self.views.get(key)
+        if widget is None:
+            module, cls = VIEW_CLASSES[key]
+            # uus vaade laeb oma andmed konstruktoris
+            widget = getattr(import_module(module), cls)()
+            self.views[key] = widget
+            self.stack.addWidget(widget)
+            self.stack.setCurrentWidget(widget)
+            return
         self.stack.setCurrentWidget(widget)
         getattr(widget, "refresh", lambda: None)()
 
 
+# ---------- käivitusaja raport (ULVARI_STARTUP_TIMING=1) ----------
+_marks: list[tuple[str, float]] = [("imports", time.perf_counter())]
+
+
+def _mark(label: str):
+    _marks.append((label, time.perf_counter()))
+
+
+def _report_startup():
+    if not os.environ.get("ULVARI_STARTUP_TIMING"):
+        return
+    prev = _T0
+    for label, t in _marks:
+        print(f"{label:<14}{(t - prev) * 1000:8.1f} ms", file=sys.stderr)
+        prev = t
+    print(f"{'total':<14}{(prev - _T0) * 1000:8.1f} ms", file=sys.stderr)
+
+
 def main():
     init_db()
+    _mark("init_db")
     app = QApplication(sys.argv)
     win = MainWindow()
+    _mark("main window")
     win.show()  # kuva aken
+    # ära sulge andmebaasi poolelioleva kirjutuse ajal
+    app.aboutToQuit.connect(lambda: win.flush_pending(sync=True))
+    app.aboutToQuit.connect(executor().wait)
+    # esimene sündmustsükli samm = aken on ekraanil
+    QTimer.singleShot(0, lambda: (_mark("first show"), _report_startup()))
     sys.exit(app.exec())
 
 
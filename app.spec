@@ -1,20 +1,35 @@
 # -*- mode: python ; coding: utf-8 -*-
-from PyInstaller.utils.hooks import collect_submodules
-
-hiddenimports = []
-hiddenimports += collect_submodules('PySide6')
+# vaated imporditakse MainWindow.show_view kaudu dünaamiliselt,
+# Alembic ainult siis, kui skeem pole ajakohane
+hiddenimports = [
+    'views.overview',
+    'views.manage_projects',
+    'views.tooted',
+    'views.add_details',
+    'views.history',
+    'alembic.command',
+    'alembic.config',
+    'logging.config',
+    'matplotlib.backends.backend_qtagg',
+]
 
 
 a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('database.py', '.'), ('logic.py', '.'), ('views', 'views')],
+    datas=[
+        ('database.py', '.'),
+        ('logic.py', '.'),
+        ('views', 'views'),
+        ('alembic.ini', '.'),
+        ('migrations', 'migrations'),
+    ],
     hiddenimports=hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['tkinter', 'PyQt5', 'PyQt6', 'PySide2'],
     noarchive=False,
     optimize=0,
 )
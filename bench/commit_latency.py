@@ -0,0 +1,61 @@
+"""Üksiku staatusemuudatuse commit-latentsus SQLite profiilide kaupa.
+
+Käivita:
+    python -m bench.commit_latency [--commits 500]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from database import SQLITE_PROFILES, make_engine
+from logic import update_project_field
+from models import Base, Project
+
+STATUS_CYCLE = ["Ootel", "Töös", "Valmis", "-"]
+
+
+def measure(profile: str, commits: int, projects: int = 1000) -> list[float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        eng = make_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", profile)
+        Base.metadata.create_all(eng)
+        Session = sessionmaker(bind=eng, future=True)
+        with Session() as db:
+            db.execute(insert(Project), [{"name": f"P{i}"} for i in range(projects)])
+            db.commit()
+
+        # same path as a status click in the production plan
+        latencies = []
+        for i in range(commits):
+            with Session() as db:
+                t0 = time.perf_counter()
+                update_project_field(
+                    db, i % projects + 1, "welding", STATUS_CYCLE[i % 4]
+                )
+                latencies.append(time.perf_counter() - t0)
+        eng.dispose()
+    return latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--commits", type=int, default=500)
+    args = ap.parse_args()
+
+    print(f"{'profile':<10}{'median ms':>12}{'p95 ms':>10}{'total s':>10}")
+    for profile in SQLITE_PROFILES:
+        lat = sorted(measure(profile, args.commits))
+        p95 = lat[int(len(lat) * 0.95) - 1]
+        print(
+            f"{profile:<10}{statistics.median(lat) * 1000:>12.2f}"
+            f"{p95 * 1000:>10.2f}{sum(lat):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
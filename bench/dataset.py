@@ -0,0 +1,354 @@
+"""Sünteetiline suure töökoja andmebaas jõudlustestide jaoks.
+
+Sama seemne ja mõõtkavaga tuleb alati sama andmebaas, nii on mõõtmised
+versioonide vahel võrreldavad.
+
+Käivita:
+    python -m bench.dataset bench.db [--scale full] [--seed 1]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+from sqlalchemy import insert
+
+from database import _packaged_head, make_engine
+from logic import STAGE_FIELDS, _bom_digest
+from models import (
+    Base,
+    BomSnapshot,
+    BomSnapshotLine,
+    Category,
+    History,
+    Material,
+    Product,
+    ProductParts,
+    Project,
+    ProjectParts,
+    ProjectStage,
+    StockMovement,
+    product_categories,
+)
+
+
+class Scale(NamedTuple):
+    materials: int
+    products: int
+    bom_lines: int  # per product
+    projects: int
+    history: int
+    categories: int = 40
+
+
+SCALES = {
+    "full": Scale(100_000, 10_000, 50, 50_000, 5_000_000),
+    "medium": Scale(10_000, 1_000, 50, 5_000, 500_000),
+    "small": Scale(1_000, 100, 20, 500, 20_000, categories=10),
+}
+EPOCH = datetime(2024, 1, 1)
+CHUNK = 20_000
+STATUSES = ["-", "Ootel", "Töös", "Valmis"]
+ACTIONS = ["Project created", "Stock deducted", "Field updated", "Import"]
+TUBE_SHARE = 0.2
+SIDES = [15, 20, 25, 30, 40, 50, 60, 80, 100]
+SUBASSEMBLY_SHARE = 0.1  # products that also use two smaller products
+OVERRIDE_SHARE = 0.05  # projects with one line of their own
+
+
+def category_name(i: int) -> str:
+    return f"Kategooria {i:03d}"
+
+
+def material_name(i: int) -> str:
+    return f"MAT-{i:06d}"
+
+
+def product_name(i: int) -> str:
+    return f"TOODE-{i:05d}"
+
+
+def _chunks(rows, size: int = CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _materials(rnd: random.Random, n: int):
+    for i in range(1, n + 1):
+        tube = rnd.random() < TUBE_SHARE
+        yield {
+            "id": i,
+            "name": material_name(i),
+            # plenty, so starting any generated project succeeds
+            "stock_qty": rnd.randint(100_000, 1_000_000),
+            "reserved_qty": 0,
+            "type": "tube" if tube else "general",
+            "material_type": rnd.choice(["steel", "aluminium", "stainless"]),
+            "tube_profile": rnd.choice(["round", "square"]) if tube else None,
+            "tube_length": 6000 if tube else None,
+            "tube_dimension": (
+                f"{rnd.choice(SIDES)}×{rnd.choice(SIDES)}×{rnd.randint(1, 5)}"
+                if tube
+                else None
+            ),
+        }
+
+
+def _bom(rnd: random.Random, scale: Scale, tubes: set[int]):
+    # {product_id: [(material_id, qty, cut_length)]}, sub-assembly links apart
+    bom, links = {}, []
+    for pid in range(1, scale.products + 1):
+        mids = rnd.sample(range(1, scale.materials + 1), scale.bom_lines)
+        bom[pid] = [
+            (
+                mid,
+                rnd.randint(1, 8),
+                rnd.randrange(200, 3000, 50) if mid in tubes else None,
+            )
+            for mid in mids
+        ]
+        # components always have a smaller id – the tree stays acyclic
+        if pid > 2 and rnd.random() < SUBASSEMBLY_SHARE:
+            for cid in rnd.sample(range(1, pid), 2):
+                links.append((pid, cid, rnd.randint(1, 4)))
+    return bom, links
+
+
+def _projects(rnd: random.Random, scale: Scale):
+    for i in range(1, scale.projects + 1):
+        pid = rnd.randint(1, scale.products)
+        row = {
+            "id": i,
+            "name": f"Projekt {i}",
+            "customer": f"Klient {rnd.randint(1, scale.projects // 10 + 1)}",
+            "order_number": f"T{i:06d}",
+            "product": product_name(pid),
+            "product_id": pid,
+            "bom_snapshot_id": pid,  # one snapshot per product
+            "quantity": rnd.randint(1, 20),
+            "deadline": EPOCH + timedelta(days=rnd.randint(0, 3 * 365)),
+        }
+        # stages run in order: done, then the current one, then waiting
+        current = rnd.randint(0, len(STAGE_FIELDS))
+        for n, stage in enumerate(STAGE_FIELDS):
+            if n < current:
+                row[stage] = "Valmis"
+            elif n == current:
+                row[stage] = rnd.choice(STATUSES[1:3])
+            else:
+                row[stage] = rnd.choice(STATUSES[:2])
+        yield row
+
+
+def generate(path, scale: str = "full", seed: int = 1, progress=print) -> Path:
+    """Write a fresh database to path; an existing file is replaced."""
+    s = SCALES[scale]
+    path = Path(path)
+    tmp = path.with_name(path.name + ".part")
+    tmp.unlink(missing_ok=True)
+    rnd = random.Random(seed)
+    eng = make_engine(f"sqlite:///{tmp}", "tuned")
+    Base.metadata.create_all(eng)
+    t0 = time.perf_counter()
+
+    def put(table, rows, label: str):
+        n = 0
+        with eng.begin() as conn:
+            for batch in _chunks(rows):
+                conn.execute(insert(table), batch)
+                n += len(batch)
+        progress(f"{label:16}{n:>10} rida  {time.perf_counter() - t0:6.1f} s")
+
+    put(
+        Category.__table__,
+        ({"id": i, "name": category_name(i)} for i in range(1, s.categories + 1)),
+        "categories",
+    )
+    materials = list(_materials(rnd, s.materials))
+    tubes = {m["id"] for m in materials if m["type"] == "tube"}
+    put(Material.__table__, materials, "materials")
+    put(
+        StockMovement.__table__,
+        (
+            {
+                "timestamp": EPOCH,
+                "material_id": m["id"],
+                "kind": "opening",
+                "on_hand_delta": m["stock_qty"],
+                "reserved_delta": 0,
+            }
+            for m in materials
+        ),
+        "stock_movements",
+    )
+    del materials
+
+    put(
+        Product.__table__,
+        (
+            {"id": i, "name": product_name(i), "production_time": rnd.randint(30, 600)}
+            for i in range(1, s.products + 1)
+        ),
+        "products",
+    )
+    put(
+        product_categories,
+        (
+            {"product_id": pid, "category_id": cid}
+            for pid in range(1, s.products + 1)
+            for cid in rnd.sample(range(1, s.categories + 1), rnd.randint(1, 3))
+        ),
+        "product_categories",
+    )
+    bom, links = _bom(rnd, s, tubes)
+    put(
+        ProductParts.__table__,
+        (
+            {
+                "product_id": pid,
+                "material_id": mid,
+                "quantity_required": qty,
+                "cut_length": cut,
+            }
+            for pid, lines in bom.items()
+            for mid, qty, cut in lines
+        ),
+        "product_parts",
+    )
+    put(
+        ProductParts.__table__,
+        (
+            {"product_id": pid, "component_id": cid, "quantity_required": qty}
+            for pid, cid, qty in links
+        ),
+        "  sub-assemblies",
+    )
+
+    # direct material lines only; enough for demand and deduction queries.
+    # Products with sub-assemblies get a new version on their first project.
+    put(
+        BomSnapshot.__table__,
+        (
+            {
+                "id": pid,
+                "product_id": pid,
+                "version": 1,
+                "digest": _bom_digest({(mid, cut): qty for mid, qty, cut in lines}),
+                "created_at": EPOCH,
+            }
+            for pid, lines in bom.items()
+        ),
+        "bom_snapshots",
+    )
+    put(
+        BomSnapshotLine.__table__,
+        (
+            {
+                "snapshot_id": pid,
+                "material_id": mid,
+                "quantity_required": qty,
+                "cut_length": cut,
+            }
+            for pid, lines in bom.items()
+            for mid, qty, cut in lines
+        ),
+        "  lines",
+    )
+
+    projects = list(_projects(rnd, s))
+    put(Project.__table__, projects, "projects")
+    put(
+        ProjectParts.__table__,
+        (
+            {
+                "project_id": p["id"],
+                "material_id": mid,
+                "quantity_required": qty * p["quantity"] + 1,
+                "cut_length": cut,
+            }
+            for p in projects
+            if rnd.random() < OVERRIDE_SHARE
+            for mid, qty, cut in bom[p["product_id"]][:1]
+        ),
+        "project_parts",
+    )
+
+    def stage_rows():
+        for p in projects:
+            start = p["deadline"] - timedelta(days=60)
+            for n, stage in enumerate(STAGE_FIELDS):
+                changed = start + timedelta(days=n * 3)
+                if p[stage] == "Valmis":
+                    # the finished in-progress interval, then the open one
+                    yield {
+                        "project_id": p["id"],
+                        "stage": stage,
+                        "status": "Töös",
+                        "changed_at": changed,
+                        "ended_at": changed + timedelta(hours=rnd.randint(1, 72)),
+                    }
+                yield {
+                    "project_id": p["id"],
+                    "stage": stage,
+                    "status": p[stage],
+                    "changed_at": changed + timedelta(days=3),
+                    "ended_at": None,
+                }
+
+    put(ProjectStage.__table__, stage_rows(), "project_stages")
+    del projects, bom
+
+    span = 3 * 365 * 24 * 3600
+    put(
+        History.__table__,
+        (
+            {
+                "timestamp": EPOCH + timedelta(seconds=rnd.randrange(span)),
+                "project_id": rnd.randint(1, s.projects),
+                "action": rnd.choice(ACTIONS),
+                "details": f"rida {i}",
+            }
+            for i in range(s.history)
+        ),
+        "history",
+    )
+    with eng.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    eng.dispose()
+    for suffix in ("-wal", "-shm"):
+        Path(str(tmp) + suffix).unlink(missing_ok=True)
+    os.replace(tmp, path)
+    return path
+
+
+def cached(scale: str = "full", seed: int = 1, progress=print) -> Path:
+    """Generated database for (scale, seed), built once per schema version."""
+    name = f"ulvari-bench-{scale}-{seed}-{_packaged_head()}.db"
+    path = Path(tempfile.gettempdir()) / name
+    if not path.exists():
+        generate(path, scale, seed, progress)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--scale", choices=list(SCALES), default="full")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    generate(args.path, args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Käivitusaegsete importide profiil (python -X importtime).
+
+Käivita:
+    python -m bench.import_profile [--module app] [--top 20]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+# "import time: self [us] | cumulative | imported package"
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile(module: str) -> list[tuple[str, int, int, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            rows.append((name, int(self_us), int(cum_us), len(indent) // 2))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total = sum(r[1] for r in rows)
+    print(f"{args.module}: {len(rows)} moodulit, kokku {total / 1000:.0f} ms")
+    # mooduli otsesed impordid – nende kumulatiivne aeg sisaldab alamaid
+    top = sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])
+    print(f"{'moodul':40} {'kumul. ms':>10} {'oma ms':>8}")
+    for name, self_us, cum_us, _ in top[: args.top]:
+        print(f"{name:40} {cum_us / 1000:10.1f} {self_us / 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""logic-funktsioonide ajad sünteetilisel töökojal ja nende trend.
+
+Iga käivitus lisab tulemuse JSON-trendifaili ja võrdleb eelmise sama
+mõõtkavaga käivitusega; aeglustumine üle lävendi märgitakse ära.
+
+Käivita:
+    python -m bench.logic_timings [--scale medium] [--repeat 5] [--check]
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from bench.dataset import SCALES, cached, category_name, product_name
+from database import make_engine
+
+TREND_FILE = Path(__file__).with_name("trend.json")
+REGRESSION_RATIO = 1.25  # median slower than this × previous run
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable  # run(db, state) – the timed part
+    setup: Callable | None = None  # setup(db, i) -> state, not timed
+    heavy: bool = False  # loads whole tables; only with --heavy
+
+
+def _cold(*tables):
+    def setup(db, i):
+        logic.invalidate_reference(*tables)
+
+    return setup
+
+
+def _product(i: int) -> int:
+    # same products every run; the smallest scale has 100
+    return i % 97 + 1
+
+
+def _new_project(db, i):
+    logic._bom_cache.clear()  # cold explosion, as after a BOM edit
+    return {"product": product_name(_product(i)), "quantity": 5}
+
+
+def _started_project(db, i):
+    return logic.create_project(
+        db, f"bench start {i}", "", [], **_new_project(db, i)
+    ).id
+
+
+def _stage_edits(db, i):
+    rows = logic.search_projects(db, limit=50, offset=i * 50)
+    return [
+        (r.id, "welding", r.welding, "Töös" if r.welding != "Töös" else "Valmis")
+        for r in rows
+    ]
+
+
+def _bom_product(db, i):
+    logic._bom_cache.clear()
+    return _product(i)
+
+
+CASES = [
+    Case("get_products", lambda db, _: logic.get_products(db), _cold("products")),
+    Case(
+        "get_products[category]",
+        lambda db, _: logic.get_products(db, [category_name(1), category_name(2)]),
+        _cold("products"),
+    ),
+    Case(
+        "get_products[category, cached]",
+        lambda db, _: logic.get_products(db, [category_name(1), category_name(2)]),
+    ),
+    Case("get_materials", lambda db, _: logic.get_materials(db), _cold("materials")),
+    Case("search_materials", lambda db, _: logic.search_materials(db, "mat 40×20")),
+    Case("explode_bom", lambda db, pid: logic.explode_bom(db, pid, 5), _bom_product),
+    Case(
+        "create_project[bom]",
+        lambda db, kw: logic.create_project(db, "bench", "", [], **kw),
+        _new_project,
+    ),
+    Case(
+        "start_project_deduct_inventory",
+        lambda db, pid: logic.start_project_deduct_inventory(db, pid),
+        _started_project,
+    ),
+    Case("update_project_fields[50]", logic.update_project_fields, _stage_edits),
+    Case("search_projects", lambda db, _: logic.search_projects(db, "Klient 1")),
+    Case(
+        "search_projects[status]",
+        lambda db, _: logic.search_projects(db, status="Töös", order_by="-quantity"),
+    ),
+    Case("project_stage_summary", lambda db, _: logic.project_stage_summary(db)),
+    Case("product_demand", lambda db, _: logic.product_demand(db)),
+    Case("projects_in_stage", lambda db, _: logic.projects_in_stage(db, "welding")),
+    Case("stage_cycle_times", lambda db, _: logic.stage_cycle_times(db)),
+    Case(
+        "material_requirements_run", lambda db, _: logic.material_requirements_run(db)
+    ),
+    Case("get_history_page", lambda db, _: logic.get_history_page(db)),
+    Case(
+        "get_history_page[action]",
+        lambda db, _: logic.get_history_page(db, action="Import"),
+    ),
+    Case("get_history", lambda db, _: logic.get_history(db), heavy=True),
+    Case("get_projects", lambda db, _: logic.get_projects(db), heavy=True),
+]
+
+
+def measure(case: Case, Session, repeat: int) -> list[float]:
+    times = []
+    for i in range(repeat):
+        with Session() as db:
+            state = case.setup(db, i) if case.setup else None
+            db.expire_all()
+            t0 = time.perf_counter()
+            case.run(db, state)
+            times.append(time.perf_counter() - t0)
+    return times
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _environment() -> dict:
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.node(),
+    }
+
+
+def _previous(trend: list[dict], scale: str) -> dict:
+    for entry in reversed(trend):
+        if entry["scale"] == scale:
+            return entry["results"]
+    return {}
+
+
+def run_suite(scale: str, repeat: int, heavy: bool = False, only=None) -> dict:
+    source = cached(scale)
+    results = {}
+    # cases write – each suite run gets its own copy of the dataset
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        shutil.copyfile(source, path)
+        eng = make_engine(f"sqlite:///{path}", "tuned")
+        Session = sessionmaker(bind=eng, autoflush=False, future=True)
+        for case in CASES:
+            if (case.heavy and not heavy) or (only and case.name not in only):
+                continue
+            times = sorted(measure(case, Session, repeat))
+            results[case.name] = {
+                "min": times[0],
+                "median": statistics.median(times),
+                "max": times[-1],
+                "runs": len(times),
+            }
+            print(f"  {case.name:36}{results[case.name]['median'] * 1000:10.1f} ms")
+        eng.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=list(SCALES), default="medium")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--trend", type=Path, default=TREND_FILE)
+    parser.add_argument(
+        "--heavy", action="store_true", help="ka täistabelite laadimine"
+    )
+    parser.add_argument("--case", action="append", help="ainult see juhtum")
+    parser.add_argument(
+        "--check", action="store_true", help="aeglustumisel lõpeta koodiga 1"
+    )
+    args = parser.parse_args()
+
+    print(f"mõõtkava {args.scale}, {args.repeat} kordust")
+    results = run_suite(args.scale, args.repeat, args.heavy, args.case)
+
+    trend = json.loads(args.trend.read_text()) if args.trend.exists() else []
+    before = _previous(trend, args.scale)
+    slower = []
+    print(f"\n{'funktsioon':36}{'mediaan ms':>12}{'eelmine ms':>12}{'suhe':>8}")
+    for name, r in results.items():
+        prev = before.get(name, {}).get("median")
+        ratio = r["median"] / prev if prev else None
+        mark = ""
+        if ratio and ratio > REGRESSION_RATIO:
+            slower.append(name)
+            mark = "  AEGLASEM"
+        print(
+            f"{name:36}{r['median'] * 1000:12.1f}"
+            f"{prev * 1000 if prev else float('nan'):12.1f}"
+            f"{ratio or float('nan'):8.2f}{mark}"
+        )
+
+    trend.append(
+        {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "scale": args.scale,
+            "repeat": args.repeat,
+            **_environment(),
+            "results": results,
+        }
+    )
+    args.trend.write_text(json.dumps(trend, indent=1) + "\n")
+    if slower and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
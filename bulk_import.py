@@ -0,0 +1,408 @@
+# bulk_import.py
+"""Bulk import of materials and BOM lines from CSV or XLSX files.
+
+Files are read as a stream and written in chunks, one transaction per chunk.
+A bad row is reported with its line number and skipped; the rest of the
+chunk still goes in.
+"""
+
+import csv
+from itertools import islice
+from pathlib import Path
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from cutlist import BAR_LENGTH
+from logic import (
+    add_history_entry,
+    invalidate_reference,
+    lock_for_write,
+    log_stock_counts,
+    would_create_cycle,
+)
+from models import Material, Product, ProductParts
+
+CHUNK_SIZE = 1000
+
+MATERIAL_COLUMNS = {
+    "name": str,
+    "stock_qty": int,
+    "type": str,
+    "material_type": str,
+    "tube_profile": str,
+    "tube_length": int,
+    "tube_quantity": int,
+    "tube_dimension": str,
+    "tube_thickness": str,
+}
+MATERIAL_TYPES = ("general", "tube")
+
+
+class RowError(NamedTuple):
+    line: int  # 1 = header
+    message: str
+
+
+class ImportResult(NamedTuple):
+    inserted: int
+    updated: int
+    errors: list[RowError]
+
+
+# ───────── readers ─────────
+def _read_csv(path: Path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            # e.g. a single column: nothing to tell the delimiter by
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        yield from reader
+
+
+def _read_xlsx(path: Path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ValueError("XLSX import needs the openpyxl package") from e
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield ["" if v is None else str(v) for v in row]
+    finally:
+        wb.close()
+
+
+def read_rows(path) -> tuple[list[str], object]:
+    # (normalized header, iterator of (line, {column: text}))
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        rows = _read_csv(path)
+    elif suffix in (".xlsx", ".xlsm"):
+        rows = _read_xlsx(path)
+    else:
+        raise ValueError(f"Unsupported file type: {suffix}")
+    header = [h.strip().lower().replace(" ", "_") for h in next(rows, [])]
+
+    def records():
+        for line, values in enumerate(rows, start=2):
+            if any(v.strip() for v in values):
+                yield line, {
+                    h: v.strip() for h, v in zip(header, values) if h and v.strip()
+                }
+
+    return header, records()
+
+
+def _chunks(records, size: int):
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+def _upsert(db: Session, table):
+    name = db.get_bind().dialect.name
+    if name == "sqlite":
+        return sqlite.insert(table)
+    if name == "postgresql":
+        return postgresql.insert(table)
+    raise ValueError(f"Bulk upsert is not supported on {name}")
+
+
+# ───────── materials ─────────
+def _material_row(rec: dict) -> dict:
+    row = {}
+    for col, conv in MATERIAL_COLUMNS.items():
+        if col in rec:
+            try:
+                row[col] = conv(rec[col]) if conv is str else int(float(rec[col]))
+            except ValueError:
+                raise ValueError(f"{col}: not a number: {rec[col]!r}") from None
+    if not row.get("name"):
+        raise ValueError("name missing")
+    if row.get("type", "general") not in MATERIAL_TYPES:
+        raise ValueError(f"type must be one of {', '.join(MATERIAL_TYPES)}")
+    if "material_type" in row:
+        row["material_type"] = row["material_type"].lower()
+    if "tube_profile" in row:
+        row["tube_profile"] = row["tube_profile"].lower()
+    return row
+
+
+def _log_stock_counts(db: Session, rows: dict, existing: dict):
+    # file quantities are counts: the ledger gets the difference.
+    # existing: name -> (id, stock_qty before the write)
+    counted = {n: r["stock_qty"] for n, r in rows.items() if r["stock_qty"] is not None}
+    if not counted:
+        return
+    ids = dict(
+        db.execute(
+            select(Material.name, Material.id).where(Material.name.in_(list(counted)))
+        ).all()
+    )
+    log_stock_counts(
+        db,
+        {ids[n]: qty for n, qty in counted.items()},
+        {mid: stock for mid, stock in existing.values()},
+    )
+
+
+def _db_error(e: Exception) -> str:
+    # the driver's message, without the statement and parameters
+    return str(getattr(e, "orig", None) or e)
+
+
+def _write_chunk(db: Session, write, items: list, errors: list[RowError]):
+    # write(db, items) commits one transaction and returns (inserted,
+    # updated, rejected rows); items are tuples starting with their line. A
+    # database error does not say which row, so the items are then retried
+    # one by one and only the bad lines are rejected.
+    if not items:
+        return 0, 0
+    try:
+        results = [write(db, items)]
+    except Exception:
+        db.rollback()
+        results = []
+        for item in items:
+            try:
+                results.append(write(db, [item]))
+            except Exception as e:
+                db.rollback()
+                errors.append(RowError(item[0], _db_error(e)))
+    for _, _, rejected in results:
+        errors.extend(rejected)
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def _write_materials(db: Session, stmt, columns: list[str], items: list):
+    rows = {row["name"]: row for _, row in items}
+    # the counts below are deltas against this read
+    lock_for_write(db)
+    # one lookup for the whole chunk instead of a query per name
+    existing = {
+        name: (mid, stock)
+        for name, mid, stock in db.execute(
+            select(Material.name, Material.id, Material.stock_qty).where(
+                Material.name.in_(list(rows))
+            )
+        )
+    }
+    db.execute(stmt, list(rows.values()))
+    if "stock_qty" in columns:
+        _log_stock_counts(db, rows, existing)
+    db.commit()
+    return len(rows) - len(existing), len(existing), []
+
+
+def import_materials(
+    db: Session, path, chunk_size: int = CHUNK_SIZE, progress=None
+) -> ImportResult:
+    header, records = read_rows(path)
+    if "name" not in header:
+        raise ValueError("Column 'name' is required")
+    # only columns present in the file are written; the rest keep their
+    # value, and so does a blank cell
+    columns = [c for c in MATERIAL_COLUMNS if c in header]
+    mat = Material.__table__
+    stmt = _upsert(db, mat)
+    if len(columns) > 1:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={
+                c: func.coalesce(stmt.excluded[c], mat.c[c])
+                for c in columns
+                if c != "name"
+            },
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing()
+
+    inserted = updated = done = 0
+    errors: list[RowError] = []
+    for chunk in _chunks(records, chunk_size):
+        rows: dict[str, tuple[int, dict]] = {}  # last occurrence of a name wins
+        for line, rec in chunk:
+            try:
+                row = _material_row(rec)
+            except ValueError as e:
+                errors.append(RowError(line, str(e)))
+                continue
+            rows[row["name"]] = (line, {c: row.get(c) for c in columns})
+        new, changed = _write_chunk(
+            db,
+            lambda db, batch: _write_materials(db, stmt, columns, batch),
+            list(rows.values()),
+            errors,
+        )
+        inserted += new
+        updated += changed
+        done += len(chunk)
+        if progress:
+            progress(done)
+
+    errors.sort()  # retried lines are reported after the rest of their chunk
+    invalidate_reference("materials")
+    add_history_entry(
+        db, "Import", f"Materials {Path(path).name}: +{inserted}, ~{updated}"
+    )
+    return ImportResult(inserted, updated, errors)
+
+
+# ───────── BOM ─────────
+# BOM file columns: product, material or component (a product name),
+# quantity, cut_length
+def _bom_row(rec: dict, products: dict, materials: dict) -> dict:
+    pid = products.get(rec.get("product"))
+    if pid is None:
+        raise ValueError(f"unknown product {rec.get('product')!r}")
+    if ("material" in rec) == ("component" in rec):
+        raise ValueError("give either material or component")
+    try:
+        qty = int(float(rec.get("quantity", 1)))
+        cut = int(float(rec["cut_length"])) if "cut_length" in rec else None
+    except ValueError:
+        raise ValueError("quantity and cut_length must be numbers") from None
+    if qty <= 0:
+        raise ValueError("quantity must be positive")
+    if cut is not None and cut <= 0:
+        raise ValueError("cut_length must be positive")
+    row = {
+        "product_id": pid,
+        "material_id": None,
+        "component_id": None,
+        "quantity_required": qty,
+        "cut_length": cut,
+    }
+    if "material" in rec:
+        if rec["material"] not in materials:
+            raise ValueError(f"unknown material {rec['material']!r}")
+        row["material_id"], bar = materials[rec["material"]]
+        bar = bar or BAR_LENGTH
+        # a cut longer than the bar breaks every cut plan using the line
+        if cut is not None and cut > bar:
+            raise ValueError(f"cut_length {cut} mm does not fit a {bar} mm bar")
+    else:
+        row["component_id"] = products.get(rec["component"])
+        if row["component_id"] is None:
+            raise ValueError(f"unknown component {rec['component']!r}")
+        row["cut_length"] = None
+    return row
+
+
+def _line_key(row: dict) -> tuple:
+    return (
+        row["product_id"],
+        row["material_id"],
+        row["component_id"],
+        row["cut_length"],
+    )
+
+
+def _write_bom(db: Session, update_qty, items: list):
+    parts = ProductParts.__table__
+    updates = [params for _, kind, params in items if kind == "update"]
+    inserts = [row for _, kind, row in items if kind == "insert"]
+    if updates:
+        db.execute(update_qty, updates)
+    if inserts:
+        db.execute(insert(parts), inserts)
+    # new sub-assembly links one by one – each may close a cycle
+    rejected, linked = [], 0
+    for line, kind, row in items:
+        if kind != "component":
+            continue
+        pid, cid = row["product_id"], row["component_id"]
+        if would_create_cycle(db, pid, cid):
+            rejected.append(RowError(line, "component would create a cycle"))
+            continue
+        db.execute(insert(parts), row)
+        linked += 1
+    db.commit()
+    return len(inserts) + linked, len(updates), rejected
+
+
+def import_bom(
+    db: Session, path, chunk_size: int = CHUNK_SIZE, progress=None
+) -> ImportResult:
+    # quantities in the file replace the stored ones
+    header, records = read_rows(path)
+    if "product" not in header or not {"material", "component"} & set(header):
+        raise ValueError("Columns 'product' and 'material' or 'component' are required")
+    parts = ProductParts.__table__
+    update_qty = (
+        update(parts)
+        .where(parts.c.id == bindparam("part_id"))
+        .values(quantity_required=bindparam("qty"))
+    )
+
+    inserted = updated = done = 0
+    errors: list[RowError] = []
+    for chunk in _chunks(records, chunk_size):
+        names = {r.get(k) for _, r in chunk for k in ("product", "component")}
+        products = dict(
+            db.execute(
+                select(Product.name, Product.id).where(Product.name.in_(names))
+            ).all()
+        )
+        mat_names = {r.get("material") for _, r in chunk}
+        materials = {
+            name: (mid, bar)
+            for name, mid, bar in db.execute(
+                select(Material.name, Material.id, Material.tube_length).where(
+                    Material.name.in_(mat_names)
+                )
+            )
+        }
+        lines: dict[tuple, tuple[int, dict]] = {}
+        for line, rec in chunk:
+            try:
+                row = _bom_row(rec, products, materials)
+            except ValueError as e:
+                errors.append(RowError(line, str(e)))
+                continue
+            lines[_line_key(row)] = (line, row)
+        if not lines:
+            done += len(chunk)
+            continue
+
+        pids = {k[0] for k in lines}
+        existing = {
+            (pid, mid, cid, cut): part_id
+            for part_id, pid, mid, cid, cut in db.execute(
+                select(
+                    parts.c.id,
+                    parts.c.product_id,
+                    parts.c.material_id,
+                    parts.c.component_id,
+                    parts.c.cut_length,
+                ).where(parts.c.product_id.in_(pids))
+            )
+        }
+        items = []
+        for key, (line, row) in lines.items():
+            if key in existing:
+                params = {"part_id": existing[key], "qty": row["quantity_required"]}
+                items.append((line, "update", params))
+            elif row["component_id"] is not None:
+                items.append((line, "component", row))
+            else:
+                items.append((line, "insert", row))
+        new, changed = _write_chunk(
+            db, lambda db, batch: _write_bom(db, update_qty, batch), items, errors
+        )
+        inserted += new
+        updated += changed
+        done += len(chunk)
+        if progress:
+            progress(done)
+
+    add_history_entry(db, "Import", f"BOM {Path(path).name}: +{inserted}, ~{updated}")
+    errors.sort()  # cycle and retried lines come after the rest of their chunk
+    return ImportResult(inserted, updated, errors)
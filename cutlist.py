@@ -0,0 +1,147 @@
+# cutlist.py
+"""Tube cut lists: packing cut lengths into stock bars (1-D bin packing)."""
+
+import time
+from collections import Counter
+from itertools import islice
+from typing import NamedTuple
+
+BAR_LENGTH = 6000  # mm
+MAX_EXACT_BARS = 400
+MAX_FILLINGS = 500  # candidate fillings tried per bar
+
+
+class CutPlan(NamedTuple):
+    bar_length: int
+    bars: list[list[int]]  # cuts per bar, longest first
+    waste: int  # mm, all bars
+    optimal: bool  # bar count proven minimal
+
+
+def _check(cuts, bar_length):
+    for c in cuts:
+        if c <= 0 or c > bar_length:
+            raise ValueError(f"Cut of {c} mm does not fit a {bar_length} mm bar")
+
+
+def _plan(bars, bar_length, kerf, optimal):
+    waste = sum(bar_length - sum(b) - kerf * (len(b) - 1) for b in bars)
+    return CutPlan(bar_length, bars, waste, optimal)
+
+
+def first_fit_decreasing(
+    cuts: list[int], bar_length: int = BAR_LENGTH, kerf: int = 0
+) -> list[list[int]]:
+    _check(cuts, bar_length)
+    # every piece carries one kerf; the last one on a bar does not need it
+    cap = bar_length + kerf
+    free: list[int] = []
+    bars: list[list[int]] = []
+    for length, count in sorted(Counter(cuts).items(), reverse=True):
+        size = length + kerf
+        i = 0  # equal pieces never fit bars an earlier one skipped
+        for _ in range(count):
+            while i < len(free) and free[i] < size:
+                i += 1
+            if i == len(free):
+                free.append(cap)
+                bars.append([])
+            free[i] -= size
+            bars[i].append(length)
+    return bars
+
+
+def _lower_bound(counts, sizes, cap):
+    return -(-sum(n * s for n, s in zip(counts, sizes)) // cap)
+
+
+def _branch_and_bound(cuts, bar_length, kerf, best, deadline):
+    # bin completion: each new bar holds the longest remaining piece and is
+    # filled with maximal combinations of the rest, bounded by L1
+    cap = bar_length + kerf
+    types = sorted(Counter(cuts).items(), reverse=True)
+    lengths = [t[0] for t in types]
+    sizes = [t[0] + kerf for t in types]
+    counts = [t[1] for t in types]
+    best_bars = best
+    # truncated: a bar's fillings were capped, so the search is not a proof
+    state = {"timeout": False, "truncated": False}
+
+    def fillings(start, room, counts, current):
+        # combinations of piece types >= start that leave no room for more;
+        # lazy, longest pieces first, and it stops at the deadline too
+        if time.monotonic() > deadline:
+            state["timeout"] = True
+            return
+        extended = False
+        for k in range(start, len(sizes)):
+            if counts[k] and sizes[k] <= room:
+                counts[k] -= 1
+                current.append(k)
+                yield from fillings(k, room - sizes[k], counts, current)
+                current.pop()
+                counts[k] += 1
+                extended = True
+        if not extended:
+            yield list(current)
+
+    def search(counts, used):
+        nonlocal best_bars
+        if time.monotonic() > deadline:
+            state["timeout"] = True
+            return
+        if not any(counts):
+            if len(used) < len(best_bars):
+                best_bars = [list(b) for b in used]
+            return
+        if len(used) + _lower_bound(counts, sizes, cap) >= len(best_bars):
+            return
+        first = next(k for k, n in enumerate(counts) if n)
+        counts[first] -= 1
+        # fullest of the first MAX_FILLINGS first, so a good incumbent is
+        # found early
+        options = list(
+            islice(
+                fillings(first, cap - sizes[first], counts, [first]),
+                MAX_FILLINGS + 1,
+            )
+        )
+        if len(options) > MAX_FILLINGS:
+            state["truncated"] = True
+            del options[MAX_FILLINGS:]
+        options.sort(key=lambda fill: -sum(sizes[k] for k in fill))
+        for fill in options:
+            for k in fill[1:]:
+                counts[k] -= 1
+            used.append([lengths[k] for k in fill])
+            search(counts, used)
+            used.pop()
+            for k in fill[1:]:
+                counts[k] += 1
+            if state["timeout"]:
+                break
+        counts[first] += 1
+
+    search(counts, [])
+    return best_bars, not (state["timeout"] or state["truncated"])
+
+
+def optimize_cuts(
+    cuts: list[int],
+    bar_length: int = BAR_LENGTH,
+    kerf: int = 0,
+    exact: bool = False,
+    time_budget: float = 2.0,
+) -> CutPlan:
+    if not cuts:
+        return CutPlan(bar_length, [], 0, True)
+    bars = first_fit_decreasing(cuts, bar_length, kerf)
+    sizes = [c + kerf for c in cuts]
+    lb = -(-sum(sizes) // (bar_length + kerf))
+    # search depth grows with the bar count; huge batches keep FFD
+    if len(bars) == lb or not exact or len(bars) > MAX_EXACT_BARS:
+        return _plan(bars, bar_length, kerf, len(bars) == lb)
+    bars, optimal = _branch_and_bound(
+        cuts, bar_length, kerf, bars, time.monotonic() + time_budget
+    )
+    return _plan(bars, bar_length, kerf, optimal or len(bars) == lb)
@@ -1,24 +1,91 @@
 # database.py
+import os
+import re
 from pathlib import Path
 
-from alembic import command
-from alembic.config import Config
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 
 from models import Base
 
-DATABASE_URL = "sqlite:///./warehouse.db"
+DATABASE_URL = os.environ.get("ULVARI_DB_URL", "sqlite:///./warehouse.db")
 
-engine = create_engine(DATABASE_URL, future=True)
+# PRAGMA sets applied to every new SQLite connection
+SQLITE_PROFILES = {
+    # SQLite defaults (rollback journal, synchronous=FULL) – for comparison
+    "default": {},
+    "tuned": {
+        # readers no longer block the writer and vice versa
+        "journal_mode": "WAL",
+        # WAL + NORMAL: fsync at checkpoints only, still crash-safe
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # KiB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+        # wait for a competing writer instead of "database is locked"
+        "busy_timeout": 5000,  # ms
+    },
+}
+DB_PROFILE = os.environ.get("ULVARI_DB_PROFILE", "tuned")
+
+
+def make_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    eng = create_engine(url, future=True)
+    pragmas = SQLITE_PROFILES[profile]
+    if eng.dialect.name == "sqlite" and pragmas:
+
+        @event.listens_for(eng, "connect")
+        def _apply_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            for name, value in pragmas.items():
+                cur.execute(f"PRAGMA {name}={value}")
+            cur.close()
+
+    return eng
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 
+MIGRATIONS_DIR = Path(__file__).with_name("migrations") / "versions"
+_REV_RE = re.compile(r"^(revision|down_revision)\b.*?=\s*['\"]?(\w+)", re.M)
+
+
+def _packaged_head() -> str | None:
+    # read revision ids straight from the scripts – no Alembic import
+    revs, downs = set(), set()
+    for path in MIGRATIONS_DIR.glob("*.py"):
+        for kind, rev in _REV_RE.findall(path.read_text(encoding="utf-8")):
+            (revs if kind == "revision" else downs).add(rev)
+    heads = revs - downs
+    return heads.pop() if len(heads) == 1 else None
+
+
+def _current_revision() -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+    except OperationalError:
+        return None
+
+
 def _run_migrations() -> None:
+    # Alembic loads its config and the migration environment – only on demand
+    from alembic import command
+    from alembic.config import Config
+
     cfg = Config(str(Path(__file__).with_name("alembic.ini")))
+    cfg.set_main_option("script_location", str(MIGRATIONS_DIR.parent))
     cfg.set_main_option("sqlalchemy.url", DATABASE_URL)
     command.upgrade(cfg, "head")
 
 
 def init_db() -> None:
-    _run_migrations()
+    head = _packaged_head()
+    if head is None or _current_revision() != head:
+        _run_migrations()
@@ -0,0 +1,161 @@
+# export.py
+"""Streaming export of projects, history and stock to CSV, JSONL or Parquet.
+
+Rows are fetched in batches through a streaming cursor and written as they
+arrive, so memory stays flat however large the table is.
+
+    python export.py history history-2024-05.csv --since 2024-05-01 --until 2024-06-01
+"""
+
+import csv
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import DateTime, Integer, select
+from sqlalchemy.orm import Session
+
+from models import History, Material, Project
+
+BATCH_SIZE = 5000
+FORMATS = ("csv", "jsonl", "parquet")
+DATASETS = {
+    "projects": Project.__table__,
+    "history": History.__table__,
+    "stock": Material.__table__,
+}
+
+
+def _query(dataset: str, since=None, until=None):
+    table = DATASETS.get(dataset)
+    if table is None:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    q = select(table)
+    if dataset == "history":
+        # [since, until) – same range semantics as get_history_page
+        if since is not None:
+            q = q.where(table.c.timestamp >= since)
+        if until is not None:
+            q = q.where(table.c.timestamp < until)
+        return q.order_by(table.c.timestamp, table.c.id)
+    if since is not None or until is not None:
+        raise ValueError("Date range applies to history only")
+    return q.order_by(table.c.id)
+
+
+def _text(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value
+
+
+# ───────── writers ─────────
+# each takes (path, columns) and returns (write(rows), close())
+def _csv_writer(path, columns):
+    f = open(path, "w", newline="", encoding="utf-8")
+    w = csv.writer(f)
+    w.writerow([c.name for c in columns])
+
+    def write(rows):
+        w.writerows([_text(v) for v in r] for r in rows)
+
+    return write, f.close
+
+
+def _jsonl_writer(path, columns):
+    f = open(path, "w", encoding="utf-8")
+    names = [c.name for c in columns]
+
+    def write(rows):
+        f.writelines(
+            json.dumps(dict(zip(names, map(_text, r))), ensure_ascii=False) + "\n"
+            for r in rows
+        )
+
+    return write, f.close
+
+
+def _parquet_writer(path, columns):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("Parquet export needs the pyarrow package") from e
+
+    def arrow_type(col):
+        # from the column type, not the data – a batch of NULLs stays typed
+        if isinstance(col.type, Integer):
+            return pa.int64()
+        if isinstance(col.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    schema = pa.schema([(c.name, arrow_type(c)) for c in columns])
+    writer = pq.ParquetWriter(path, schema)
+
+    def write(rows):
+        cols = list(zip(*rows))
+        writer.write_table(pa.Table.from_arrays(list(cols), schema=schema))
+
+    return write, writer.close
+
+
+_WRITERS = {"csv": _csv_writer, "jsonl": _jsonl_writer, "parquet": _parquet_writer}
+
+
+def export(
+    db: Session,
+    dataset: str,
+    path,
+    fmt: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    progress=None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    path = Path(path)
+    fmt = fmt or path.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    q = _query(dataset, since, until)
+    write, close = _WRITERS[fmt](path, list(q.selected_columns))
+    done = 0
+    try:
+        result = db.execute(q.execution_options(yield_per=batch_size))
+        for batch in result.partitions():
+            write(batch)
+            done += len(batch)
+            if progress:
+                progress(done)
+    finally:
+        close()
+    return done
+
+
+def _day(text: str) -> datetime:
+    return datetime.combine(date.fromisoformat(text), datetime.min.time())
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from database import SessionLocal
+
+    p = argparse.ArgumentParser()
+    p.add_argument("dataset", choices=list(DATASETS))
+    p.add_argument("path")
+    p.add_argument("--format", choices=FORMATS)
+    p.add_argument("--since", type=_day, help="YYYY-MM-DD, inclusive")
+    p.add_argument("--until", type=_day, help="YYYY-MM-DD, exclusive")
+    args = p.parse_args()
+
+    with SessionLocal() as db:
+        n = export(
+            db,
+            args.dataset,
+            args.path,
+            args.format,
+            args.since,
+            args.until,
+            progress=lambda done: print(f"\r{done} rows", end="", file=sys.stderr),
+        )
+    print(f"\r{n} rows → {args.path}")
@@ -1,9 +1,29 @@
+import hashlib
+import re
 from datetime import datetime
+from typing import NamedTuple
 
-from sqlalchemy import select
+from sqlalchemy import (
+    and_,
+    bindparam,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    text,
+    union_all,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 
+from cutlist import BAR_LENGTH, CutPlan, first_fit_decreasing, optimize_cuts
 from models import (
+    BomSnapshot,
+    BomSnapshotLine,
     Category,
     History,
     Material,
@@ -11,12 +31,110 @@ from models import (
     ProductParts,
     Project,
     ProjectParts,
+    ProjectStage,
+    ReferenceVersion,
+    StockMovement,
+    product_categories,
 )
 
 
+# ───────── reference cache ─────────
+# Materials, products and categories are read on every view switch but
+# change rarely. Readers get immutable snapshots stamped with two versions:
+# this process's counter, bumped after each commit here, and the table's
+# row in reference_versions, which triggers bump on any client's write.
+class CategoryRec(NamedTuple):
+    id: int
+    name: str
+
+
+class ProductRec(NamedTuple):
+    id: int
+    name: str
+    description: str | None
+    note: str | None
+    production_time: int | None
+    categories: tuple[str, ...]
+
+
+class MaterialRec(NamedTuple):
+    id: int
+    name: str
+    stock_qty: int | None
+    reserved_qty: int
+    type: str | None
+    material_type: str | None
+    tube_profile: str | None
+    tube_length: int | None
+    tube_quantity: int | None
+    tube_dimension: str | None
+    tube_thickness: str | None
+
+    @property
+    def available(self) -> int:
+        return (self.stock_qty or 0) - self.reserved_qty
+
+
+_ref_version = {"categories": 0, "products": 0, "materials": 0}
+_ref_cache: dict[str, tuple[tuple, tuple]] = {}
+
+
+def invalidate_reference(*tables: str):
+    for t in tables:
+        _ref_version[t] += 1
+
+
+def _cached(db: Session, table: str, load) -> tuple:
+    version = (
+        _ref_version[table],
+        db.execute(
+            select(ReferenceVersion.version).where(ReferenceVersion.name == table)
+        ).scalar(),
+    )
+    hit = _ref_cache.get(table)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    data = load()
+    # stamped with the version read before loading: a write that raced the
+    # load makes the next call reload
+    _ref_cache[table] = (version, data)
+    return data
+
+
+def _load_categories(db: Session) -> tuple[CategoryRec, ...]:
+    rows = db.execute(select(Category.id, Category.name).order_by(Category.id))
+    return tuple(CategoryRec(*r) for r in rows)
+
+
+def _load_products(db: Session) -> tuple[ProductRec, ...]:
+    cats: dict[int, list[str]] = {}
+    for pid, name in db.execute(
+        select(product_categories.c.product_id, Category.name)
+        .join(Category, Category.id == product_categories.c.category_id)
+        .order_by(Category.name)
+    ):
+        cats.setdefault(pid, []).append(name)
+    rows = db.execute(
+        select(
+            Product.id,
+            Product.name,
+            Product.description,
+            Product.note,
+            Product.production_time,
+        ).order_by(Product.id)
+    )
+    return tuple(ProductRec(*r, tuple(cats.get(r[0], ()))) for r in rows)
+
+
+def _load_materials(db: Session) -> tuple[MaterialRec, ...]:
+    cols = [Material.__table__.c[f] for f in MaterialRec._fields]
+    rows = db.execute(select(*cols).order_by(Material.id))
+    return tuple(MaterialRec(*r) for r in rows)
+
+
 # ───────── categories ─────────
-def get_categories(db: Session):
-    return db.execute(select(Category)).scalars().all()
+def get_categories(db: Session) -> tuple[CategoryRec, ...]:
+    return _cached(db, "categories", lambda: _load_categories(db))
 
 
 def create_category(db: Session, name: str):
@@ -27,29 +145,38 @@ def create_category(db: Session, name: str):
     db.add(cat)
     db.commit()
     db.refresh(cat)
+    invalidate_reference("categories")
     return cat
 
 
 def assign_product_categories(db: Session, product: Product, names: list[str]):
-    product.categories.clear()
-    for nm in names:
-        cat = db.execute(select(Category).filter_by(name=nm)).scalar_one_or_none()
-        if not cat:
-            cat = Category(name=nm)
-            db.add(cat)
-            db.flush()
-        product.categories.append(cat)
+    names = list(dict.fromkeys(names))
+    # one lookup for all names, new categories created in one flush
+    found = {
+        c.name: c
+        for c in db.execute(select(Category).where(Category.name.in_(names))).scalars()
+    }
+    missing = [Category(name=nm) for nm in names if nm not in found]
+    if missing:
+        db.add_all(missing)
+        db.flush()
+        found.update((c.name, c) for c in missing)
+    product.categories = [found[nm] for nm in names]
     db.commit()
     db.refresh(product)
+    invalidate_reference("categories", "products")
     return product
 
 
 # ───────── products ─────────
-def get_products(db: Session, category_names: list[str] | None = None):
-    q = db.query(Product).options(joinedload(Product.categories))
+def get_products(
+    db: Session, category_names: list[str] | None = None
+) -> tuple[ProductRec, ...]:
+    products = _cached(db, "products", lambda: _load_products(db))
     if category_names:
-        q = q.join(Product.categories).filter(Category.name.in_(category_names))
-    return q.all()
+        wanted = set(category_names)
+        return tuple(p for p in products if wanted.intersection(p.categories))
+    return products
 
 
 def create_product(
@@ -68,6 +195,7 @@ def create_product(
     db.add(p)
     db.commit()
     db.refresh(p)
+    invalidate_reference("products")
     return p
 
 
@@ -82,36 +210,85 @@ def update_product(
     p = db.query(Product).filter_by(id=pid).first()
     if not p:
         return None
+    if p.name != name:
+        # projects keep the name for display and search – rename them along
+        db.execute(
+            update(Project).where(Project.product_id == pid).values(product=name)
+        )
     p.name = name
     p.description = description
     p.note = note
     p.production_time = production_time
     db.commit()
     db.refresh(p)
+    invalidate_reference("products")
     return p
 
 
 def delete_product(db: Session, pid: int):
     p = db.query(Product).filter_by(id=pid).first()
     if p:
+        # drop it from other products' sub-assemblies too
+        for pp in db.query(ProductParts).filter_by(component_id=pid).all():
+            db.delete(pp)
+        # projects keep the product name and their snapshot, the link goes
+        db.execute(
+            update(Project).where(Project.product_id == pid).values(product_id=None)
+        )
+        db.execute(
+            update(BomSnapshot)
+            .where(BomSnapshot.product_id == pid)
+            .values(product_id=None)
+        )
         db.delete(p)
         db.commit()
+        invalidate_reference("products")
 
 
 # ───────── product BOM ─────────
 def get_product_parts(db: Session, product_id: int):
     return (
         db.query(ProductParts)
-        .options(joinedload(ProductParts.material))
+        .options(joinedload(ProductParts.material), joinedload(ProductParts.component))
         .filter_by(product_id=product_id)
         .all()
     )
 
 
-def add_material_to_product(db: Session, product_id: int, material_id: int, qty: int):
+def _check_cuts(db: Session, cuts: dict[int, set[int]]):
+    # material_id -> cut lengths. A cut must fit the material's bar, or the
+    # cut plan of every project using the line fails later.
+    cuts = {mid: lengths for mid, lengths in cuts.items() if lengths}
+    if any(min(lengths) <= 0 for lengths in cuts.values()):
+        raise ValueError("Cut lengths must be positive")
+    if not cuts:
+        return
+    for mid, name, bar in db.execute(
+        select(Material.id, Material.name, Material.tube_length).where(
+            Material.id.in_(list(cuts))
+        )
+    ):
+        bar = bar or BAR_LENGTH
+        if max(cuts[mid]) > bar:
+            raise ValueError(
+                f"Cut of {max(cuts[mid])} mm does not fit a {bar} mm bar of {name}"
+            )
+
+
+def add_material_to_product(
+    db: Session,
+    product_id: int,
+    material_id: int,
+    qty: int,
+    cut_length: int | None = None,
+):
+    if cut_length is not None:
+        _check_cuts(db, {material_id: {cut_length}})
     row = (
         db.query(ProductParts)
-        .filter_by(product_id=product_id, material_id=material_id)
+        .filter_by(
+            product_id=product_id, material_id=material_id, cut_length=cut_length
+        )
         .first()
     )
     if row:
@@ -122,6 +299,33 @@ def add_material_to_product(db: Session, product_id: int, material_id: int, qty:
                 product_id=product_id,
                 material_id=material_id,
                 quantity_required=qty,
+                cut_length=cut_length,
+            )
+        )
+    db.commit()
+
+
+def would_create_cycle(db: Session, product_id: int, component_id: int) -> bool:
+    # the component, or something under it, is the product itself
+    return component_id == product_id or product_id in _bom_subtree(db, component_id)
+
+
+def add_component_to_product(db: Session, product_id: int, component_id: int, qty: int):
+    if would_create_cycle(db, product_id, component_id):
+        raise ValueError("Component would create a cycle in the BOM")
+    row = (
+        db.query(ProductParts)
+        .filter_by(product_id=product_id, component_id=component_id)
+        .first()
+    )
+    if row:
+        row.quantity_required += qty
+    else:
+        db.add(
+            ProductParts(
+                product_id=product_id,
+                component_id=component_id,
+                quantity_required=qty,
             )
         )
     db.commit()
@@ -134,9 +338,327 @@ def remove_material_from_product(db: Session, part_id: int):
         db.commit()
 
 
+class BomLine(NamedTuple):
+    # exactly one of material_id / component_id
+    material_id: int | None
+    component_id: int | None
+    quantity: int
+    cut_length: int | None = None
+
+    @property
+    def key(self) -> tuple:
+        return (self.material_id, self.component_id, self.cut_length)
+
+
+class BomChanges(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+
+
+def replace_product_bom(db: Session, product_id: int, lines) -> BomChanges:
+    """Make the product's BOM exactly `lines`, in one transaction.
+
+    Only the difference to the stored BOM is written; lines with the same
+    material, component and cut length are added up.
+    """
+    wanted: dict[tuple, int] = {}
+    for ln in lines:
+        if (ln.material_id is None) == (ln.component_id is None):
+            raise ValueError("A BOM line needs either a material or a component")
+        if ln.quantity <= 0:
+            raise ValueError("BOM quantities must be positive")
+        if ln.component_id is not None and ln.cut_length:
+            raise ValueError("Only material lines have a cut length")
+        wanted[ln.key] = wanted.get(ln.key, 0) + ln.quantity
+    cuts: dict[int, set[int]] = {}
+    for mid, _, cut in wanted:
+        if cut is not None:
+            cuts.setdefault(mid, set()).add(cut)
+    _check_cuts(db, cuts)
+
+    parts = ProductParts.__table__
+    existing: dict[tuple, tuple[int, int]] = {}
+    stale = []
+    for part_id, mid, cid, cut, qty in db.execute(
+        select(
+            parts.c.id,
+            parts.c.material_id,
+            parts.c.component_id,
+            parts.c.cut_length,
+            parts.c.quantity_required,
+        ).where(parts.c.product_id == product_id)
+    ):
+        if (mid, cid, cut) in existing:
+            stale.append(part_id)  # duplicate from older data
+        else:
+            existing[(mid, cid, cut)] = (part_id, qty)
+
+    # only new sub-assembly links can close a cycle
+    for mid, cid, cut in wanted.keys() - existing.keys():
+        if cid is not None and would_create_cycle(db, product_id, cid):
+            raise ValueError("Component would create a cycle in the BOM")
+
+    deleted = stale + [pid for k, (pid, _) in existing.items() if k not in wanted]
+    updates = [
+        {"part_id": existing[k][0], "qty": qty}
+        for k, qty in wanted.items()
+        if k in existing and existing[k][1] != qty
+    ]
+    inserts = [
+        {
+            "product_id": product_id,
+            "material_id": mid,
+            "component_id": cid,
+            "quantity_required": qty,
+            "cut_length": cut,
+        }
+        for (mid, cid, cut), qty in wanted.items()
+        if (mid, cid, cut) not in existing
+    ]
+    if deleted:
+        db.execute(delete(parts).where(parts.c.id.in_(deleted)))
+    if updates:
+        db.execute(
+            update(parts)
+            .where(parts.c.id == bindparam("part_id"))
+            .values(quantity_required=bindparam("qty")),
+            updates,
+        )
+    if inserts:
+        db.execute(insert(parts), inserts)
+    db.commit()
+    return BomChanges(len(inserts), len(updates), len(deleted))
+
+
+# ───────── BOM explosion ─────────
+# product_id -> {(material_id, cut_length): qty per unit}; sub-assemblies
+# are shared. Stamped with the product_parts counter in reference_versions:
+# a BOM edit by any client empties it on the next read.
+_bom_cache: dict[int, dict[tuple, int]] = {}
+_bom_version: int | None = None
+
+
+def _bom_tree_cte(product_id: int):
+    tree = select(literal(product_id).label("pid")).cte("bom_tree", recursive=True)
+    return tree.union(
+        select(ProductParts.component_id)
+        .join(tree, ProductParts.product_id == tree.c.pid)
+        .where(ProductParts.component_id.is_not(None))
+    )
+
+
+def _bom_subtree(db: Session, product_id: int) -> set[int]:
+    tree = _bom_tree_cte(product_id)
+    return set(db.execute(select(tree.c.pid)).scalars())
+
+
+def _bom_children(db: Session, product_id: int) -> dict[int, list]:
+    # whole subtree in one recursive query
+    tree = _bom_tree_cte(product_id)
+    rows = db.execute(
+        select(
+            ProductParts.product_id,
+            ProductParts.material_id,
+            ProductParts.component_id,
+            ProductParts.cut_length,
+            ProductParts.quantity_required,
+        ).where(ProductParts.product_id.in_(select(tree.c.pid)))
+    ).all()
+    children: dict[int, list] = {}
+    for pid, mid, cid, cut, qty in rows:
+        children.setdefault(pid, []).append((mid, cid, cut, qty or 0))
+    return children
+
+
+def _roll_up(pid: int, children: dict, path: set) -> dict[tuple, int]:
+    flat = _bom_cache.get(pid)
+    if flat is not None:
+        return flat
+    if pid in path:
+        raise ValueError("BOM contains a cycle")
+    path.add(pid)
+    flat = {}
+    for mid, cid, cut, qty in children.get(pid, ()):
+        if cid is not None:
+            for key, q in _roll_up(cid, children, path).items():
+                flat[key] = flat.get(key, 0) + q * qty
+        elif mid is not None:
+            flat[mid, cut] = flat.get((mid, cut), 0) + qty
+    path.discard(pid)
+    _bom_cache[pid] = flat
+    return flat
+
+
+def explode_bom(db: Session, product_id: int, quantity: int = 1) -> dict[tuple, int]:
+    global _bom_version
+    version = db.execute(
+        select(ReferenceVersion.version).where(ReferenceVersion.name == "product_parts")
+    ).scalar()
+    if version != _bom_version:
+        # read before the lines: an edit racing the load makes the next call
+        # start over
+        _bom_cache.clear()
+        _bom_version = version
+    flat = _bom_cache.get(product_id)
+    if flat is None:
+        # one query for the subtree, roll-up in memory
+        flat = _roll_up(product_id, _bom_children(db, product_id), set())
+    return {key: q * quantity for key, q in flat.items()}
+
+
+def bom_lines(exploded: dict[tuple, int]) -> list[dict]:
+    return [
+        {"material_id": mid, "cut_length": cut, "quantity_required": qty}
+        for (mid, cut), qty in exploded.items()
+    ]
+
+
+# ───────── BOM snapshots ─────────
+# Projects reference an immutable per-unit snapshot of the exploded BOM
+# instead of a copy of its lines. The digest stands for the product
+# revision: an unchanged BOM reuses the latest snapshot, an edited one gets
+# the next version, and projects already ordered keep theirs.
+def _bom_digest(flat: dict[tuple, int]) -> str:
+    # cut_length may be None – sort it before any length
+    items = sorted(
+        (mid, cut is not None, cut or 0, qty) for (mid, cut), qty in flat.items()
+    )
+    return hashlib.sha1(repr(items).encode()).hexdigest()
+
+
+def _latest_snapshots(db: Session, product_ids) -> dict[int, tuple]:
+    # product_id -> (id, version, digest) of its newest snapshot
+    latest = (
+        select(BomSnapshot.product_id, func.max(BomSnapshot.version).label("version"))
+        .where(BomSnapshot.product_id.in_(product_ids))
+        .group_by(BomSnapshot.product_id)
+        .subquery()
+    )
+    return {
+        pid: (sid, version, digest)
+        for pid, sid, version, digest in db.execute(
+            select(
+                BomSnapshot.product_id,
+                BomSnapshot.id,
+                BomSnapshot.version,
+                BomSnapshot.digest,
+            ).join(
+                latest,
+                and_(
+                    latest.c.product_id == BomSnapshot.product_id,
+                    latest.c.version == BomSnapshot.version,
+                ),
+            )
+        )
+    }
+
+
+def _bom_snapshots(db: Session, product_ids) -> dict[int, int]:
+    # product_id -> snapshot of its current BOM; products without lines are
+    # left out. No commit – runs inside the caller's transaction, under the
+    # write lock so the version lookup and the insert are not interleaved
+    # with another client's.
+    lock_for_write(db)
+    # under the lock the cache's stamp is current: no other client can
+    # change a BOM between the check and the snapshot
+    flats = {pid: explode_bom(db, pid) for pid in set(product_ids)}
+    flats = {pid: flat for pid, flat in flats.items() if flat}
+    found = {}
+    snapshots = BomSnapshot.__table__
+    while flats:
+        current = _latest_snapshots(db, list(flats))
+        new = []
+        now = datetime.now()
+        for pid, flat in flats.items():
+            digest = _bom_digest(flat)
+            sid, version, stored = current.get(pid, (None, 0, None))
+            if stored == digest:
+                found[pid] = sid
+            else:
+                new.append(
+                    {
+                        "product_id": pid,
+                        "version": version + 1,
+                        "digest": digest,
+                        "created_at": now,
+                    }
+                )
+        if not new:
+            break
+        try:
+            with db.begin_nested():
+                inserted = dict(
+                    db.execute(
+                        insert(snapshots).returning(
+                            snapshots.c.product_id, snapshots.c.id
+                        ),
+                        new,
+                    ).all()
+                )
+        except IntegrityError:
+            # another writer took the version first: compare against theirs
+            flats = {pid: flats[pid] for pid in flats if pid not in found}
+            continue
+        db.execute(
+            insert(BomSnapshotLine.__table__),
+            [
+                {"snapshot_id": sid, **line}
+                for pid, sid in inserted.items()
+                for line in bom_lines(flats[pid])
+            ],
+        )
+        found.update(inserted)
+        break
+    return found
+
+
 # ────────────── MATERIALS ──────────────
-def get_materials(db: Session):
-    return db.query(Material).all()
+def get_materials(db: Session) -> tuple[MaterialRec, ...]:
+    return _cached(db, "materials", lambda: _load_materials(db))
+
+
+# full-text search over materials_fts (name, dimension, thickness, profile,
+# material type); bm25 weights in that column order
+_FTS_WEIGHTS = "10.0, 5.0, 2.0, 1.0, 1.0"
+_TOKEN_RE = re.compile(r"\w+")
+_DIMENSION_RE = re.compile(r"\d+(?:x\d+)+")
+
+
+def _fts_query(query: str) -> str:
+    # every word must match, as a prefix from two characters on (a lone "m"
+    # would match the whole catalogue); "40x20" also matches "40×20", which
+    # the tokenizer splits into 40 and 20
+    terms = []
+    for tok in _TOKEN_RE.findall(query.lower()):
+        term = f'"{tok}"*' if len(tok) > 1 else f'"{tok}"'
+        if _DIMENSION_RE.fullmatch(tok):
+            parts = [f'"{p}"' for p in tok.split("x")]
+            parts[-1] += "*"
+            term = f"({term} OR ({' AND '.join(parts)}))"
+        terms.append(term)
+    return " AND ".join(terms)
+
+
+def search_materials(
+    db: Session, query: str, limit: int = 50
+) -> tuple[MaterialRec, ...]:
+    """Materials matching every word of query, best match first."""
+    match = _fts_query(query)
+    if not match:
+        return ()
+    cols = ", ".join(f"m.{f}" for f in MaterialRec._fields)
+    rows = db.execute(
+        text(
+            f"SELECT {cols} FROM materials_fts "
+            "JOIN materials m ON m.id = materials_fts.rowid "
+            "WHERE materials_fts MATCH :match "
+            f"ORDER BY bm25(materials_fts, {_FTS_WEIGHTS}), m.name "
+            "LIMIT :limit"
+        ),
+        {"match": match, "limit": limit},
+    )
+    return tuple(MaterialRec(*r) for r in rows)
 
 
 def get_material_by_name(db: Session, name: str):
@@ -167,8 +689,51 @@ def create_material(
         tube_thickness=tube_thickness,
     )
     db.add(m)
+    db.flush()
+    _log_movements(db, [_movement(m.id, "receipt", on_hand=stock_qty or 0)])
     db.commit()
     db.refresh(m)
+    invalidate_reference("materials")
+    return m
+
+
+MATERIAL_DETAIL_FIELDS = (
+    "stock_qty",
+    "tube_length",
+    "tube_quantity",
+    "tube_dimension",
+    "tube_thickness",
+    "tube_profile",
+    "material_type",
+)
+
+
+def _set_material_fields(db: Session, material_id: int, fields: dict):
+    lock_for_write(db)
+    m = (
+        db.query(Material)
+        .filter_by(id=material_id)
+        .populate_existing()
+        .with_for_update()
+        .first()
+    )
+    if not m:
+        db.rollback()
+        raise ValueError("Material not found")
+
+    stock_qty = fields.pop("stock_qty", None)
+    if stock_qty is not None and stock_qty != m.stock_qty:
+        # a count correction against the balance read under the write lock
+        _log_movements(
+            db, [_movement(m.id, "adjust", on_hand=stock_qty - (m.stock_qty or 0))]
+        )
+        m.stock_qty = stock_qty
+    for name, value in fields.items():
+        setattr(m, name, value)
+
+    db.commit()
+    db.refresh(m)
+    invalidate_reference("materials")
     return m
 
 
@@ -183,59 +748,234 @@ def update_material_details(
     tube_profile: str | None = None,
     material_type: str | None = None,
 ):
-    m = db.query(Material).filter_by(id=material_id).first()
-    if not m:
-        raise ValueError("Material not found")
+    return _set_material_fields(
+        db,
+        material_id,
+        {
+            "stock_qty": stock_qty,
+            "tube_length": tube_length,
+            "tube_quantity": tube_quantity,
+            "tube_dimension": tube_dimension,
+            "tube_thickness": tube_thickness,
+            "tube_profile": tube_profile,
+            "material_type": material_type,
+        },
+    )
 
-    if stock_qty is not None:
-        m.stock_qty = stock_qty
-    m.tube_length = tube_length
-    m.tube_quantity = tube_quantity
-    m.tube_dimension = tube_dimension
-    m.tube_thickness = tube_thickness
-    m.tube_profile = tube_profile
-    m.material_type = material_type
 
-    db.commit()
-    db.refresh(m)
-    return m
+def update_material_field(db: Session, material_id: int, field: str, value):
+    """Write a single detail column and leave the others as stored.
+
+    Stock is only touched when ``field`` is ``stock_qty``; the new count is
+    then booked as an adjustment against the balance read under the lock.
+    """
+    if field not in MATERIAL_DETAIL_FIELDS:
+        raise ValueError(f"Unknown material field: {field}")
+    return _set_material_fields(db, material_id, {field: value})
 
 
 def delete_material(db: Session, material_id: int):
     m = db.query(Material).filter_by(id=material_id).first()
     if m:
+        in_use = (
+            db.execute(
+                select(ProductParts.id).filter_by(material_id=material_id).limit(1)
+            ).first()
+            or db.execute(
+                select(ProjectParts.id).filter_by(material_id=material_id).limit(1)
+            ).first()
+            or db.execute(
+                select(BomSnapshotLine.id).filter_by(material_id=material_id).limit(1)
+            ).first()
+        )
+        if in_use:
+            raise ValueError(f"Material {m.name} is used in a BOM or project")
+        db.execute(
+            delete(StockMovement).where(StockMovement.material_id == material_id)
+        )
         db.delete(m)
         db.commit()
+        invalidate_reference("materials")
+    return m
 
 
 # ────────────── PROJECTS ──────────────
 def get_projects(db: Session):
-    return db.query(Project).all()
+    return db.query(Project).options(joinedload(Project.product_ref)).all()
 
 
-def get_project_parts(db: Session, project_id: int):
-    return db.query(ProjectParts).filter_by(project_id=project_id).all()
+STAGE_FIELDS = [
+    "afterone",
+    "cutting",
+    "laser",
+    "bending",
+    "drilling",
+    "welding",
+    "grinding",
+    "coating",
+    "delivered",
+]
+PLAN_FIELDS = [
+    "delivery",
+    "customer",
+    "order_number",
+    "product",
+    "notes",
+    "quantity",
+    *STAGE_FIELDS,
+]
+
+
+def search_projects(
+    db: Session,
+    term: str = "",
+    status: str | None = None,
+    limit: int = 200,
+    offset: int = 0,
+    order_by: str = "id",
+):
+    # plain (id, *PLAN_FIELDS) rows; order_by is a PLAN_FIELDS name or "id",
+    # prefixed with "-" for descending
+    q = select(Project.id, *(getattr(Project, f) for f in PLAN_FIELDS))
+    term = term.strip()
+    if term:
+        q = q.where(
+            or_(
+                Project.customer.icontains(term, autoescape=True),
+                Project.product.icontains(term, autoescape=True),
+            )
+        )
+    if status:
+        q = q.where(or_(*(getattr(Project, f) == status for f in STAGE_FIELDS)))
+
+    desc = order_by.startswith("-")
+    name = order_by.lstrip("-")
+    if name != "id" and name not in PLAN_FIELDS:
+        raise ValueError(f"Cannot order by {name}")
+    col = getattr(Project, name)
+    q = q.order_by(col.desc() if desc else col, Project.id)
+    return db.execute(q.limit(limit).offset(offset)).all()
+
+
+def _requirements(*where):
+    """Project lines as a subquery: project_id, material_id, cut_length,
+    quantity_required.
+
+    Override lines (project_parts) count as stored, a 0 override hides its
+    line; the BOM snapshot fills in the rest, per unit × Project.quantity at
+    read time. where filters the projects table.
+    """
+    projects, parts = Project.__table__, ProjectParts.__table__
+    snap, own = BomSnapshotLine.__table__, ProjectParts.__table__.alias("own")
+    overrides = (
+        select(
+            parts.c.project_id,
+            parts.c.material_id,
+            parts.c.cut_length,
+            parts.c.quantity_required,
+        )
+        .join(projects, projects.c.id == parts.c.project_id)
+        .where(*where, parts.c.quantity_required != 0)
+    )
+    units = func.coalesce(func.nullif(projects.c.quantity, 0), 1)  # quantity or 1
+    overridden = (
+        select(own.c.id)
+        .where(
+            own.c.project_id == projects.c.id,
+            own.c.material_id == snap.c.material_id,
+            own.c.cut_length.is_not_distinct_from(snap.c.cut_length),
+        )
+        .exists()
+    )
+    from_snapshot = (
+        select(
+            projects.c.id,
+            snap.c.material_id,
+            snap.c.cut_length,
+            snap.c.quantity_required * units,
+        )
+        .join(snap, snap.c.snapshot_id == projects.c.bom_snapshot_id)
+        .where(*where, ~overridden)
+    )
+    return union_all(overrides, from_snapshot).subquery("requirements")
+
+
+class ProjectLine(NamedTuple):
+    material: Material
+    cut_length: int | None
+    quantity_required: int  # for the whole project
+
+
+def get_project_parts(db: Session, project_id: int) -> list[ProjectLine]:
+    req = _requirements(Project.id == project_id)
+    rows = db.execute(
+        select(Material, req.c.cut_length, func.sum(req.c.quantity_required))
+        .join(req, req.c.material_id == Material.id)
+        .group_by(req.c.material_id, req.c.cut_length)
+        .order_by(Material.id, req.c.cut_length)
+    ).all()
+    return [ProjectLine(*row) for row in rows]
 
 
 def ensure_project_has_parts(db: Session, project: Project):
-    if not project or get_project_parts(db, project.id):
+    # projects from before snapshots, or whose product got its BOM later:
+    # link the current snapshot, no lines are copied
+    if not project or project.bom_snapshot_id or project.product_id is None:
         return
-    if not project.product:
+    if db.execute(
+        select(ProjectParts.id).filter_by(project_id=project.id).limit(1)
+    ).first():
         return
-    prod = db.query(Product).filter_by(name=project.product).first()
-    if not prod:
+    sid = _bom_snapshots(db, [project.product_id]).get(project.product_id)
+    if sid is None:
         return
-    prod_parts = get_product_parts(db, prod.id)
-    multiplier = project.quantity or 1
-    for pp in prod_parts:
+    project.bom_snapshot_id = sid
+    db.commit()
+
+
+def set_project_line(
+    db: Session,
+    project_id: int,
+    material_id: int,
+    quantity: int,
+    cut_length: int | None = None,
+):
+    """Override one material line of a project; quantity is for the whole
+    project and replaces the snapshot line with the same material and cut.
+    Quantity 0 drops the line from this project."""
+    if quantity < 0:
+        raise ValueError("Quantity cannot be negative")
+    if cut_length is not None:
+        _check_cuts(db, {material_id: {cut_length}})
+    project = db.get(Project, project_id)
+    if project is None:
+        raise ValueError(f"Project {project_id} does not exist")
+    # link the snapshot first: once the project has lines of its own,
+    # ensure_project_has_parts no longer does
+    ensure_project_has_parts(db, project)
+    lock_for_write(db)
+    row = db.execute(
+        select(ProjectParts).where(
+            ProjectParts.project_id == project_id,
+            ProjectParts.material_id == material_id,
+            ProjectParts.cut_length.is_not_distinct_from(cut_length),
+        )
+    ).scalar_one_or_none()
+    if row:
+        row.quantity_required = quantity
+    else:
         db.add(
             ProjectParts(
-                project_id=project.id,
-                material_id=pp.material_id,
-                quantity_required=pp.quantity_required * multiplier,
+                project_id=project_id,
+                material_id=material_id,
+                quantity_required=quantity,
+                cut_length=cut_length,
             )
         )
+    db.flush()
+    _refresh_reservations(db, [project_id])
     db.commit()
+    invalidate_reference("materials")  # reserved_qty
 
 
 def create_project(
@@ -245,88 +985,977 @@ def create_project(
     parts: list[dict],
     **extra,
 ):
-    p = Project(name=name, description=description, **extra)
-    db.add(p)
-    db.commit()
-    db.refresh(p)
-
-    qty_multiplier = extra.get("quantity", 1)
+    (pid,) = create_projects_bulk(
+        db, [{"name": name, "description": description, "parts": parts, **extra}]
+    )
+    return db.get(Project, pid)
 
-    if not parts:
-        prod_name = extra.get("product")
-        if prod_name:
-            prod = db.query(Product).filter_by(name=prod_name).first()
-            if prod:
-                prod_parts = get_product_parts(db, prod.id)
-                parts = [
-                    {
-                        "material_id": pp.material_id,
-                        "quantity_required": pp.quantity_required * qty_multiplier,
-                    }
-                    for pp in prod_parts
-                ]
 
-    for prt in parts:
-        db.add(
-            ProjectParts(
-                project_id=p.id,
-                material_id=prt["material_id"],
-                quantity_required=prt["quantity_required"],
-            )
+def _resolve_products(db: Session, orders: list[dict]):
+    # product_id is the link, product the name shown in the plan; an order
+    # may give either. All of them in one IN query.
+    ids = {o["product_id"] for o in orders if o.get("product_id") is not None}
+    names = {o["product"] for o in orders if o.get("product")}
+    if not ids and not names:
+        return
+    found = db.execute(
+        select(Product.id, Product.name).where(
+            or_(Product.id.in_(ids), Product.name.in_(names))
         )
+    ).all()
+    by_id, by_name = dict(found), {n: i for i, n in found}
+    for line, o in enumerate(orders, 1):
+        pid = o.get("product_id")
+        if pid is not None:
+            if pid not in by_id:
+                raise ValueError(f"Order line {line}: unknown product id {pid}")
+            o.setdefault("product", by_id[pid])
+        elif o.get("product"):
+            # a name without a product would give a project with no BOM and
+            # no reservation
+            if o["product"] not in by_name:
+                raise ValueError(f"Order line {line}: unknown product {o['product']!r}")
+            o["product_id"] = by_name[o["product"]]
+
+
+def create_projects_bulk(db: Session, orders: list[dict]) -> list[int]:
+    """Create one project per order in a single transaction; returns ids.
+
+    An order holds create_project's fields; without "parts" the project
+    references its product's BOM snapshot, so it costs one row whatever the
+    BOM size. Given "parts" are stored as the project's own lines. Stage
+    intervals and stock reservations are written in the same transaction,
+    in order sequence.
+    """
+    orders = [dict(o) for o in orders]
+    if not orders:
+        return []
+    _resolve_products(db, orders)
+    cols = Project.__table__.c
+    parts_of = [o.pop("parts", None) for o in orders]
+    unknown = set().union(*orders) - set(cols.keys())
+    if unknown:
+        raise ValueError(f"Unknown project fields: {', '.join(sorted(unknown))}")
+    by_bom = [o for o, parts in zip(orders, parts_of) if not parts]
+    snapshots = _bom_snapshots(
+        db, [o["product_id"] for o in by_bom if o.get("product_id") is not None]
+    )
+    for o in by_bom:
+        if o.get("product_id") in snapshots:
+            o.setdefault("bom_snapshot_id", snapshots[o["product_id"]])
+    # executemany wants the same keys in every row; absent ones get the
+    # column default, as a single insert would
+    keys = set().union(*orders)
+    rows = [
+        {
+            k: o[k] if k in o else cols[k].default.arg if cols[k].default else None
+            for k in keys
+        }
+        for o in orders
+    ]
+    # one multi-row INSERT … RETURNING (Core: the ORM bulk path splits rows
+    # by NULL pattern). SQLite hands out rowids ascending within a statement,
+    # so sorted ids line up with the rows. The insert also takes the write
+    # lock, keeping the availability read by the reservations stable.
+    projects = Project.__table__
+    ids = sorted(db.execute(insert(projects).returning(projects.c.id), rows).scalars())
+
+    lines = [
+        {
+            "project_id": pid,
+            "material_id": prt["material_id"],
+            "quantity_required": prt["quantity_required"],
+            "cut_length": prt.get("cut_length"),
+        }
+        for pid, parts in zip(ids, parts_of)
+        for prt in parts or ()
+    ]
+    if lines:
+        db.execute(insert(ProjectParts.__table__), lines)
+    _open_stages(db, [{"id": pid, **row} for pid, row in zip(ids, rows)])
+    _reserve_stock(db, ids)
     db.commit()
-    return p
+    invalidate_reference("materials")  # reserved_qty
+    return ids
 
 
 def update_project_field(db: Session, project_id: int, field: str, value):
     p = db.query(Project).filter_by(id=project_id).first()
     if not p:
         return None
+    if field in STAGE_FIELDS and getattr(p, field) != value:
+        _record_stage(db, project_id, field, value)
+    changed = getattr(p, field) != value
     setattr(p, field, value)
+    if field == "product":
+        p.product_id = db.execute(
+            select(Product.id).where(Product.name == value)
+        ).scalar()
+    if changed and field in RESERVATION_FIELDS:
+        db.flush()
+        if field == "product":
+            _relink_snapshots(db, [project_id])
+        _refresh_reservations(db, [project_id])
     db.commit()
+    if changed and field in RESERVATION_FIELDS:
+        invalidate_reference("materials")  # reserved_qty
     db.refresh(p)
     return p
 
 
+class FieldConflict(NamedTuple):
+    project_id: int
+    field: str
+    expected: object  # value the edit was based on
+    current: object  # value found in the database (None if project is gone)
+
+
+def update_project_fields(db: Session, edits) -> list[FieldConflict]:
+    # edits: (project_id, field, expected, value); one transaction for the lot.
+    # A cell changed by someone else since it was read is left untouched.
+    projects = Project.__table__
+    conflicts = []
+    now = datetime.now()
+    rereserve, relink = [], []
+    for pid, field, expected, value in edits:
+        if field not in PLAN_FIELDS:
+            raise ValueError(f"Unknown project field: {field}")
+        col = projects.c[field]
+        values = {field: value}
+        if field == "product":  # keep the link in step with the name
+            values["product_id"] = (
+                select(Product.id).where(Product.name == value).scalar_subquery()
+            )
+        res = db.execute(
+            update(projects)
+            .where(projects.c.id == pid, col.is_not_distinct_from(expected))
+            .values(values)
+        )
+        if res.rowcount == 0:
+            current = db.execute(select(col).where(projects.c.id == pid)).scalar()
+            if current != value:
+                conflicts.append(FieldConflict(pid, field, expected, current))
+        elif value != expected:
+            if field in STAGE_FIELDS:
+                _record_stage(db, pid, field, value, now)
+            if field in RESERVATION_FIELDS:
+                rereserve.append(pid)
+            if field == "product":
+                relink.append(pid)
+    if relink:
+        _relink_snapshots(db, relink)
+    if rereserve:
+        _refresh_reservations(db, list(dict.fromkeys(rereserve)))
+    db.commit()
+    if rereserve:
+        invalidate_reference("materials")  # reserved_qty
+    return conflicts
+
+
+def _relink_snapshots(db: Session, project_ids: list[int]):
+    # product changed: projects on a BOM snapshot follow the new product's;
+    # projects with lines of their own only keep those
+    rows = db.execute(
+        select(Project.id, Project.product_id).where(
+            Project.id.in_(project_ids), Project.bom_snapshot_id.is_not(None)
+        )
+    ).all()
+    if not rows:
+        return
+    snapshots = _bom_snapshots(db, [prod for _, prod in rows if prod is not None])
+    projects = Project.__table__
+    db.execute(
+        update(projects)
+        .where(projects.c.id == bindparam("pid"))
+        .values(bom_snapshot_id=bindparam("sid")),
+        [{"pid": pid, "sid": snapshots.get(prod)} for pid, prod in rows],
+    )
+
+
 def delete_project(db: Session, project_id: int):
     p = db.query(Project).filter_by(id=project_id).first()
     if p:
+        # history outlives the project, stage timings do not
+        db.execute(
+            update(History)
+            .where(History.project_id == project_id)
+            .values(project_id=None)
+        )
+        db.execute(delete(ProjectStage).where(ProjectStage.project_id == project_id))
+        _release_stock(db, [project_id])
+        db.execute(
+            update(StockMovement)
+            .where(StockMovement.project_id == project_id)
+            .values(project_id=None)
+        )
         db.delete(p)
         db.commit()
+        invalidate_reference("materials")  # released reservations
+
+
+# ────────────── OVERVIEW ──────────────
+WAIT_VALUES = ("-", "Ootel")
+PROGRESS_VALUE = "Töös"
+DONE_VALUE = "Valmis"
+
+
+class StageSummary(NamedTuple):
+    total: int
+    delivered: int
+    in_progress: int
+    waiting: int
+    # in STAGE_FIELDS[:-1] order: (waiting, in progress, done)
+    stages: tuple[tuple[int, int, int], ...]
+
+
+def project_stage_summary(db: Session) -> StageSummary:
+    # one pass over projects; delivered overrides every stage flag
+    delivered = Project.delivered == DONE_VALUE
+    open_ = or_(Project.delivered.is_(None), Project.delivered != DONE_VALUE)
+    stages = [getattr(Project, f) for f in STAGE_FIELDS[:-1]]
+
+    def count(cond):
+        return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+    cols = [
+        func.count(Project.id),
+        count(delivered),
+        count(and_(open_, or_(*(s == PROGRESS_VALUE for s in stages)))),
+        count(and_(open_, *(s.in_(WAIT_VALUES) for s in stages))),
+    ]
+    for s in stages:
+        cols += [
+            count(and_(open_, s.in_(WAIT_VALUES))),
+            count(and_(open_, s == PROGRESS_VALUE)),
+            count(or_(delivered, s == DONE_VALUE)),
+        ]
+    row = db.execute(select(*cols)).one()
+    return StageSummary(
+        *row[:4],
+        tuple(tuple(row[i : i + 3]) for i in range(4, len(row), 3)),
+    )
+
+
+class ProductDemand(NamedTuple):
+    product_id: int
+    product_name: str
+    open_projects: int
+    quantity: int
+
+
+def product_demand(db: Session) -> list[ProductDemand]:
+    # open orders per product, over the indexed product_id join
+    open_ = or_(Project.delivered.is_(None), Project.delivered != DONE_VALUE)
+    qty = func.coalesce(func.sum(func.coalesce(Project.quantity, 1)), 0)
+    rows = db.execute(
+        select(Product.id, Product.name, func.count(Project.id), qty)
+        .join(Project, Project.product_id == Product.id)
+        .where(open_)
+        .group_by(Product.id, Product.name)
+        .order_by(qty.desc())
+    )
+    return [ProductDemand(*r) for r in rows]
+
+
+# ────────────── STAGE TRACKING ──────────────
+# project_stages keeps one row per status interval of a stage; the row with
+# no ended_at is the current status. Written next to the stage columns.
+def _open_stages(db: Session, projects: list[dict]):
+    # projects: {"id": ..., stage: status, ...}; a missing stage is "-"
+    now = datetime.now()
+    db.execute(
+        insert(ProjectStage),
+        [
+            {
+                "project_id": p["id"],
+                "stage": stage,
+                "status": p.get(stage) or "-",
+                "changed_at": now,
+            }
+            for p in projects
+            for stage in STAGE_FIELDS
+        ],
+    )
+
+
+def _record_stage(
+    db: Session, project_id: int, stage: str, status, now: datetime | None = None
+):
+    now = now or datetime.now()
+    stages = ProjectStage.__table__
+    db.execute(
+        update(stages)
+        .where(
+            stages.c.project_id == project_id,
+            stages.c.stage == stage,
+            stages.c.ended_at.is_(None),
+        )
+        .values(ended_at=now)
+    )
+    db.execute(
+        insert(stages).values(
+            project_id=project_id, stage=stage, status=status or "-", changed_at=now
+        )
+    )
+
+
+class StageEntry(NamedTuple):
+    project_id: int
+    project_name: str
+    status: str
+    since: datetime | None  # None: status predates tracking
+
+
+def projects_in_stage(
+    db: Session, stage: str, status: str = PROGRESS_VALUE
+) -> list[StageEntry]:
+    # e.g. everything currently in welding, longest waiting first
+    if stage not in STAGE_FIELDS:
+        raise ValueError(f"Unknown stage: {stage}")
+    ps = ProjectStage
+    rows = db.execute(
+        select(ps.project_id, Project.name, ps.status, ps.changed_at)
+        .join(Project, Project.id == ps.project_id)
+        .where(ps.stage == stage, ps.status == status, ps.ended_at.is_(None))
+        .order_by(ps.changed_at.is_(None).desc(), ps.changed_at)
+    )
+    return [StageEntry(*r) for r in rows]
+
+
+class StageCycle(NamedTuple):
+    stage: str
+    samples: int
+    avg_hours: float
+    max_hours: float
+
+
+def stage_cycle_times(
+    db: Session, status: str = PROGRESS_VALUE, since: datetime | None = None
+) -> list[StageCycle]:
+    # time spent in `status` per stage, over finished intervals
+    ps = ProjectStage
+    hours = (func.julianday(ps.ended_at) - func.julianday(ps.changed_at)) * 24
+    q = (
+        select(ps.stage, func.count(), func.avg(hours), func.max(hours))
+        .where(
+            ps.status == status,
+            ps.ended_at.is_not(None),
+            ps.changed_at.is_not(None),
+        )
+        .group_by(ps.stage)
+    )
+    if since is not None:
+        q = q.where(ps.changed_at >= since)
+    found = {r[0]: StageCycle(*r) for r in db.execute(q)}
+    return [found[s] for s in STAGE_FIELDS if s in found]
+
+
+# ────────────── STOCK LEDGER ──────────────
+# Every stock change is a row in stock_movements; materials.stock_qty (on
+# hand) and materials.reserved_qty are running totals of the ledger, updated
+# in the same transaction as the rows they sum.
+def lock_for_write(db: Session):
+    # pysqlite issues BEGIN only before the first DML, so a balance read
+    # ahead of it is outside the transaction and another client can commit
+    # in between. BEGIN IMMEDIATE takes the write lock before the read.
+    conn = db.connection()
+    if (
+        conn.dialect.name == "sqlite"
+        and not conn.connection.dbapi_connection.in_transaction
+    ):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _movement(mid: int, kind: str, on_hand: int = 0, reserved: int = 0, pid=None):
+    return {
+        "timestamp": datetime.now(),
+        "material_id": mid,
+        "project_id": pid,
+        "kind": kind,
+        "on_hand_delta": on_hand,
+        "reserved_delta": reserved,
+    }
+
+
+def _log_movements(db: Session, rows: list[dict]):
+    # caller has already moved the balances
+    rows = [r for r in rows if r["on_hand_delta"] or r["reserved_delta"]]
+    if rows:
+        db.execute(insert(StockMovement), rows)
+
+
+def log_stock_counts(db: Session, counts: dict[int, int], before: dict):
+    """Book counted stock in the ledger; no commit.
+
+    counts maps material_id to the count already written to stock_qty,
+    before to the balance read under the write lock – absent for materials
+    created by the same write, which get a receipt instead of an adjustment.
+    """
+    _log_movements(
+        db,
+        [
+            _movement(
+                mid,
+                "adjust" if mid in before else "receipt",
+                qty - (before.get(mid) or 0),
+            )
+            for mid, qty in counts.items()
+        ],
+    )
+
+
+def _apply_movements(db: Session, rows: list[dict]):
+    rows = [r for r in rows if r["on_hand_delta"] or r["reserved_delta"]]
+    if not rows:
+        return
+    mat = Material.__table__
+    db.execute(
+        update(mat)
+        .where(mat.c.id == bindparam("mid"))
+        .values(
+            stock_qty=func.coalesce(mat.c.stock_qty, 0) + bindparam("dh"),
+            reserved_qty=mat.c.reserved_qty + bindparam("dr"),
+        ),
+        [
+            {
+                "mid": r["material_id"],
+                "dh": r["on_hand_delta"],
+                "dr": r["reserved_delta"],
+            }
+            for r in rows
+        ],
+    )
+    db.execute(insert(StockMovement), rows)
+
+
+def receive_stock(db: Session, material_id: int, qty: int):
+    if qty <= 0:
+        raise ValueError("Received quantity must be positive")
+    _apply_movements(db, [_movement(material_id, "receipt", on_hand=qty)])
+    db.commit()
+    invalidate_reference("materials")
+
+
+def _reservations(db: Session, project_ids: list[int]) -> dict[tuple, int]:
+    # (project_id, material_id) -> quantity still held
+    return {
+        (pid, mid): qty
+        for pid, mid, qty in db.execute(
+            select(
+                StockMovement.project_id,
+                StockMovement.material_id,
+                func.sum(StockMovement.reserved_delta),
+            )
+            .where(StockMovement.project_id.in_(project_ids))
+            .group_by(StockMovement.project_id, StockMovement.material_id)
+        )
+        if qty
+    }
+
+
+def _project_reservations(db: Session, project_id: int) -> dict[int, int]:
+    return {mid: qty for (_, mid), qty in _reservations(db, [project_id]).items()}
+
+
+def _reserve_stock(db: Session, project_ids: list[int]):
+    # claims what is free now, up to each project's need, earlier projects
+    # first; a shortfall stays visible in the MRP run. No commit – runs
+    # inside the caller's transaction.
+    oversize: dict[int, dict[int, int]] = {}
+    needs = _material_needs(db, project_ids, oversize=oversize)
+    held = _reservations(db, project_ids)
+    free: dict[int, int] = {}
+    rows = []
+    for pid in project_ids:
+        for mid, name, available, need in needs.get(pid, ()):
+            if name is None:
+                continue
+            left = free.setdefault(mid, max(available, 0))
+            qty = min(need - held.get((pid, mid), 0), left)
+            if qty > 0:
+                free[mid] -= qty
+                rows.append(_movement(mid, "reserve", reserved=qty, pid=pid))
+    _apply_movements(db, rows)
+    # a BOM line that cannot be cut is reported, not fatal: the rest of the
+    # project is reserved and the line shows in the MRP run
+    if oversize:
+        names = {mid: name for lines in needs.values() for mid, name, _, _ in lines}
+        db.execute(
+            insert(History),
+            [
+                {
+                    "timestamp": datetime.now(),
+                    "project_id": pid,
+                    "action": "Cut does not fit",
+                    "details": f"{names.get(mid) or mid}: {cut} mm",
+                }
+                for pid, bad in oversize.items()
+                for mid, cut in bad.items()
+            ],
+        )
+
+
+def reserve_project_stock(db: Session, project_id: int):
+    lock_for_write(db)  # availability is read before the first write
+    _reserve_stock(db, [project_id])
+    db.commit()
+    invalidate_reference("materials")
+
+
+def _release_stock(db: Session, project_ids: list[int]):
+    _apply_movements(
+        db,
+        [
+            _movement(mid, "release", reserved=-qty, pid=pid)
+            for (pid, mid), qty in _reservations(db, project_ids).items()
+        ],
+    )
+
+
+# plan fields that change what a project holds
+RESERVATION_FIELDS = ("quantity", "product", "delivered")
+
+
+def _refresh_reservations(db: Session, project_ids: list[int]):
+    # quantity, product or delivery changed: give back what is held and claim
+    # the current need again. Started (stock consumed) and delivered
+    # projects hold nothing. No commit.
+    _release_stock(db, project_ids)
+    started = set(
+        db.execute(
+            select(StockMovement.project_id)
+            .where(
+                StockMovement.project_id.in_(project_ids),
+                StockMovement.kind == "consume",
+            )
+            .distinct()
+        ).scalars()
+    )
+    done = set(
+        db.execute(
+            select(Project.id).where(
+                Project.id.in_(project_ids), Project.delivered == DONE_VALUE
+            )
+        ).scalars()
+    )
+    _reserve_stock(db, [pid for pid in project_ids if pid not in started | done])
+
+
+def rebuild_stock_balances(db: Session) -> int:
+    # recompute the running totals from the ledger; returns materials fixed
+    lock_for_write(db)
+    sums = (
+        select(
+            StockMovement.material_id,
+            func.sum(StockMovement.on_hand_delta).label("on_hand"),
+            func.sum(StockMovement.reserved_delta).label("reserved"),
+        )
+        .group_by(StockMovement.material_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Material.id,
+            func.coalesce(sums.c.on_hand, 0),
+            func.coalesce(sums.c.reserved, 0),
+        )
+        .outerjoin(sums, sums.c.material_id == Material.id)
+        .where(
+            or_(
+                func.coalesce(Material.stock_qty, 0)
+                != func.coalesce(sums.c.on_hand, 0),
+                Material.reserved_qty != func.coalesce(sums.c.reserved, 0),
+            )
+        )
+    ).all()
+    if rows:
+        mat = Material.__table__
+        db.execute(
+            update(mat)
+            .where(mat.c.id == bindparam("mid"))
+            .values(stock_qty=bindparam("on_hand"), reserved_qty=bindparam("reserved")),
+            [{"mid": m, "on_hand": h, "reserved": r} for m, h, r in rows],
+        )
+    db.commit()
+    invalidate_reference("materials")
+    return len(rows)
 
 
 # ────────────── STOCK DEDUCTION ──────────────
-def start_project_deduct_inventory(db: Session, project_id: int):
+def _cut_bars(
+    cuts: dict[int, list[int]], bar_lengths: dict, oversize: dict | None = None
+) -> dict[int, int]:
+    # with oversize given, pieces that do not fit their bar are left out and
+    # reported there as {material_id: longest cut} instead of raising
+    bars = {}
+    for mid, lengths in cuts.items():
+        bar = bar_lengths.get(mid) or BAR_LENGTH
+        if oversize is not None:
+            fit = [c for c in lengths if 0 < c <= bar]
+            if len(fit) < len(lengths):
+                oversize[mid] = max(lengths)
+            lengths = fit
+        bars[mid] = len(first_fit_decreasing(lengths, bar))
+    return bars
+
+
+def _material_needs(
+    db: Session, project_ids: list[int], multiplier: int = 1, oversize=None
+):
+    # one query: material rows together with each project's total demand
+    req = _requirements(Project.id.in_(project_ids))
+    rows = db.execute(
+        select(
+            req.c.project_id,
+            req.c.material_id,
+            Material.name,
+            func.coalesce(Material.stock_qty, 0) - Material.reserved_qty,
+            Material.tube_length,
+            req.c.cut_length,
+            func.sum(req.c.quantity_required),
+        )
+        .outerjoin(Material, Material.id == req.c.material_id)
+        .group_by(req.c.project_id, req.c.material_id, req.c.cut_length)
+    ).all()
+
+    needs: dict[int, dict[int, list]] = {}
+    cuts: dict[int, dict[int, list[int]]] = {}
+    bar_lengths = {}
+    for pid, mid, name, available, bar, cut, qty in rows:
+        total = (qty or 0) * multiplier
+        if cut:
+            # tube pieces: whole bars come from the cut plan below
+            cuts.setdefault(pid, {}).setdefault(mid, []).extend([cut] * total)
+            bar_lengths[mid] = bar
+            total = 0
+        need = needs.setdefault(pid, {}).setdefault(mid, [name, available, 0])
+        need[2] += total
+    for pid, project_cuts in cuts.items():
+        # oversize: {project_id: {material_id: cut}}, see _cut_bars
+        bad = None if oversize is None else {}
+        for mid, bars in _cut_bars(project_cuts, bar_lengths, bad).items():
+            needs[pid][mid][2] += bars
+        if bad:
+            oversize[pid] = bad
+    # project_id -> [(material_id, name, available = on hand - reserved, need)]
+    return {
+        pid: [(mid, name, avail, qty) for mid, (name, avail, qty) in mats.items()]
+        for pid, mats in needs.items()
+    }
+
+
+def _project_material_needs(db: Session, project_id: int, multiplier: int = 1):
+    return _material_needs(db, [project_id], multiplier).get(project_id, [])
+
+
+class StockCheck(NamedTuple):
+    material_id: int
+    material_name: str | None  # None: the material is gone
+    required: int  # whole bars for tube cut lines
+    available: int  # on hand - reserved + what this project holds
+    held: int  # this project's own reservation
+
+    @property
+    def shortage(self) -> int:
+        if self.material_name is None:
+            return self.required
+        return max(self.required - self.available, 0)
+
+
+def _stock_checks(
+    db: Session, project_id: int, multiplier: int, held: dict[int, int]
+) -> list[StockCheck]:
+    # held: the project's own reservation, it counts towards what it may take
+    return [
+        StockCheck(
+            mid, name, qty, (available or 0) + held.get(mid, 0), held.get(mid, 0)
+        )
+        for mid, name, available, qty in _project_material_needs(
+            db, project_id, multiplier
+        )
+    ]
+
+
+def project_stock_check(
+    db: Session, project_id: int, multiplier: int = 1
+) -> list[StockCheck]:
+    """Per material, what starting the project would take and what it may
+    take – the check start_project_deduct_inventory makes."""
+    ensure_project_has_parts(db, db.get(Project, project_id))
+    held = _project_reservations(db, project_id)
+    return _stock_checks(db, project_id, multiplier, held)
+
+
+def start_project_deduct_inventory(db: Session, project_id: int, multiplier: int = 1):
     project = db.query(Project).filter_by(id=project_id).first()
     ensure_project_has_parts(db, project)
+    lock_for_write(db)
 
-    parts = get_project_parts(db, project_id)
-    for prt in parts:
-        mat = db.query(Material).filter_by(id=prt.material_id).first()
-        if mat is None or mat.stock_qty < prt.quantity_required:
+    held = _project_reservations(db, project_id)
+    checks = _stock_checks(db, project_id, multiplier, held)
+    for c in checks:
+        if c.shortage:
+            db.rollback()
             raise ValueError(
-                f"Insufficient stock for {mat.name if mat else prt.material_id}"
+                f"Insufficient stock for {c.material_name or c.material_id}"
             )
 
-    for prt in parts:
-        mat = db.query(Material).filter_by(id=prt.material_id).first()
-        mat.stock_qty -= prt.quantity_required
-        db.add(
-            History(
-                project_id=project_id,
-                action="Stock deducted",
-                details=f"-{prt.quantity_required} from {mat.name}",
+    # the whole reservation goes, also what was held beyond the need now
+    # (e.g. after a quantity cut) – otherwise it would hide stock for good
+    needed = {c.material_id for c in checks}
+    rows = [
+        {"mid": c.material_id, "need": c.required, "own": c.held}
+        for c in checks
+        if c.required or c.held
+    ] + [
+        {"mid": mid, "need": 0, "own": q}
+        for mid, q in held.items()
+        if mid not in needed
+    ]
+    if rows:
+        mat = Material.__table__
+        res = db.execute(
+            update(mat)
+            .where(
+                mat.c.id == bindparam("mid"),
+                mat.c.stock_qty - mat.c.reserved_qty + bindparam("own")
+                >= bindparam("need"),
             )
+            .values(
+                stock_qty=mat.c.stock_qty - bindparam("need"),
+                reserved_qty=mat.c.reserved_qty - bindparam("own"),
+            ),
+            rows,
         )
+        # another client took the stock in the meantime
+        if res.rowcount != len(rows):
+            db.rollback()
+            raise ValueError("Insufficient stock (changed concurrently)")
+
+        _log_movements(
+            db,
+            [
+                _movement(
+                    r["mid"],
+                    "consume" if r["need"] else "release",
+                    -r["need"],
+                    -r["own"],
+                    pid=project_id,
+                )
+                for r in rows
+            ],
+        )
+        deducted = [
+            {
+                "timestamp": datetime.now(),
+                "project_id": project_id,
+                "action": "Stock deducted",
+                "details": f"-{c.required} from {c.material_name}",
+            }
+            for c in checks
+            if c.required
+        ]
+        if deducted:
+            db.execute(insert(History), deducted)
     db.commit()
+    invalidate_reference("materials")  # stock_qty, reserved_qty
     return True
 
 
+# ────────────── MATERIAL REQUIREMENTS ──────────────
+class MrpLine(NamedTuple):
+    project_id: int
+    project_name: str
+    deadline: datetime | None
+    material_id: int
+    material_name: str | None
+    required: int
+    allocated: int
+    shortage: int
+    problem: str | None = None  # e.g. a cut longer than the material's bar
+
+
+def material_requirements_run(db: Session) -> list[MrpLine]:
+    # a started project has taken its stock already (as in
+    # _refresh_reservations); counting it again would show a false shortage
+    started = select(StockMovement.project_id).where(StockMovement.kind == "consume")
+    open_project = and_(
+        or_(Project.delivered.is_(None), Project.delivered != DONE_VALUE),
+        Project.id.not_in(started),
+    )
+    projects = db.execute(
+        select(
+            Project.id,
+            Project.name,
+            Project.deadline,
+            Project.bom_snapshot_id,
+            Project.quantity,
+        )
+        .where(open_project)
+        .order_by(Project.deadline.is_(None), Project.deadline, Project.id)
+    ).all()
+    materials = {
+        mid: (name, stock or 0, bar)
+        for mid, name, stock, bar in db.execute(
+            select(Material.id, Material.name, Material.stock_qty, Material.tube_length)
+        )
+    }
+
+    # snapshot lines once per snapshot, multiplied by each project's
+    # quantity below; override lines replace theirs. Covering-index scans,
+    # plain table columns skip ORM row processing for the large result.
+    snap, own = BomSnapshotLine.__table__.c, ProjectParts.__table__.c
+    snapshot_lines: dict[int, list] = {}
+    for sid, mid, cut, qty in db.execute(
+        select(
+            snap.snapshot_id, snap.material_id, snap.cut_length, snap.quantity_required
+        ).where(
+            snap.snapshot_id.in_(select(Project.bom_snapshot_id).where(open_project))
+        )
+    ):
+        snapshot_lines.setdefault(sid, []).append((mid, cut, qty))
+    overrides: dict[int, dict[tuple, int]] = {}
+    for pid, mid, cut, qty in db.execute(
+        select(
+            own.project_id,
+            own.material_id,
+            own.cut_length,
+            func.sum(own.quantity_required),
+        )
+        .where(own.project_id.in_(select(Project.id).where(open_project)))
+        .group_by(own.project_id, own.material_id, own.cut_length)
+    ):
+        overrides.setdefault(pid, {})[mid, cut] = qty or 0
+
+    bar_lengths = {mid: m[2] for mid, m in materials.items()}
+
+    def net_demand(lines) -> tuple[dict[int, int], dict[int, int]]:
+        need, cuts, oversize = {}, {}, {}
+        for mid, cut, qty in lines:
+            if cut:
+                cuts.setdefault(mid, []).extend([cut] * qty)
+                qty = 0
+            need[mid] = need.get(mid, 0) + qty
+        for mid, bars in _cut_bars(cuts, bar_lengths, oversize).items():
+            need[mid] += bars
+        return need, oversize
+
+    # projects without overrides share the result per (snapshot, quantity)
+    shared: dict[tuple, tuple] = {}
+    available = {mid: m[1] for mid, m in materials.items()}
+    out = []
+    for pid, pname, deadline, sid, quantity in projects:
+        units = quantity or 1
+        lines = snapshot_lines.get(sid, ())
+        mine = overrides.get(pid)
+        if mine is None:
+            if (sid, units) not in shared:
+                shared[sid, units] = net_demand(
+                    (mid, cut, (qty or 0) * units) for mid, cut, qty in lines
+                )
+            demand, oversize = shared[sid, units]
+        else:
+            demand, oversize = net_demand(
+                [
+                    *(
+                        (mid, cut, (qty or 0) * units)
+                        for mid, cut, qty in lines
+                        if (mid, cut) not in mine
+                    ),
+                    *((mid, cut, qty) for (mid, cut), qty in mine.items() if qty),
+                ]
+            )
+        for mid, need in demand.items():
+            left = available.get(mid, 0)
+            take = need if need < left else left
+            available[mid] = left - take
+            mname = materials[mid][0] if mid in materials else None
+            problem = None
+            if mid in oversize:
+                bar = bar_lengths.get(mid) or BAR_LENGTH
+                problem = f"Cut of {oversize[mid]} mm does not fit a {bar} mm bar"
+            out.append(
+                MrpLine(
+                    pid, pname, deadline, mid, mname, need, take, need - take, problem
+                )
+            )
+    return out
+
+
+# ────────────── CUT LISTS ──────────────
+def project_cut_plan(
+    db: Session,
+    project_ids: list[int],
+    exact: bool = False,
+    time_budget: float = 2.0,
+    kerf: int = 0,
+) -> dict[int, CutPlan]:
+    req = _requirements(Project.id.in_(project_ids))
+    rows = db.execute(
+        select(
+            req.c.material_id,
+            Material.tube_length,
+            req.c.cut_length,
+            func.sum(req.c.quantity_required),
+        )
+        .join(Material, Material.id == req.c.material_id)
+        .where(req.c.cut_length.is_not(None))
+        .group_by(req.c.material_id, req.c.cut_length)
+    ).all()
+
+    cuts: dict[int, list[int]] = {}
+    bar_lengths = {}
+    for mid, bar, cut, qty in rows:
+        cuts.setdefault(mid, []).extend([cut] * (qty or 0))
+        bar_lengths[mid] = bar or BAR_LENGTH
+    # the time budget is shared by all materials of the run
+    budget = time_budget / max(len(cuts), 1)
+    return {
+        mid: optimize_cuts(lengths, bar_lengths[mid], kerf, exact, budget)
+        for mid, lengths in cuts.items()
+    }
+
+
 # ────────────── HISTORY ──────────────
 def get_history(db: Session):
     return db.query(History).all()
 
 
+def get_history_page(
+    db: Session,
+    limit: int = 200,
+    after: tuple[datetime, int] | None = None,
+    action: str | None = None,
+    project_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    # newest first; keyset cursor is the (timestamp, id) of the last row seen,
+    # so every page is an index range scan on ix_history_timestamp
+    q = select(
+        History.id,
+        History.timestamp,
+        History.project_id,
+        History.action,
+        History.details,
+    )
+    if after is not None:
+        ts, hid = after
+        q = q.where(
+            or_(History.timestamp < ts, and_(History.timestamp == ts, History.id < hid))
+        )
+    if action:
+        q = q.where(History.action == action)
+    if project_id is not None:
+        q = q.where(History.project_id == project_id)
+    if since is not None:
+        q = q.where(History.timestamp >= since)
+    if until is not None:
+        q = q.where(History.timestamp < until)
+    q = q.order_by(History.timestamp.desc(), History.id.desc()).limit(limit)
+    return db.execute(q).all()
+
+
 def add_history_entry(
     db: Session,
     action: str,
@@ -0,0 +1,44 @@
+"""projects: indexes for plan search and status filter
+
+Revision ID: 1d9f6a3b8e24
+Revises: e58a0b7c3f12
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "1d9f6a3b8e24"
+down_revision: Union[str, Sequence[str], None] = "e58a0b7c3f12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    "customer",
+    "product",
+    "afterone",
+    "cutting",
+    "laser",
+    "bending",
+    "drilling",
+    "welding",
+    "grinding",
+    "coating",
+    "delivered",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for col in COLUMNS:
+        op.create_index(f"ix_projects_{col}", "projects", [col])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for col in COLUMNS:
+        op.drop_index(f"ix_projects_{col}", table_name="projects")
@@ -0,0 +1,160 @@
+"""baseline schema
+
+Revision ID: 3f1a2b4c5d6e
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1a2b4c5d6e"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # olemasolevad andmebaasid loodi create_all-iga – loo ainult puuduvad tabelid
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "categories" not in existing:
+        op.create_table(
+            "categories",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("name"),
+        )
+        op.create_index("ix_categories_id", "categories", ["id"])
+
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("note", sa.String(), nullable=True),
+            sa.Column("production_time", sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("name"),
+        )
+        op.create_index("ix_products_id", "products", ["id"])
+
+    if "materials" not in existing:
+        op.create_table(
+            "materials",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("stock_qty", sa.Integer(), nullable=True),
+            sa.Column("type", sa.String(), nullable=True),
+            sa.Column("material_type", sa.String(), nullable=True),
+            sa.Column("tube_profile", sa.String(), nullable=True),
+            sa.Column("tube_length", sa.Integer(), nullable=True),
+            sa.Column("tube_quantity", sa.Integer(), nullable=True),
+            sa.Column("tube_dimension", sa.String(), nullable=True),
+            sa.Column("tube_thickness", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("name"),
+        )
+        op.create_index("ix_materials_id", "materials", ["id"])
+
+    if "projects" not in existing:
+        op.create_table(
+            "projects",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("delivery", sa.String(), nullable=True),
+            sa.Column("customer", sa.String(), nullable=True),
+            sa.Column("order_number", sa.String(), nullable=True),
+            sa.Column("product", sa.String(), nullable=True),
+            sa.Column("notes", sa.String(), nullable=True),
+            sa.Column("quantity", sa.Integer(), nullable=True),
+            sa.Column("deadline", sa.DateTime(), nullable=True),
+            *(
+                sa.Column(stage, sa.String(), nullable=True)
+                for stage in (
+                    "afterone",
+                    "cutting",
+                    "laser",
+                    "bending",
+                    "drilling",
+                    "welding",
+                    "grinding",
+                    "coating",
+                    "delivered",
+                )
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_projects_id", "projects", ["id"])
+
+    if "product_categories" not in existing:
+        op.create_table(
+            "product_categories",
+            sa.Column("product_id", sa.Integer(), nullable=False),
+            sa.Column("category_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+            sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+            sa.PrimaryKeyConstraint("product_id", "category_id"),
+        )
+
+    if "product_parts" not in existing:
+        op.create_table(
+            "product_parts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("product_id", sa.Integer(), nullable=True),
+            sa.Column("material_id", sa.Integer(), nullable=True),
+            sa.Column("quantity_required", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["material_id"], ["materials.id"]),
+            sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_product_parts_id", "product_parts", ["id"])
+
+    if "project_parts" not in existing:
+        op.create_table(
+            "project_parts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("project_id", sa.Integer(), nullable=True),
+            sa.Column("material_id", sa.Integer(), nullable=True),
+            sa.Column("quantity_required", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["material_id"], ["materials.id"]),
+            sa.ForeignKeyConstraint(["project_id"], ["projects.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_project_parts_id", "project_parts", ["id"])
+
+    if "history" not in existing:
+        op.create_table(
+            "history",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("timestamp", sa.DateTime(), nullable=True),
+            sa.Column("project_id", sa.Integer(), nullable=True),
+            sa.Column("action", sa.String(), nullable=False),
+            sa.Column("details", sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(["project_id"], ["projects.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_history_id", "history", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in (
+        "history",
+        "project_parts",
+        "product_parts",
+        "product_categories",
+        "projects",
+        "materials",
+        "products",
+        "categories",
+    ):
+        op.drop_table(table)
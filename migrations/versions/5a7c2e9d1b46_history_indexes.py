@@ -0,0 +1,30 @@
+"""history: keyset pagination indexes
+
+Revision ID: 5a7c2e9d1b46
+Revises: 1d9f6a3b8e24
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5a7c2e9d1b46"
+down_revision: Union[str, Sequence[str], None] = "1d9f6a3b8e24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_history_timestamp", "history", ["timestamp", "id"])
+    op.create_index("ix_history_project_id", "history", ["project_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_history_project_id", table_name="history")
+    op.drop_index("ix_history_timestamp", table_name="history")
@@ -0,0 +1,43 @@
+"""product_parts: sub-assembly component_id
+
+Revision ID: 7b2d9e8c4a10
+Revises: 3f1a2b4c5d6e
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7b2d9e8c4a10"
+down_revision: Union[str, Sequence[str], None] = "3f1a2b4c5d6e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("product_parts") as batch_op:
+        batch_op.add_column(sa.Column("component_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_product_parts_component_id_products",
+            "products",
+            ["component_id"],
+            ["id"],
+        )
+        batch_op.create_index("ix_product_parts_product_id", ["product_id"])
+        batch_op.create_index("ix_product_parts_component_id", ["component_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("product_parts") as batch_op:
+        batch_op.drop_index("ix_product_parts_component_id")
+        batch_op.drop_index("ix_product_parts_product_id")
+        batch_op.drop_constraint(
+            "fk_product_parts_component_id_products", type_="foreignkey"
+        )
+        batch_op.drop_column("component_id")
@@ -0,0 +1,42 @@
+"""projects: product_id foreign key, backfilled from product name
+
+Revision ID: 9c3e7a1f5b28
+Revises: 5a7c2e9d1b46
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9c3e7a1f5b28"
+down_revision: Union[str, Sequence[str], None] = "5a7c2e9d1b46"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("projects") as batch_op:
+        batch_op.add_column(sa.Column("product_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_projects_product_id_products", "products", ["product_id"], ["id"]
+        )
+        batch_op.create_index("ix_projects_product_id", ["product_id"])
+    # names that match no product stay NULL; the name column is kept
+    op.execute(
+        "UPDATE projects SET product_id = "
+        "(SELECT products.id FROM products WHERE products.name = projects.product) "
+        "WHERE product IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("projects") as batch_op:
+        batch_op.drop_index("ix_projects_product_id")
+        batch_op.drop_constraint("fk_projects_product_id_products", type_="foreignkey")
+        batch_op.drop_column("product_id")
@@ -0,0 +1,91 @@
+"""bom_snapshots: versioned BOM snapshots referenced by projects
+
+Revision ID: a6d2f4b8c013
+Revises: f7b3c1d9a526
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a6d2f4b8c013"
+down_revision: Union[str, Sequence[str], None] = "f7b3c1d9a526"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "bom_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("digest", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_bom_snapshots_product_version",
+        "bom_snapshots",
+        ["product_id", "version"],
+        unique=True,
+    )
+    op.create_table(
+        "bom_snapshot_lines",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("snapshot_id", sa.Integer(), nullable=False),
+        sa.Column("material_id", sa.Integer(), nullable=False),
+        sa.Column("quantity_required", sa.Integer(), nullable=False),
+        sa.Column("cut_length", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["material_id"], ["materials.id"]),
+        sa.ForeignKeyConstraint(["snapshot_id"], ["bom_snapshots.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_bom_snapshot_lines_demand",
+        "bom_snapshot_lines",
+        ["snapshot_id", "material_id", "cut_length", "quantity_required"],
+    )
+    # existing projects keep their copied lines and no snapshot; they read
+    # exactly as before
+    with op.batch_alter_table("projects") as batch_op:
+        batch_op.add_column(sa.Column("bom_snapshot_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_projects_bom_snapshot_id_bom_snapshots",
+            "bom_snapshots",
+            ["bom_snapshot_id"],
+            ["id"],
+        )
+        batch_op.create_index("ix_projects_bom_snapshot_id", ["bom_snapshot_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # copy the snapshot lines back into project_parts (× quantity), skipping
+    # the ones a project overrides
+    op.execute(
+        "INSERT INTO project_parts "
+        "(project_id, material_id, quantity_required, cut_length) "
+        "SELECT p.id, l.material_id, "
+        "l.quantity_required * COALESCE(NULLIF(p.quantity, 0), 1), l.cut_length "
+        "FROM projects p JOIN bom_snapshot_lines l ON l.snapshot_id = p.bom_snapshot_id "
+        "WHERE NOT EXISTS (SELECT 1 FROM project_parts o "
+        "WHERE o.project_id = p.id AND o.material_id = l.material_id "
+        "AND o.cut_length IS l.cut_length)"
+    )
+    with op.batch_alter_table("projects") as batch_op:
+        batch_op.drop_index("ix_projects_bom_snapshot_id")
+        batch_op.drop_constraint(
+            "fk_projects_bom_snapshot_id_bom_snapshots", type_="foreignkey"
+        )
+        batch_op.drop_column("bom_snapshot_id")
+    op.drop_index("ix_bom_snapshot_lines_demand", table_name="bom_snapshot_lines")
+    op.drop_table("bom_snapshot_lines")
+    op.drop_index("ix_bom_snapshots_product_version", table_name="bom_snapshots")
+    op.drop_table("bom_snapshots")
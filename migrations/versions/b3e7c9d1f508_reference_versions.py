@@ -0,0 +1,56 @@
+"""reference_versions: per-table write counters for the reference cache
+
+Revision ID: b3e7c9d1f508
+Revises: a6d2f4b8c013
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e7c9d1f508"
+down_revision: Union[str, Sequence[str], None] = "a6d2f4b8c013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# watched table -> counters a write to it bumps
+SOURCES = {
+    "materials": "'materials'",
+    "products": "'products'",
+    "product_categories": "'products'",
+    "categories": "'categories', 'products'",
+}
+OPS = {"i": "INSERT", "u": "UPDATE", "d": "DELETE"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "reference_versions",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.execute(
+        "INSERT INTO reference_versions (name, version) VALUES "
+        "('categories', 0), ('products', 0), ('materials', 0)"
+    )
+    for table, names in SOURCES.items():
+        for suffix, event in OPS.items():
+            op.execute(
+                f"CREATE TRIGGER {table}_version_{suffix} AFTER {event} ON {table} "
+                "BEGIN UPDATE reference_versions SET version = version + 1 "
+                f"WHERE name IN ({names}); END"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SOURCES:
+        for suffix in OPS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_version_{suffix}")
+    op.drop_table("reference_versions")
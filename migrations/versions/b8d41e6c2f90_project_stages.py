@@ -0,0 +1,68 @@
+"""project_stages: stage status transitions with timestamps
+
+Revision ID: b8d41e6c2f90
+Revises: 9c3e7a1f5b28
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d41e6c2f90"
+down_revision: Union[str, Sequence[str], None] = "9c3e7a1f5b28"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STAGES = [
+    "afterone",
+    "cutting",
+    "laser",
+    "bending",
+    "drilling",
+    "welding",
+    "grinding",
+    "coating",
+    "delivered",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "project_stages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=True),
+        sa.Column("ended_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_project_stages_stage_status",
+        "project_stages",
+        ["stage", "status", "ended_at"],
+    )
+    op.create_index(
+        "ix_project_stages_project",
+        "project_stages",
+        ["project_id", "stage", "ended_at"],
+    )
+    # current status of existing projects; when it was set is unknown
+    for stage in STAGES:
+        op.execute(
+            "INSERT INTO project_stages (project_id, stage, status) "
+            f"SELECT id, '{stage}', COALESCE({stage}, '-') FROM projects"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_project_stages_project", table_name="project_stages")
+    op.drop_index("ix_project_stages_stage_status", table_name="project_stages")
+    op.drop_table("project_stages")
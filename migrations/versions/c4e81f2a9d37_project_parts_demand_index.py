@@ -0,0 +1,32 @@
+"""project_parts: covering index for requirements run
+
+Revision ID: c4e81f2a9d37
+Revises: 7b2d9e8c4a10
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e81f2a9d37"
+down_revision: Union[str, Sequence[str], None] = "7b2d9e8c4a10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_project_parts_demand",
+        "project_parts",
+        ["project_id", "material_id", "quantity_required"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_project_parts_demand", table_name="project_parts")
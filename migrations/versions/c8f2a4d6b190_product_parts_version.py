@@ -0,0 +1,40 @@
+"""product_parts_version: write counter for the BOM explosion cache
+
+Revision ID: c8f2a4d6b190
+Revises: b3e7c9d1f508
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c8f2a4d6b190"
+down_revision: Union[str, Sequence[str], None] = "b3e7c9d1f508"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPS = {"i": "INSERT", "u": "UPDATE", "d": "DELETE"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "INSERT INTO reference_versions (name, version) VALUES ('product_parts', 0)"
+    )
+    for suffix, event in OPS.items():
+        op.execute(
+            f"CREATE TRIGGER product_parts_version_{suffix} AFTER {event} "
+            "ON product_parts BEGIN UPDATE reference_versions "
+            "SET version = version + 1 WHERE name IN ('product_parts'); END"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for suffix in OPS:
+        op.execute(f"DROP TRIGGER IF EXISTS product_parts_version_{suffix}")
+    op.execute("DELETE FROM reference_versions WHERE name = 'product_parts'")
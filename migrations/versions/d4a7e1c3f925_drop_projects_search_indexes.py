@@ -0,0 +1,34 @@
+"""drop_projects_search_indexes: customer/product indexes the search cannot use
+
+Revision ID: d4a7e1c3f925
+Revises: c8f2a4d6b190
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a7e1c3f925"
+down_revision: Union[str, Sequence[str], None] = "c8f2a4d6b190"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the plan search matches substrings (LIKE '%term%'), which no b-tree
+# index serves; the indexes only slowed every project write
+COLUMNS = ["customer", "product"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for col in COLUMNS:
+        op.drop_index(f"ix_projects_{col}", table_name="projects")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for col in COLUMNS:
+        op.create_index(f"ix_projects_{col}", "projects", [col])
@@ -0,0 +1,128 @@
+"""stock_movements ledger and materials.reserved_qty
+
+Revision ID: e2a9c5d7f413
+Revises: b8d41e6c2f90
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from cutlist import BAR_LENGTH, first_fit_decreasing
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a9c5d7f413"
+down_revision: Union[str, Sequence[str], None] = "b8d41e6c2f90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("materials") as batch_op:
+        batch_op.add_column(
+            sa.Column("reserved_qty", sa.Integer(), nullable=False, server_default="0")
+        )
+    op.create_table(
+        "stock_movements",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("material_id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("on_hand_delta", sa.Integer(), nullable=False),
+        sa.Column("reserved_delta", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["material_id"], ["materials.id"]),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_stock_movements_material_id", "stock_movements", ["material_id"]
+    )
+    op.create_index(
+        "ix_stock_movements_project", "stock_movements", ["project_id", "material_id"]
+    )
+    # opening balance, so the ledger sums to the current stock
+    op.execute(
+        "INSERT INTO stock_movements "
+        "(timestamp, material_id, kind, on_hand_delta, reserved_delta) "
+        "SELECT datetime('now', 'localtime'), id, 'opening', stock_qty, 0 "
+        "FROM materials "
+        "WHERE COALESCE(stock_qty, 0) != 0"
+    )
+    _reserve_open_projects()
+
+
+def _reserve_open_projects() -> None:
+    # open orders hold their material from the start, as if created now:
+    # earlier projects first, up to what is on hand. Delivered projects and
+    # started ones (stock already deducted) hold nothing.
+    conn = op.get_bind()
+    free = {
+        mid: max(stock or 0, 0)
+        for mid, stock in conn.execute(sa.text("SELECT id, stock_qty FROM materials"))
+    }
+    bars = dict(conn.execute(sa.text("SELECT id, tube_length FROM materials")).all())
+    needs: dict[int, dict[int, int]] = {}
+    cuts: dict[int, dict[int, list[int]]] = {}
+    for pid, mid, cut, qty in conn.execute(
+        sa.text(
+            "SELECT p.id, pp.material_id, pp.cut_length, "
+            "SUM(pp.quantity_required) "
+            "FROM projects p JOIN project_parts pp ON pp.project_id = p.id "
+            "WHERE (p.delivered IS NULL OR p.delivered != 'Valmis') "
+            "AND p.id NOT IN (SELECT project_id FROM history "
+            "WHERE action = 'Stock deducted' AND project_id IS NOT NULL) "
+            "AND pp.material_id IS NOT NULL "
+            "GROUP BY p.id, pp.material_id, pp.cut_length"
+        )
+    ):
+        need = needs.setdefault(pid, {})
+        need[mid] = need.get(mid, 0)
+        if cut:
+            # tube pieces: whole bars from the cut plan; a piece longer than
+            # its bar cannot be cut and is left out
+            bar = bars.get(mid) or BAR_LENGTH
+            fit = [cut] * (qty or 0) if 0 < cut <= bar else []
+            cuts.setdefault(pid, {}).setdefault(mid, []).extend(fit)
+        else:
+            need[mid] += qty or 0
+    rows = []
+    for pid in sorted(needs):
+        for mid, qty in needs[pid].items():
+            lengths = cuts.get(pid, {}).get(mid)
+            if lengths:
+                qty += len(first_fit_decreasing(lengths, bars.get(mid) or BAR_LENGTH))
+            take = min(qty, free.get(mid, 0))
+            if take > 0:
+                free[mid] -= take
+                rows.append({"mid": mid, "pid": pid, "qty": take})
+    if not rows:
+        return
+    conn.execute(
+        sa.text(
+            "INSERT INTO stock_movements "
+            "(timestamp, material_id, project_id, kind, on_hand_delta, "
+            "reserved_delta) "
+            "VALUES (datetime('now', 'localtime'), :mid, :pid, 'reserve', 0, :qty)"
+        ),
+        rows,
+    )
+    conn.execute(
+        sa.text(
+            "UPDATE materials SET reserved_qty = (SELECT COALESCE(SUM(reserved_delta), "
+            "0) FROM stock_movements WHERE material_id = materials.id)"
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_stock_movements_project", table_name="stock_movements")
+    op.drop_index("ix_stock_movements_material_id", table_name="stock_movements")
+    op.drop_table("stock_movements")
+    with op.batch_alter_table("materials") as batch_op:
+        batch_op.drop_column("reserved_qty")
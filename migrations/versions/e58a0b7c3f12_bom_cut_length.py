@@ -0,0 +1,44 @@
+"""product_parts/project_parts: tube cut_length
+
+Revision ID: e58a0b7c3f12
+Revises: c4e81f2a9d37
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e58a0b7c3f12"
+down_revision: Union[str, Sequence[str], None] = "c4e81f2a9d37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("product_parts", sa.Column("cut_length", sa.Integer(), nullable=True))
+    op.add_column("project_parts", sa.Column("cut_length", sa.Integer(), nullable=True))
+    op.drop_index("ix_project_parts_demand", table_name="project_parts")
+    op.create_index(
+        "ix_project_parts_demand",
+        "project_parts",
+        ["project_id", "material_id", "cut_length", "quantity_required"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_project_parts_demand", table_name="project_parts")
+    op.create_index(
+        "ix_project_parts_demand",
+        "project_parts",
+        ["project_id", "material_id", "quantity_required"],
+    )
+    with op.batch_alter_table("project_parts") as batch_op:
+        batch_op.drop_column("cut_length")
+    with op.batch_alter_table("product_parts") as batch_op:
+        batch_op.drop_column("cut_length")
@@ -0,0 +1,61 @@
+"""materials_fts: FTS5 index over material names and tube attributes
+
+Revision ID: f7b3c1d9a526
+Revises: e2a9c5d7f413
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f7b3c1d9a526"
+down_revision: Union[str, Sequence[str], None] = "e2a9c5d7f413"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "name, tube_dimension, tube_thickness, tube_profile, material_type"
+NEW = "new.name, new.tube_dimension, new.tube_thickness, new.tube_profile, new.material_type"
+OLD = "old.name, old.tube_dimension, old.tube_thickness, old.tube_profile, old.material_type"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        f"CREATE VIRTUAL TABLE materials_fts USING fts5({COLUMNS}, "
+        "content='materials', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER materials_fts_ai AFTER INSERT ON materials BEGIN "
+        f"INSERT INTO materials_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW}); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER materials_fts_ad AFTER DELETE ON materials BEGIN "
+        f"INSERT INTO materials_fts(materials_fts, rowid, {COLUMNS}) "
+        f"VALUES ('delete', old.id, {OLD}); "
+        "END"
+    )
+    # stock updates do not touch the index
+    op.execute(
+        f"CREATE TRIGGER materials_fts_au AFTER UPDATE OF {COLUMNS} ON materials "
+        "BEGIN "
+        f"INSERT INTO materials_fts(materials_fts, rowid, {COLUMNS}) "
+        f"VALUES ('delete', old.id, {OLD}); "
+        f"INSERT INTO materials_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW}); "
+        "END"
+    )
+    # index the rows that are already there
+    op.execute("INSERT INTO materials_fts(materials_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER materials_fts_au")
+    op.execute("DROP TRIGGER materials_fts_ad")
+    op.execute("DROP TRIGGER materials_fts_ai")
+    op.execute("DROP TABLE materials_fts")
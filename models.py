@@ -1,6 +1,16 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    event,
+)
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -39,7 +49,10 @@ class Product(Base):
     production_time = Column(Integer)  # minutes
 
     parts = relationship(
-        "ProductParts", back_populates="product", cascade="all, delete-orphan"
+        "ProductParts",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        foreign_keys="ProductParts.product_id",
     )
     categories = relationship(
         "Category", secondary=product_categories, back_populates="products"
@@ -52,7 +65,10 @@ class Material(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
+    # laoseis ja broneeritud kogus – stock_movements kokkuvõte, hoitakse
+    # iga liikumisega samas transaktsioonis
     stock_qty = Column(Integer, default=0)
+    reserved_qty = Column(Integer, default=0, server_default="0", nullable=False)
     type = Column(String, default="general")  # general | tube
     material_type = Column(String)
     tube_profile = Column(String)
@@ -62,16 +78,105 @@ class Material(Base):
     tube_thickness = Column(String)
 
 
+# ───────── materials full-text index ─────────
+# FTS5 vari-indeks materials tabeli kohal; triggerid hoiavad selle sünkis.
+# Uuendustrigger ainult otsitavatel veergudel – laoseisu muutus seda ei puuduta.
+MATERIALS_FTS_COLUMNS = (
+    "name",
+    "tube_dimension",
+    "tube_thickness",
+    "tube_profile",
+    "material_type",
+)
+_fts_cols = ", ".join(MATERIALS_FTS_COLUMNS)
+_fts_new = ", ".join(f"new.{c}" for c in MATERIALS_FTS_COLUMNS)
+_fts_old = ", ".join(f"old.{c}" for c in MATERIALS_FTS_COLUMNS)
+MATERIALS_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE materials_fts USING fts5({_fts_cols}, "
+    "content='materials', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER materials_fts_ai AFTER INSERT ON materials BEGIN "
+    f"INSERT INTO materials_fts(rowid, {_fts_cols}) VALUES (new.id, {_fts_new}); "
+    "END",
+    "CREATE TRIGGER materials_fts_ad AFTER DELETE ON materials BEGIN "
+    f"INSERT INTO materials_fts(materials_fts, rowid, {_fts_cols}) "
+    f"VALUES ('delete', old.id, {_fts_old}); "
+    "END",
+    f"CREATE TRIGGER materials_fts_au AFTER UPDATE OF {_fts_cols} ON materials "
+    "BEGIN "
+    f"INSERT INTO materials_fts(materials_fts, rowid, {_fts_cols}) "
+    f"VALUES ('delete', old.id, {_fts_old}); "
+    f"INSERT INTO materials_fts(rowid, {_fts_cols}) VALUES (new.id, {_fts_new}); "
+    "END",
+]
+for _stmt in MATERIALS_FTS_DDL:
+    # create_all (testandmed, bench); päris baasis loob need migratsioon
+    event.listen(
+        Material.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite")
+    )
+
+
 # ───────── product-parts (BOM) ─────────
+# rida viitab kas materjalile või alamkomplektile (teisele tootele)
 class ProductParts(Base):
     __tablename__ = "product_parts"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     material_id = Column(Integer, ForeignKey("materials.id"))
+    component_id = Column(
+        Integer,
+        ForeignKey("products.id", name="fk_product_parts_component_id_products"),
+        index=True,
+    )
     quantity_required = Column(Integer, default=1)
+    cut_length = Column(Integer)  # mm; toru puhul on kogus tükkide arv
 
-    product = relationship("Product", back_populates="parts")
+    product = relationship("Product", back_populates="parts", foreign_keys=[product_id])
+    material = relationship("Material")
+    component = relationship("Product", foreign_keys=[component_id])
+
+
+# ───────── BOM snapshots ─────────
+# toote lahtivõetud BOM ühe ühiku kohta, muutumatu. Projekt viitab
+# hetktõmmisele; sama sisuga (digest) BOM-i korral jagavad kõik toote
+# projektid sama versiooni, muudetud BOM saab järgmise versiooni.
+class BomSnapshot(Base):
+    __tablename__ = "bom_snapshots"
+    __table_args__ = (
+        Index("ix_bom_snapshots_product_version", "product_id", "version", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # toote kustutamisel jääb hetktõmmis alles, viide läheb tühjaks
+    product_id = Column(Integer, ForeignKey("products.id"))
+    version = Column(Integer, nullable=False)
+    digest = Column(String, nullable=False)  # ridade räsi
+    created_at = Column(DateTime, default=datetime.now)
+
+    lines = relationship("BomSnapshotLine", back_populates="snapshot")
+
+
+class BomSnapshotLine(Base):
+    __tablename__ = "bom_snapshot_lines"
+    __table_args__ = (
+        # katab projektide materjalivajaduse (MRP) ilma tabelit lugemata
+        Index(
+            "ix_bom_snapshot_lines_demand",
+            "snapshot_id",
+            "material_id",
+            "cut_length",
+            "quantity_required",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    snapshot_id = Column(Integer, ForeignKey("bom_snapshots.id"), nullable=False)
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=False)
+    quantity_required = Column(Integer, nullable=False)  # ühe toote kohta
+    cut_length = Column(Integer)  # mm; toru puhul on kogus tükkide arv
+
+    snapshot = relationship("BomSnapshot", back_populates="lines")
     material = relationship("Material")
 
 
@@ -86,47 +191,166 @@ class Project(Base):
     delivery = Column(String)
     customer = Column(String)
     order_number = Column(String)
+    # product_id on viide; product hoiab nime kuvamiseks ja otsinguks
     product = Column(String)  # Product.name
+    product_id = Column(
+        Integer,
+        ForeignKey("products.id", name="fk_projects_product_id_products"),
+        index=True,
+    )
     notes = Column(String)
     quantity = Column(Integer)
     deadline = Column(DateTime)
+    # vajadus = hetktõmmise read × quantity, üle kirjutatud project_parts ridadega
+    bom_snapshot_id = Column(
+        Integer,
+        ForeignKey(
+            "bom_snapshots.id", name="fk_projects_bom_snapshot_id_bom_snapshots"
+        ),
+        index=True,
+    )
 
-    afterone = Column(String, default="-")
-    cutting = Column(String, default="-")
-    laser = Column(String, default="-")
-    bending = Column(String, default="-")
-    drilling = Column(String, default="-")
-    welding = Column(String, default="-")
-    grinding = Column(String, default="-")
-    coating = Column(String, default="-")
-    delivered = Column(String, default="-")
+    # etapid on indekseeritud staatuse järgi filtreerimiseks
+    afterone = Column(String, default="-", index=True)
+    cutting = Column(String, default="-", index=True)
+    laser = Column(String, default="-", index=True)
+    bending = Column(String, default="-", index=True)
+    drilling = Column(String, default="-", index=True)
+    welding = Column(String, default="-", index=True)
+    grinding = Column(String, default="-", index=True)
+    coating = Column(String, default="-", index=True)
+    delivered = Column(String, default="-", index=True)
 
     parts = relationship(
         "ProjectParts", back_populates="project", cascade="all, delete-orphan"
     )
+    product_ref = relationship("Product")
+    bom_snapshot = relationship("BomSnapshot")
 
 
 # ───────── project-parts ─────────
+# projekti enda read: hetktõmmiseta projektil kogu vajadus, muidu ainult
+# hetktõmmise read (materjal + lõikepikkus), mille kogus on muudetud
 class ProjectParts(Base):
     __tablename__ = "project_parts"
+    __table_args__ = (
+        # katab materjalivajaduse arvutuse (MRP) ilma tabelit lugemata
+        Index(
+            "ix_project_parts_demand",
+            "project_id",
+            "material_id",
+            "cut_length",
+            "quantity_required",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
     material_id = Column(Integer, ForeignKey("materials.id"))
     quantity_required = Column(Integer, default=1)
+    cut_length = Column(Integer)  # mm; toru puhul on kogus tükkide arv
 
     project = relationship("Project", back_populates="parts")
     material = relationship("Material")
 
 
+# ───────── project stages ─────────
+# etapi staatuse ajalugu: iga rida on üks staatus ajavahemikus
+# [changed_at, ended_at); kehtival real on ended_at tühi
+class ProjectStage(Base):
+    __tablename__ = "project_stages"
+    __table_args__ = (
+        # "kõik projektid, mis on praegu keevituses"
+        Index("ix_project_stages_stage_status", "stage", "status", "ended_at"),
+        Index("ix_project_stages_project", "project_id", "stage", "ended_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    stage = Column(String, nullable=False)  # STAGE_FIELDS
+    status = Column(String, nullable=False)
+    changed_at = Column(DateTime, default=datetime.now)  # tühi = teadmata
+    ended_at = Column(DateTime)
+
+
+# ───────── stock ledger ─────────
+# ainult lisatavad laoliikumised; materjali saldo = ridade summa
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        # projekti broneeringud materjali kaupa
+        Index("ix_stock_movements_project", "project_id", "material_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime, default=datetime.now)
+    material_id = Column(
+        Integer, ForeignKey("materials.id"), nullable=False, index=True
+    )
+    project_id = Column(Integer, ForeignKey("projects.id"))
+    # opening | receipt | adjust | reserve | release | consume
+    kind = Column(String, nullable=False)
+    on_hand_delta = Column(Integer, nullable=False, default=0)
+    reserved_delta = Column(Integer, nullable=False, default=0)
+
+
 # ───────── history ─────────
 class History(Base):
     __tablename__ = "history"
+    __table_args__ = (
+        # lehekülgede kaupa lugemine (timestamp, id) järgi
+        Index("ix_history_timestamp", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.now)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
     action = Column(String, nullable=False)
     details = Column(String, nullable=False)
 
     project = relationship("Project")
+
+
+# ───────── reference versions ─────────
+# loendur tabeli kohta; päästikud suurendavad seda iga kirjutusega, ka teiste
+# klientide omadega. logic._cached ja BOM-i puhver võrdlevad sellega.
+class ReferenceVersion(Base):
+    __tablename__ = "reference_versions"
+
+    name = Column(String, primary_key=True)  # "materials", "products", ...
+    version = Column(Integer, nullable=False, default=0)
+
+
+# jälgitav tabel -> loendurid, mida selle muutus puudutab
+REFERENCE_SOURCES = {
+    "materials": ("materials",),
+    "products": ("products",),
+    "product_categories": ("products",),
+    "categories": ("categories", "products"),  # ProductRec.categories
+    "product_parts": ("product_parts",),  # logic._bom_cache
+}
+REFERENCE_VERSION_DDL = {
+    table: [
+        f"CREATE TRIGGER {table}_version_{op[0].lower()} AFTER {op} ON {table} "
+        "BEGIN UPDATE reference_versions SET version = version + 1 "
+        f"WHERE name IN ({', '.join(repr(n) for n in names)}); END"
+        for op in ("INSERT", "UPDATE", "DELETE")
+    ]
+    for table, names in REFERENCE_SOURCES.items()
+}
+event.listen(
+    ReferenceVersion.__table__,
+    "after_create",
+    DDL(
+        "INSERT INTO reference_versions (name, version) VALUES "
+        "('categories', 0), ('products', 0), ('materials', 0), "
+        "('product_parts', 0)"
+    ),
+)
+for _table, _stmts in REFERENCE_VERSION_DDL.items():
+    for _stmt in _stmts:
+        event.listen(
+            Base.metadata.tables[_table],
+            "after_create",
+            DDL(_stmt).execute_if(dialect="sqlite"),
+        )
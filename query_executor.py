@@ -0,0 +1,165 @@
+# query_executor.py
+"""Run logic functions on a thread pool, each call with its own session.
+
+    run(get_history_page, 200, on_done=model.append, key="history")
+
+Results and errors come back on the GUI thread through queued signals.
+A new call with the same key supersedes the previous one: a queued task is
+dropped, a running SQLite query is interrupted and a late result is ignored.
+"""
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+from database import SessionLocal
+
+MAX_THREADS = 4  # WAL: readers run side by side, writers queue on busy_timeout
+
+
+class Ticket:
+    """Handle of one submitted call."""
+
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = False
+        self._interrupt = None  # sqlite3.Connection.interrupt of the running task
+
+    def cancel(self):
+        self.cancelled = True
+        interrupt = self._interrupt  # the worker may clear it meanwhile
+        if interrupt is not None:
+            interrupt()
+
+
+class _Signals(QObject):
+    # (task, result) / (task, exception)
+    done = Signal(object, object)
+    failed = Signal(object, object)
+
+
+class _Task(QRunnable):
+    def __init__(self, ticket, fn, args, kwargs, on_done, on_error):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.ticket = ticket
+        self.signals = _Signals()
+        self.on_done = on_done
+        self.on_error = on_error
+        self._call = (fn, args, kwargs)
+
+    def run(self):
+        # always reports back, so the executor can release the task;
+        # results of cancelled tasks are dropped there
+        fn, args, kwargs = self._call
+        ticket = self.ticket
+        if ticket.cancelled:
+            self.signals.done.emit(self, None)
+            return
+        try:
+            with SessionLocal() as db:
+                dbapi = db.connection().connection.dbapi_connection
+                ticket._interrupt = getattr(dbapi, "interrupt", None)
+                try:
+                    result = fn(db, *args, **kwargs)
+                finally:
+                    ticket._interrupt = None
+        except Exception as e:  # "interrupted" after cancel lands here too
+            self.signals.failed.emit(self, e)
+        else:
+            self.signals.done.emit(self, result)
+
+
+class Progress(QObject):
+    """Thread-safe progress callback: pass progress.report to the task."""
+
+    changed = Signal(int)
+
+    def report(self, done: int):
+        self.changed.emit(done)  # queued to the GUI thread
+
+
+class QueryExecutor(QObject):
+    busy_changed = Signal(bool)
+
+    def __init__(self, parent=None, max_threads: int = MAX_THREADS):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._latest: dict[object, _Task] = {}
+        self._pending: set[_Task] = set()
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._pending)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, **kwargs):
+        if key is not None:
+            self.cancel(key)
+        task = _Task(Ticket(key), fn, args, kwargs, on_done, on_error)
+        # receiver lives on the GUI thread → queued delivery
+        task.signals.done.connect(self._on_done)
+        task.signals.failed.connect(self._on_failed)
+        if key is not None:
+            self._latest[key] = task
+        self._pending.add(task)
+        if len(self._pending) == 1:
+            self.busy_changed.emit(True)
+        self._pool.start(task)
+        return task.ticket
+
+    def cancel(self, key):
+        task = self._latest.pop(key, None)
+        if task is None:
+            return
+        task.ticket.cancel()
+        # not started yet – it will never report back
+        if self._pool.tryTake(task):
+            self._release(task)
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    @Slot(object, object)
+    def _on_done(self, task, result):
+        if self._settle(task) and task.on_done is not None:
+            task.on_done(result)
+
+    @Slot(object, object)
+    def _on_failed(self, task, error):
+        if not self._settle(task):
+            return
+        if task.on_error is not None:
+            task.on_error(error)
+        else:
+            from ui_feedback import show_error
+
+            show_error("Viga", str(error))
+
+    def _settle(self, task) -> bool:
+        # True when the result is still wanted
+        self._release(task)
+        if task.ticket.cancelled:
+            return False
+        if self._latest.get(task.ticket.key) is task:
+            del self._latest[task.ticket.key]
+        return True
+
+    def _release(self, task):
+        if task not in self._pending:
+            return
+        self._pending.discard(task)
+        if not self._pending:
+            self.busy_changed.emit(False)
+
+
+_executor: QueryExecutor | None = None
+
+
+def executor() -> QueryExecutor:
+    global _executor
+    if _executor is None:
+        _executor = QueryExecutor()
+    return _executor
+
+
+def run(fn, *args, **kwargs) -> Ticket:
+    return executor().submit(fn, *args, **kwargs)
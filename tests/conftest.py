@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from database import make_engine
+from models import Base
+
+
+@pytest.fixture(autouse=True)
+def _empty_caches():
+    # the process-wide caches are stamped per database file; a new file may
+    # repeat the stamps of the previous test's
+    logic._ref_cache.clear()
+    logic._bom_cache.clear()
+
+
+@pytest.fixture
+def db(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(eng)
+    with sessionmaker(bind=eng, autoflush=False)() as session:
+        yield session
+    eng.dispose()
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import select
+
+import logic
+from logic import BomChanges, BomLine
+from models import ProductParts
+
+
+def _stored(db, pid):
+    return sorted(
+        db.execute(
+            select(
+                ProductParts.material_id,
+                ProductParts.component_id,
+                ProductParts.cut_length,
+                ProductParts.quantity_required,
+            ).filter_by(product_id=pid)
+        ).all(),
+        key=repr,
+    )
+
+
+def test_only_the_difference_is_written(db):
+    plate = logic.create_material(db, "Plate").id
+    bolt = logic.create_material(db, "Bolt").id
+    tube = logic.create_material(db, "Tube", type="tube", tube_length=6000).id
+    leg = logic.create_product(db, "Leg").id
+    pid = logic.create_product(db, "Frame").id
+    logic.replace_product_bom(
+        db, pid, [BomLine(plate, None, 2), BomLine(bolt, None, 4)]
+    )
+
+    changes = logic.replace_product_bom(
+        db,
+        pid,
+        [
+            BomLine(plate, None, 2),  # unchanged
+            BomLine(tube, None, 1, 700),  # new
+            BomLine(tube, None, 2, 700),  # same line: added up
+            BomLine(None, leg, 4),  # new sub-assembly
+        ],
+    )
+
+    assert changes == BomChanges(inserted=2, updated=0, deleted=1)
+    assert _stored(db, pid) == sorted(
+        [(plate, None, None, 2), (tube, None, 700, 3), (None, leg, None, 4)],
+        key=repr,
+    )
+    assert logic.replace_product_bom(db, pid, [BomLine(plate, None, 5)]) == (
+        BomChanges(inserted=0, updated=1, deleted=2)
+    )
+
+
+# material 1 is the tube each test database starts with
+@pytest.mark.parametrize(
+    "line, message",
+    [
+        (BomLine(None, None, 1), "either a material or a component"),
+        (BomLine(1, None, 0), "must be positive"),
+        (BomLine(1, None, 1, 7000), "does not fit a 6000 mm bar"),
+    ],
+)
+def test_a_bad_line_saves_nothing(db, line, message):
+    tube = logic.create_material(db, "Tube", type="tube", tube_length=6000).id
+    pid = logic.create_product(db, "Frame").id
+    logic.replace_product_bom(db, pid, [BomLine(tube, None, 2, 1000)])
+
+    with pytest.raises(ValueError, match=message):
+        logic.replace_product_bom(db, pid, [BomLine(tube, None, 1, 500), line])
+
+    assert _stored(db, pid) == [(tube, None, 1000, 2)]
+
+
+def test_cycle_saves_nothing(db):
+    a = logic.create_product(db, "A").id
+    b = logic.create_product(db, "B").id
+    logic.replace_product_bom(db, b, [BomLine(None, a, 1)])
+
+    with pytest.raises(ValueError, match="cycle"):
+        logic.replace_product_bom(db, a, [BomLine(None, b, 1)])
+
+    assert _stored(db, a) == []
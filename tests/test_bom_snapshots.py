@@ -0,0 +1,29 @@
+import sqlite3
+
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from database import make_engine
+from models import Base, BomSnapshotLine, Project
+
+
+def test_snapshot_reads_the_stored_bom(tmp_path):
+    path = tmp_path / "bom.db"
+    eng = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(eng)
+    with sessionmaker(bind=eng, autoflush=False)() as db:
+        mid = logic.create_material(db, "Plate", stock_qty=100).id
+        pid = logic.create_product(db, "Frame").id
+        logic.add_material_to_product(db, pid, mid, 2)
+        assert logic.explode_bom(db, pid) == {(mid, None): 2}
+
+        # another client edits the BOM; this process still has it cached
+        other = sqlite3.connect(path)
+        other.execute("UPDATE product_parts SET quantity_required = 5")
+        other.commit()
+        other.close()
+
+        project = logic.create_project(db, "P1", "", [], product_id=pid)
+        sid = db.get(Project, project.id).bom_snapshot_id
+        line = db.query(BomSnapshotLine).filter_by(snapshot_id=sid).one()
+        assert line.quantity_required == 5
@@ -0,0 +1,69 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from bulk_import import import_bom, import_materials
+from database import make_engine
+from models import Base, Material, ProductParts, StockMovement
+
+
+def _session(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(eng)
+    return sessionmaker(bind=eng, autoflush=False)()
+
+
+def test_blank_cell_keeps_stored_value(tmp_path):
+    path = tmp_path / "materials.csv"
+    path.write_text("name,stock_qty,material_type\nPlate,40,steel\n")
+    with _session(tmp_path) as db:
+        import_materials(db, path)
+        path.write_text("name,stock_qty,material_type\nPlate,,aluminium\n")
+        result = import_materials(db, path)
+
+        assert result.updated == 1 and not result.errors
+        plate = db.execute(select(Material).filter_by(name="Plate")).scalar_one()
+        assert (plate.stock_qty, plate.material_type) == (40, "aluminium")
+        ledger = db.execute(select(func.sum(StockMovement.on_hand_delta))).scalar()
+        assert ledger == 40
+
+
+def test_name_only_csv(tmp_path):
+    path = tmp_path / "names.csv"
+    path.write_text("name\nPlate\nBolt\n")
+    with _session(tmp_path) as db:
+        result = import_materials(db, path)
+
+        assert (result.inserted, result.errors) == (2, [])
+        names = db.execute(select(Material.name).order_by(Material.name)).scalars()
+        assert list(names) == ["Bolt", "Plate"]
+
+
+def test_database_error_rejects_only_its_line(tmp_path):
+    path = tmp_path / "materials.csv"
+    # 1e30 parses as a number but does not fit an SQLite integer
+    path.write_text("name,stock_qty\nPlate,4\nBolt,1e30\nNut,7\n")
+    with _session(tmp_path) as db:
+        result = import_materials(db, path)
+
+        assert result.inserted == 2
+        assert [e.line for e in result.errors] == [3]
+        stock = dict(db.execute(select(Material.name, Material.stock_qty)).all())
+        assert stock == {"Plate": 4, "Nut": 7}
+        ledger = db.execute(select(func.sum(StockMovement.on_hand_delta))).scalar()
+        assert ledger == 11
+
+
+def test_bom_database_error_rejects_only_its_line(tmp_path):
+    with _session(tmp_path) as db:
+        mats = tmp_path / "materials.csv"
+        mats.write_text("name\nPlate\nBolt\n")
+        import_materials(db, mats)
+        logic.create_product(db, "Frame")
+        bom = tmp_path / "bom.csv"
+        bom.write_text("product,material,quantity\nFrame,Plate,2\nFrame,Bolt,1e30\n")
+        result = import_bom(db, bom)
+
+        assert result.inserted == 1
+        assert [e.line for e in result.errors] == [3]
+        assert db.execute(select(ProductParts.quantity_required)).scalars().all() == [2]
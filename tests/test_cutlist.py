@@ -0,0 +1,44 @@
+from collections import Counter
+
+import pytest
+
+from cutlist import first_fit_decreasing, optimize_cuts
+
+# FFD puts the two 4s together and needs three bars; 4+3+3 twice fits two
+TRICKY = [4, 4, 3, 3, 3, 3]
+
+
+def _same_pieces(plan, cuts):
+    return Counter(c for bar in plan.bars for c in bar) == Counter(cuts)
+
+
+def test_ffd_packs_longest_first():
+    assert first_fit_decreasing([2, 5, 3, 5], 10) == [[5, 5], [3, 2]]
+
+
+def test_kerf_is_not_needed_after_the_last_piece():
+    plan = optimize_cuts([5, 4], bar_length=10, kerf=1)
+    assert plan.bars == [[5, 4]] and plan.waste == 0
+
+
+def test_ffd_at_the_lower_bound_is_optimal():
+    plan = optimize_cuts([2500, 2500, 1000], 6000)
+    assert len(plan.bars) == 1 and plan.optimal
+
+
+def test_exact_search_beats_ffd():
+    assert len(optimize_cuts(TRICKY, 10).bars) == 3
+    plan = optimize_cuts(TRICKY, 10, exact=True)
+    assert len(plan.bars) == 2 and plan.optimal and plan.waste == 0
+    assert _same_pieces(plan, TRICKY)
+
+
+def test_exhausted_budget_falls_back_to_ffd():
+    plan = optimize_cuts(TRICKY, 10, exact=True, time_budget=0)
+    assert len(plan.bars) == 3 and not plan.optimal
+    assert _same_pieces(plan, TRICKY)
+
+
+def test_cut_longer_than_the_bar_is_rejected():
+    with pytest.raises(ValueError, match="does not fit a 6000 mm bar"):
+        optimize_cuts([6500], 6000)
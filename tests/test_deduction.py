@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import select
+
+import logic
+from models import History, Material, StockMovement
+
+
+def _frame(db, stock, per_unit):
+    mid = logic.create_material(db, "Plate", stock_qty=stock).id
+    pid = logic.create_product(db, "Frame").id
+    logic.add_material_to_product(db, pid, mid, per_unit)
+    return mid, pid
+
+
+def _balance(db, mid):
+    m = db.execute(select(Material).filter_by(id=mid)).scalar_one()
+    db.refresh(m)
+    return m.stock_qty, m.reserved_qty
+
+
+def test_start_takes_bom_times_quantity(db):
+    mid, pid = _frame(db, stock=20, per_unit=2)
+    project = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3)
+    assert _balance(db, mid) == (20, 6)
+
+    logic.start_project_deduct_inventory(db, project.id)
+
+    assert _balance(db, mid) == (14, 0)
+    consumed = db.execute(
+        select(StockMovement.on_hand_delta).filter_by(
+            project_id=project.id, kind="consume"
+        )
+    ).scalar_one()
+    assert consumed == -6
+
+
+def test_multiplier_scales_every_line(db):
+    mid, pid = _frame(db, stock=20, per_unit=2)
+    project = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3)
+
+    logic.start_project_deduct_inventory(db, project.id, multiplier=2)
+
+    assert _balance(db, mid) == (8, 0)
+
+
+def test_shortage_leaves_stock_untouched(db):
+    mid, pid = _frame(db, stock=5, per_unit=2)
+    project = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3)
+    assert _balance(db, mid) == (5, 5)
+
+    with pytest.raises(ValueError, match="Insufficient stock for Plate"):
+        logic.start_project_deduct_inventory(db, project.id)
+
+    assert _balance(db, mid) == (5, 5)
+    assert not db.execute(select(StockMovement).filter_by(kind="consume")).all()
+    assert not db.execute(select(History).filter_by(action="Stock deducted")).all()
+
+
+def test_check_counts_bars_once_per_material(db):
+    tube = logic.create_material(
+        db, "Tube", stock_qty=3, type="tube", tube_length=6000
+    ).id
+    pid = logic.create_product(db, "Frame").id
+    # 4 × 2500 and 4 × 1000: pieces fill 3 bars of 6000, not 8
+    logic.add_material_to_product(db, pid, tube, 4, cut_length=2500)
+    logic.add_material_to_product(db, pid, tube, 4, cut_length=1000)
+    project = logic.create_project(db, "P1", "", [], product_id=pid)
+
+    (check,) = logic.project_stock_check(db, project.id)
+    assert (check.required, check.available, check.held) == (3, 3, 3)
+    assert not check.shortage
+
+    (check,) = logic.project_stock_check(db, project.id, multiplier=2)
+    assert (check.required, check.shortage) == (5, 2)
+    with pytest.raises(ValueError, match="Insufficient stock for Tube"):
+        logic.start_project_deduct_inventory(db, project.id, multiplier=2)
+
+    logic.start_project_deduct_inventory(db, project.id)
+    assert _balance(db, tube) == (0, 0)
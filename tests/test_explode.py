@@ -0,0 +1,47 @@
+import pytest
+
+import logic
+from models import ProductParts
+
+
+def test_bom_edit_empties_the_cache(db):
+    mid = logic.create_material(db, "Plate").id
+    pid = logic.create_product(db, "Frame").id
+    logic.add_material_to_product(db, pid, mid, 2)
+    assert logic.explode_bom(db, pid) == {(mid, None): 2}
+    assert pid in logic._bom_cache
+
+    # a write that bypasses logic still bumps the counter
+    db.query(ProductParts).filter_by(product_id=pid).update({"quantity_required": 5})
+    db.commit()
+    assert logic.explode_bom(db, pid) == {(mid, None): 5}
+
+
+def test_sub_assemblies_multiply_down_the_tree(db):
+    plate = logic.create_material(db, "Plate").id
+    tube = logic.create_material(db, "Tube", type="tube", tube_length=6000).id
+    leg = logic.create_product(db, "Leg").id
+    logic.add_material_to_product(db, leg, tube, 2, cut_length=700)
+    logic.add_material_to_product(db, leg, plate, 1)
+    frame = logic.create_product(db, "Frame").id
+    logic.add_component_to_product(db, frame, leg, 4)
+    logic.add_material_to_product(db, frame, plate, 3)
+    table = logic.create_product(db, "Table").id
+    logic.add_component_to_product(db, table, frame, 2)
+
+    assert logic.explode_bom(db, frame) == {(tube, 700): 8, (plate, None): 7}
+    assert logic.explode_bom(db, table, quantity=5) == {
+        (tube, 700): 80,
+        (plate, None): 70,
+    }
+
+
+def test_component_cycle_is_rejected(db):
+    a = logic.create_product(db, "A").id
+    b = logic.create_product(db, "B").id
+    logic.add_component_to_product(db, a, b, 1)
+
+    with pytest.raises(ValueError, match="cycle"):
+        logic.add_component_to_product(db, b, a, 1)
+    with pytest.raises(ValueError, match="cycle"):
+        logic.add_component_to_product(db, a, a, 1)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+import logic
+from models import History
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def _pages(db, limit, **filters):
+    pages, after = [], None
+    while True:
+        rows = logic.get_history_page(db, limit=limit, after=after, **filters)
+        if not rows:
+            return pages
+        pages.append([r.id for r in rows])
+        after = (rows[-1].timestamp, rows[-1].id)
+
+
+def test_pages_split_inside_equal_timestamps(db):
+    # three rows share each timestamp, so page edges fall between them
+    db.execute(
+        insert(History),
+        [
+            {
+                "timestamp": T0 + timedelta(minutes=i // 3),
+                "action": "Edit",
+                "details": "",
+            }
+            for i in range(10)
+        ],
+    )
+    db.commit()
+
+    pages = _pages(db, limit=4)
+
+    assert [len(p) for p in pages] == [4, 4, 2]
+    assert [i for p in pages for i in p] == list(range(10, 0, -1))
+
+
+def test_filters_and_half_open_range(db):
+    db.execute(
+        insert(History),
+        [
+            {"timestamp": T0 + timedelta(hours=i), "action": a, "details": ""}
+            for i, a in enumerate(["Edit", "Import", "Edit", "Edit", "Import"])
+        ],
+    )
+    db.commit()
+
+    pages = _pages(
+        db,
+        limit=1,
+        action="Edit",
+        since=T0 + timedelta(hours=2),
+        until=T0 + timedelta(hours=3),
+    )
+
+    assert pages == [[3]]
@@ -0,0 +1,30 @@
+import sqlite3
+
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from database import make_engine
+from models import Base, StockMovement
+
+
+def test_detail_edit_keeps_stock_set_elsewhere(tmp_path):
+    path = tmp_path / "edit.db"
+    eng = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(eng)
+    with sessionmaker(bind=eng, autoflush=False)() as db:
+        mid = logic.create_material(db, "Tube", stock_qty=50).id
+        moves = db.query(StockMovement).count()
+
+        other = sqlite3.connect(path)
+        other.execute("UPDATE materials SET stock_qty = 30 WHERE id = ?", (mid,))
+        other.commit()
+        other.close()
+
+        m = logic.update_material_field(db, mid, "tube_length", 5000)
+        assert (m.stock_qty, m.tube_length) == (30, 5000)
+        assert db.query(StockMovement).count() == moves
+
+        m = logic.update_material_field(db, mid, "stock_qty", 35)
+        last = db.query(StockMovement).order_by(StockMovement.id.desc()).first()
+        assert m.stock_qty == 35
+        assert (last.kind, last.on_hand_delta) == ("adjust", 5)
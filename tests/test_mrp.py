@@ -0,0 +1,26 @@
+import logic
+
+
+def test_started_project_is_no_longer_demand(db):
+    mid = logic.create_material(db, "Plate", stock_qty=5).id
+    pid = logic.create_product(db, "Frame").id
+    logic.add_material_to_product(db, pid, mid, 3)
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid).id
+    p2 = logic.create_project(db, "P2", "", [], product_id=pid).id
+    logic.start_project_deduct_inventory(db, p1)
+
+    lines = logic.material_requirements_run(db)
+
+    assert [
+        (ln.project_id, ln.required, ln.allocated, ln.shortage) for ln in lines
+    ] == [(p2, 3, 2, 1)]
+
+
+def test_delivered_project_is_no_longer_demand(db):
+    mid = logic.create_material(db, "Plate", stock_qty=5).id
+    pid = logic.create_product(db, "Frame").id
+    logic.add_material_to_product(db, pid, mid, 3)
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid).id
+    logic.update_project_field(db, p1, "delivered", logic.DONE_VALUE)
+
+    assert logic.material_requirements_run(db) == []
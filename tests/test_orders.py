@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from database import make_engine
+from models import Base, Project
+
+
+def test_unknown_product_rejects_the_order(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'orders.db'}")
+    Base.metadata.create_all(eng)
+    with sessionmaker(bind=eng, autoflush=False)() as db:
+        logic.create_product(db, "Frame")
+        orders = [
+            {"name": "A", "product": "Frame", "quantity": 1},
+            {"name": "B", "product": "Fraem", "quantity": 2},
+        ]
+        with pytest.raises(ValueError, match="Order line 2: unknown product"):
+            logic.create_projects_bulk(db, orders)
+        assert db.query(Project).count() == 0
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import select
+
+import logic
+from models import Material
+
+
+def _setup(db):
+    plate = logic.create_material(db, "Plate", stock_qty=20).id
+    bolt = logic.create_material(db, "Bolt", stock_qty=20).id
+    pid = logic.create_product(db, "Frame").id
+    logic.add_material_to_product(db, pid, plate, 2)
+    logic.add_material_to_product(db, pid, bolt, 4)
+    project = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3).id
+    return plate, bolt, project
+
+
+def _balance(db, mid):
+    m = db.execute(select(Material).filter_by(id=mid)).scalar_one()
+    db.refresh(m)
+    return m.stock_qty, m.reserved_qty
+
+
+def _held(db, project_id):
+    return logic._project_reservations(db, project_id)
+
+
+def _lines(db, project_id):
+    return [
+        (ln.material.name, ln.cut_length, ln.quantity_required)
+        for ln in logic.get_project_parts(db, project_id)
+    ]
+
+
+def test_override_replaces_the_snapshot_line(db):
+    plate, bolt, p1 = _setup(db)
+
+    logic.set_project_line(db, p1, plate, 10)
+
+    assert _lines(db, p1) == [("Plate", None, 10), ("Bolt", None, 12)]
+    assert _held(db, p1) == {plate: 10, bolt: 12}
+    assert _balance(db, plate) == (20, 10)
+    mrp = {ln.material_id: ln.required for ln in logic.material_requirements_run(db)}
+    assert mrp == {plate: 10, bolt: 12}
+
+
+def test_second_override_updates_the_line(db):
+    plate, bolt, p1 = _setup(db)
+
+    logic.set_project_line(db, p1, plate, 10)
+    logic.set_project_line(db, p1, plate, 7)
+
+    assert _lines(db, p1) == [("Plate", None, 7), ("Bolt", None, 12)]
+    assert _held(db, p1) == {plate: 7, bolt: 12}
+
+
+def test_zero_drops_the_line(db):
+    plate, bolt, p1 = _setup(db)
+
+    logic.set_project_line(db, p1, bolt, 0)
+
+    assert _lines(db, p1) == [("Plate", None, 6)]
+    assert [ln.material_id for ln in logic.material_requirements_run(db)] == [plate]
+    assert _held(db, p1) == {plate: 6}
+    assert _balance(db, bolt) == (20, 0)
+
+
+def test_new_line_is_added_next_to_the_snapshot(db):
+    plate, bolt, p1 = _setup(db)
+    tube = logic.create_material(db, "Tube", stock_qty=5).id
+
+    logic.set_project_line(db, p1, tube, 2, cut_length=500)
+
+    assert ("Tube", 500, 2) in _lines(db, p1)
+    assert ("Plate", None, 6) in _lines(db, p1)
+
+
+@pytest.mark.parametrize(
+    "quantity, cut_length, message",
+    [(-1, None, "negative"), (1, 10**6, "does not fit")],
+)
+def test_bad_line_is_refused(db, quantity, cut_length, message):
+    plate, bolt, p1 = _setup(db)
+
+    with pytest.raises(ValueError, match=message):
+        logic.set_project_line(db, p1, plate, quantity, cut_length=cut_length)
+
+    assert _lines(db, p1) == [("Plate", None, 6), ("Bolt", None, 12)]
@@ -0,0 +1,24 @@
+import sqlite3
+
+from sqlalchemy.orm import sessionmaker
+
+import logic
+from database import make_engine
+from models import Base
+
+
+def test_other_clients_writes_reach_the_cache(tmp_path):
+    path = tmp_path / "cache.db"
+    eng = make_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(eng)
+    with sessionmaker(bind=eng, autoflush=False)() as db:
+        mid = logic.create_material(db, "Plate", stock_qty=50).id
+        assert logic.get_materials(db)[0].stock_qty == 50
+
+        # another client, not going through logic
+        other = sqlite3.connect(path)
+        other.execute("UPDATE materials SET stock_qty = 30 WHERE id = ?", (mid,))
+        other.commit()
+        other.close()
+
+        assert logic.get_materials(db)[0].stock_qty == 30
@@ -0,0 +1,77 @@
+from sqlalchemy import select
+
+import logic
+from models import Material, Project
+
+
+def _setup(db, stock=10, per_unit=2):
+    mid = logic.create_material(db, "Plate", stock_qty=stock).id
+    pid = logic.create_product(db, "Frame").id
+    logic.add_material_to_product(db, pid, mid, per_unit)
+    return mid, pid
+
+
+def _balance(db, mid):
+    m = db.execute(select(Material).filter_by(id=mid)).scalar_one()
+    db.refresh(m)
+    return m.stock_qty, m.reserved_qty
+
+
+def _held(db, project_id):
+    return logic._project_reservations(db, project_id)
+
+
+def test_earlier_projects_reserve_first(db):
+    mid, pid = _setup(db, stock=10)
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3).id
+    p2 = logic.create_project(db, "P2", "", [], product_id=pid, quantity=3).id
+
+    assert _held(db, p1) == {mid: 6} and _held(db, p2) == {mid: 4}
+    assert _balance(db, mid) == (10, 10)
+
+
+def test_quantity_edit_re_reserves(db):
+    mid, pid = _setup(db, stock=10)
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3).id
+
+    logic.update_project_field(db, p1, "quantity", 1)
+    assert _held(db, p1) == {mid: 2} and _balance(db, mid) == (10, 2)
+
+    logic.update_project_fields(db, [(p1, "quantity", 1, 4)])
+    assert _held(db, p1) == {mid: 8} and _balance(db, mid) == (10, 8)
+
+
+def test_delivered_releases_the_hold(db):
+    mid, pid = _setup(db, stock=10)
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3).id
+
+    before = db.get(Project, p1).delivered
+    logic.update_project_fields(db, [(p1, "delivered", before, logic.DONE_VALUE)])
+
+    assert _held(db, p1) == {} and _balance(db, mid) == (10, 0)
+
+
+def test_product_change_moves_the_hold(db):
+    mid, pid = _setup(db, stock=10)
+    other = logic.create_material(db, "Bolt", stock_qty=5).id
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3).id
+    logic.create_product(db, "Stool")
+    logic.add_material_to_product(db, logic.get_products(db)[-1].id, other, 1)
+
+    # the product changes, the hold follows it
+    logic.update_project_field(db, p1, "product", "Stool")
+    assert _held(db, p1) == {other: 3}
+    assert _balance(db, mid) == (10, 0)
+
+    logic.start_project_deduct_inventory(db, p1)
+    assert _held(db, p1) == {}
+    assert _balance(db, other) == (2, 0)
+
+
+def test_deleting_a_project_releases_its_hold(db):
+    mid, pid = _setup(db, stock=10)
+    p1 = logic.create_project(db, "P1", "", [], product_id=pid, quantity=3).id
+
+    logic.delete_project(db, p1)
+
+    assert _balance(db, mid) == (10, 0)
@@ -1,21 +1,28 @@
-from functools import partial
-
-from PySide6.QtCore import Qt
+from PySide6.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    Qt,
+    QTimer,
+    Signal,
+)
 from PySide6.QtWidgets import (
+    QAbstractItemView,
     QComboBox,
+    QFileDialog,
     QHBoxLayout,
     QLabel,
     QLineEdit,
     QMessageBox,
     QPushButton,
     QSpinBox,
-    QTableWidget,
-    QTableWidgetItem,
+    QStyledItemDelegate,
+    QTableView,
     QTabWidget,
     QVBoxLayout,
     QWidget,
 )
 
+from bulk_import import import_materials
 from database import SessionLocal
 from logic import (
     add_history_entry,
@@ -23,8 +30,151 @@ from logic import (
     delete_material,
     get_material_by_name,
     get_materials,
-    update_material_details,
+    search_materials,
+    update_material_field,
 )
+from query_executor import run
+
+IMPORT_FILTER = "Catalog (*.csv *.xlsx)"
+MAX_SHOWN_ERRORS = 20
+SIZE_SAMPLE_ROWS = 50
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_LIMIT = 500
+
+# (header, MaterialRec field or None, editable)
+COLUMNS = [
+    ("ID", "id", False),
+    ("Name", "name", False),
+    ("Stock", "stock_qty", True),
+    ("Mat.", "material_type", True),
+    ("Profile", "tube_profile", True),
+    ("Len", "tube_length", True),
+    ("Qty", "tube_quantity", True),
+    ("Dim", "tube_dimension", True),
+    ("Thick", "tube_thickness", True),
+    ("Del", None, False),
+]
+DEL_COL = len(COLUMNS) - 1
+MATERIAL_TYPES = ["aluminium", "steel", "stainless"]
+PROFILES = ["nelikanttoru", "ümartoru"]
+
+
+def _save_material(db, material_id, field, value):
+    # only the edited column is written; stock is left alone unless edited
+    update_material_field(db, material_id, field, value)
+    add_history_entry(db, "Edit", f"id {material_id}")
+
+
+# ---------- model ----------
+class MaterialsTableModel(QAbstractTableModel):
+    """Materials as the cached MaterialRec tuples; no widget per cell."""
+
+    save_failed = Signal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        field = COLUMNS[index.column()][1]
+        if role == Qt.DisplayRole:
+            if field is None:
+                return "X"
+            val = getattr(self._rows[index.row()], field)
+            return "" if val is None else str(val)
+        if role == Qt.EditRole and field is not None:
+            return getattr(self._rows[index.row()], field)
+        if role == Qt.TextAlignmentRole and field is None:
+            return Qt.AlignCenter
+        return None
+
+    def flags(self, index):
+        fl = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if COLUMNS[index.column()][2]:
+            fl |= Qt.ItemIsEditable
+        return fl
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not COLUMNS[index.column()][2]:
+            return False
+        field = COLUMNS[index.column()][1]
+        m = self._rows[index.row()]
+        if isinstance(value, str):
+            value = value.strip()
+        if getattr(m, field) == value:
+            return False
+        m = m._replace(**{field: value})
+        self._rows[index.row()] = m
+        self.dataChanged.emit(index, index)
+        run(_save_material, m.id, field, value, on_error=self.save_failed.emit)
+        return True
+
+    def material_id(self, row: int) -> int:
+        return self._rows[row].id
+
+
+# ---------- delegates ----------
+# editors exist only while a cell is being edited
+class SpinDelegate(QStyledItemDelegate):
+    def __init__(self, maximum, parent=None):
+        super().__init__(parent)
+        self._maximum = maximum
+
+    def createEditor(self, parent, option, index):
+        spin = QSpinBox(parent)
+        spin.setMaximum(self._maximum)
+        return spin
+
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(Qt.EditRole) or 0)
+
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value(), Qt.EditRole)
+
+
+class ChoiceDelegate(QStyledItemDelegate):
+    def __init__(self, choices, parent=None):
+        super().__init__(parent)
+        self._choices = choices
+
+    def createEditor(self, parent, option, index):
+        cmb = QComboBox(parent)
+        cmb.addItems(self._choices)
+        # picking a value saves it, no extra click needed
+        cmb.activated.connect(lambda _: self._commit(cmb))
+        QTimer.singleShot(0, cmb.showPopup)
+        return cmb
+
+    def setEditorData(self, editor, index):
+        val = index.data(Qt.EditRole)
+        if val in self._choices:
+            editor.setCurrentText(val)
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
+
+    def _commit(self, editor):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
 
 
 class AddDetailsWidget(QWidget):
@@ -123,25 +273,40 @@ class AddDetailsWidget(QWidget):
         _, row = self._row(lay)
         row.addWidget(QLabel("Search:"))
         self.search_edit = QLineEdit()
-        self.search_edit.textChanged.connect(self.update_table)
+        # indexed search once typing pauses
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self.update_table)
+        self.search_edit.textChanged.connect(self._search_timer.start)
         row.addWidget(self.search_edit)
-
-        self.table = QTableWidget()
-        self.table.setColumnCount(10)
-        self.table.setHorizontalHeaderLabels(
-            [
-                "ID",
-                "Name",
-                "Stock",
-                "Mat.",
-                "Profile",
-                "Len",
-                "Qty",
-                "Dim",
-                "Thick",
-                "Del",
-            ]
+        import_btn = QPushButton("Import…")
+        import_btn.clicked.connect(self.import_file)
+        row.addWidget(import_btn)
+
+        self.model = MaterialsTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(
+            QAbstractItemView.DoubleClicked
+            | QAbstractItemView.SelectedClicked
+            | QAbstractItemView.EditKeyPressed
         )
+        self._delegates = [
+            (2, SpinDelegate(99999, self.table)),
+            (3, ChoiceDelegate(MATERIAL_TYPES, self.table)),
+            (4, ChoiceDelegate(PROFILES, self.table)),
+            (5, SpinDelegate(10000, self.table)),
+            (6, SpinDelegate(10000, self.table)),
+        ]
+        for col, delegate in self._delegates:
+            self.table.setItemDelegateForColumn(col, delegate)
+        # column widths from a sample of rows, not the whole catalogue
+        self.table.horizontalHeader().setResizeContentsPrecision(SIZE_SAMPLE_ROWS)
+        self.table.clicked.connect(self._on_clicked)
+        self.model.save_failed.connect(self._save_failed)
+        self._autosize = True
+        self.model.modelReset.connect(self._on_rows_loaded)
         lay.addWidget(self.table)
         return w
 
@@ -184,79 +349,73 @@ class AddDetailsWidget(QWidget):
             add_history_entry(db, "Add", name)
         self.refresh()
 
+    def import_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import materials", "", IMPORT_FILTER
+        )
+        if not path:
+            return
+        run(
+            import_materials, path, on_done=self._imported, on_error=self._import_failed
+        )
+
+    def _imported(self, result):
+        msg = f"Added {result.inserted}, updated {result.updated}."
+        if result.errors:
+            lines = [f"line {e.line}: {e.message}" for e in result.errors]
+            more = len(lines) - MAX_SHOWN_ERRORS
+            msg += f"\n\n{len(lines)} rows skipped:\n" + "\n".join(
+                lines[:MAX_SHOWN_ERRORS]
+            )
+            if more > 0:
+                msg += f"\n… and {more} more"
+            QMessageBox.warning(self, "Import", msg)
+        else:
+            QMessageBox.information(self, "Import", msg)
+        self.refresh()
+
+    def _import_failed(self, e):
+        QMessageBox.critical(self, "Import", str(e))
+
     def update_table(self):
-        with SessionLocal() as db:
-            data = get_materials(db)
-            term = self.search_edit.text().lower().strip()
-            if term:
-                data = [m for m in data if term in m.name.lower()]
-
-            self.table.setRowCount(len(data))
-            for r, m in enumerate(data):
-                self.table.setItem(r, 0, QTableWidgetItem(str(m.id)))
-                self.table.setItem(r, 1, QTableWidgetItem(m.name))
-
-                stock_spin = QSpinBox()
-                stock_spin.setMaximum(99999)
-                stock_spin.setValue(m.stock_qty)
-                self.table.setCellWidget(r, 2, stock_spin)
-
-                mat_combo = QComboBox()
-                mat_combo.addItems(["aluminium", "steel", "stainless"])
-                if m.material_type:
-                    mat_combo.setCurrentText(m.material_type)
-                self.table.setCellWidget(r, 3, mat_combo)
-
-                prof_combo = QComboBox()
-                prof_combo.addItems(["nelikanttoru", "ümartoru"])
-                if m.tube_profile:
-                    prof_combo.setCurrentText(m.tube_profile)
-                self.table.setCellWidget(r, 4, prof_combo)
-
-                len_spin = QSpinBox()
-                len_spin.setMaximum(10000)
-                len_spin.setValue(m.tube_length or 0)
-                qty_spin = QSpinBox()
-                qty_spin.setMaximum(10000)
-                qty_spin.setValue(m.tube_quantity or 0)
-                dim_edit = QLineEdit(m.tube_dimension or "")
-                thick_edit = QLineEdit(m.tube_thickness or "")
-
-                self.table.setCellWidget(r, 5, len_spin)
-                self.table.setCellWidget(r, 6, qty_spin)
-                self.table.setCellWidget(r, 7, dim_edit)
-                self.table.setCellWidget(r, 8, thick_edit)
-
-                del_btn = QPushButton("X")
-                del_btn.clicked.connect(partial(self._delete, m.id))
-                self.table.setCellWidget(r, 9, del_btn)
-
-                save = lambda *_, mid=m.id, s=stock_spin, l=len_spin, q=qty_spin, d=dim_edit, t=thick_edit, ma=mat_combo, pr=prof_combo: self._save(
-                    mid,
-                    s.value(),
-                    l.value(),
-                    q.value(),
-                    d.text(),
-                    t.text(),
-                    ma.currentText(),
-                    pr.currentText(),
-                )
-                stock_spin.editingFinished.connect(save)
-                len_spin.editingFinished.connect(save)
-                qty_spin.editingFinished.connect(save)
-                dim_edit.editingFinished.connect(save)
-                thick_edit.editingFinished.connect(save)
-                mat_combo.currentTextChanged.connect(save)
-                prof_combo.currentTextChanged.connect(save)
-
-    def _save(self, mid, stock, length, qty, dim, thick, mat, prof):
-        with SessionLocal() as db:
-            update_material_details(db, mid, stock, length, qty, dim, thick, prof, mat)
-            add_history_entry(db, "Edit", f"id {mid}")
+        self._search_timer.stop()
+        term = self.search_edit.text().strip()
+        if term:
+            run(
+                search_materials,
+                term,
+                SEARCH_LIMIT,
+                on_done=self.model.set_rows,
+                key=self,
+            )
+        else:
+            run(get_materials, on_done=self.model.set_rows, key=self)
+
+    def _on_rows_loaded(self):
+        # widths from the first load only; later reloads keep the user's
+        if self._autosize:
+            self._autosize = False
+            self.table.resizeColumnsToContents()
+
+    def _on_clicked(self, index):
+        if index.column() == DEL_COL:
+            self._delete(self.model.material_id(index.row()))
+        elif isinstance(
+            self.table.itemDelegateForColumn(index.column()), ChoiceDelegate
+        ):
+            self.table.edit(index)
+
+    def _save_failed(self, e):
+        QMessageBox.warning(self, "Warn", f"Save failed: {e}")
+        self.refresh()  # back to what is stored
 
     def _delete(self, mid):
         with SessionLocal() as db:
-            m = delete_material(db, mid)
+            try:
+                m = delete_material(db, mid)
+            except ValueError as e:
+                QMessageBox.warning(self, "Warn", str(e))
+                return
             if m:
                 add_history_entry(db, "Delete", m.name)
         self.refresh()
@@ -1,4 +1,4 @@
-from PySide6.QtCore import QEvent
+from PySide6.QtCore import QEvent, Qt
 from PySide6.QtWidgets import (
     QApplication,
     QComboBox,
@@ -8,6 +8,9 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QPushButton,
     QSpinBox,
+    QStyledItemDelegate,
+    QTableWidget,
+    QTableWidgetItem,
     QTabWidget,
     QTextEdit,
     QVBoxLayout,
@@ -15,8 +18,40 @@ from PySide6.QtWidgets import (
 )
 
 from database import SessionLocal
-from logic import add_history_entry, create_project, get_product_parts, get_products
-from models import Product
+from logic import (
+    add_history_entry,
+    create_project,
+    create_projects_bulk,
+    get_products,
+)
+from query_executor import run
+
+ORDER_HEADERS = ["Toode", "Kogus", "Projekti nimi", "Märkused"]
+ORDER_ROWS = 5  # tühje ridu uue tellimuse alguses
+
+
+# ───────── order lines ─────────
+class ProductDelegate(QStyledItemDelegate):
+    """Toote valik tellimuse real – combo ainult muudetava lahtri jaoks."""
+
+    def __init__(self, names, parent=None):
+        super().__init__(parent)
+        self._names = names  # list, mida vidin värskendab
+
+    def createEditor(self, parent, option, index):
+        cmb = QComboBox(parent)
+        cmb.setEditable(True)  # trükkides leiab pikast nimekirjast
+        cmb.setInsertPolicy(QComboBox.NoInsert)
+        cmb.addItems(self._names)
+        return cmb
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.EditRole) or "")
+
+    def setModelData(self, editor, model, index):
+        name = editor.currentText().strip()
+        if not name or name in self._names:
+            model.setData(index, name, Qt.EditRole)
 
 
 class AddProjectWidget(QWidget):
@@ -61,11 +96,52 @@ class AddProjectWidget(QWidget):
         save.clicked.connect(self._save)
         lay.addWidget(save)
 
+        self.tabs.addTab(self._build_order_tab(), "Tellimus")
+
         self._refresh_products()
+        self._refresh_order_products()
+
+    def _build_order_tab(self):
+        # mitu rida korraga: üks projekt rea kohta, salvestus ühe transaktsioonina
+        w = QWidget()
+        lay = QVBoxLayout(w)
+
+        self.order_delivery = self._line(lay, "Tarne:")
+        self.order_customer = self._line(lay, "Tellija:")
+        self.order_customer.editingFinished.connect(self._refresh_order_products)
+        self.order_number = self._line(lay, "Tellimuse nr:")
+
+        self._product_names: list[str] = []
+        self.order_table = QTableWidget(0, len(ORDER_HEADERS))
+        self.order_table.setHorizontalHeaderLabels(ORDER_HEADERS)
+        self.order_table.horizontalHeader().setStretchLastSection(True)
+        self.order_table.setItemDelegateForColumn(
+            0, ProductDelegate(self._product_names, self.order_table)
+        )
+        lay.addWidget(self.order_table)
+
+        row = QHBoxLayout()
+        lay.addLayout(row)
+        add_btn = QPushButton("Lisa rida")
+        add_btn.clicked.connect(self._add_order_row)
+        row.addWidget(add_btn)
+        del_btn = QPushButton("Eemalda rida")
+        del_btn.clicked.connect(
+            lambda: self.order_table.removeRow(self.order_table.currentRow())
+        )
+        row.addWidget(del_btn)
+        row.addStretch()
+        self.order_save = QPushButton("Salvesta tellimus")
+        self.order_save.clicked.connect(self._save_order)
+        row.addWidget(self.order_save)
+
+        self._reset_order()
+        return w
 
     def showEvent(self, event: QEvent):
         super().showEvent(event)
         self._refresh_products()
+        self._refresh_order_products()
 
     # ───────── Layout helpers ─────────
     def _line(self, parent, lbl):
@@ -95,8 +171,8 @@ class AddProjectWidget(QWidget):
         return te
 
     # ───────── Data helpers ─────────
-    def _refresh_products(self):
-        cust = self.customer.text().strip()
+    def _load_products(self, customer: str):
+        cust = customer.strip()
         with SessionLocal() as db:
             products = (
                 get_products(db, category_names=[cust]) if cust else get_products(db)
@@ -105,6 +181,15 @@ class AddProjectWidget(QWidget):
             # et valik ei muutuks kasutamise käigus tühjaks
             if cust and not products:
                 products = get_products(db)
+        return products
+
+    def _refresh_order_products(self):
+        # tellimuse ridade oma nimekiri, üksiku projekti valik jääb puutumata
+        names = [p.name for p in self._load_products(self.order_customer.text())]
+        self._product_names[:] = names
+
+    def _refresh_products(self):
+        products = self._load_products(self.customer.text())
 
         current_name = self.product_combo.currentText()
         self.product_combo.blockSignals(True)
@@ -123,44 +208,92 @@ class AddProjectWidget(QWidget):
             QMessageBox.warning(self, "Hoiatus", "Nimi puudub.")
             return
 
-        selected_product_name = self.product_combo.currentText().strip()
-        parts_to_use = []
-
         with SessionLocal() as db:
-            if selected_product_name:
-                prod: Product | None = (
-                    db.query(Product).filter_by(name=selected_product_name).first()
-                )
-                if prod:
-                    prod_parts = get_product_parts(db, prod.id)
-                    parts_to_use = [
-                        {
-                            "material_id": pp.material_id,
-                            "quantity_required": pp.quantity_required
-                            * self.quantity.value(),
-                        }
-                        for pp in prod_parts
-                    ]
-
+            # BOM laiendatakse logic-is, toote järgi
             create_project(
                 db,
                 name=self.pname.text().strip(),
                 description=self.desc.toPlainText().strip(),
-                parts=parts_to_use,
+                parts=[],
                 delivery=self.delivery.text().strip(),
                 customer=self.customer.text().strip(),
                 order_number=self.order_nr.text().strip(),
-                product=selected_product_name,
+                product_id=self.product_combo.currentData(),
                 notes=self.notes.text().strip(),
                 quantity=self.quantity.value(),
             )
             add_history_entry(db, "Projekt loodud", self.pname.text().strip())
 
+        self._refresh_plan()
+        self._reset()
+
+    def _refresh_plan(self):
         main_win = QApplication.instance().activeWindow()
         if hasattr(main_win, "views") and "production_plan" in main_win.views:
             main_win.views["production_plan"].refresh()
 
-        self._reset()
+    def _order_lines(self) -> list[dict]:
+        orders = []
+        header = {
+            "delivery": self.order_delivery.text().strip(),
+            "customer": self.order_customer.text().strip(),
+            "order_number": self.order_number.text().strip(),
+        }
+        for r in range(self.order_table.rowCount()):
+            cells = [self.order_table.item(r, c) for c in range(len(ORDER_HEADERS))]
+            product, qty, name, notes = (
+                c.data(Qt.EditRole) if c is not None else None for c in cells
+            )
+            if not product:
+                continue
+            if not isinstance(qty, int) or qty <= 0:
+                raise ValueError(f"Rida {r + 1}: kogus peab olema positiivne")
+            orders.append(
+                {
+                    **header,
+                    "name": (name or "").strip() or product,
+                    "description": "",
+                    "product": product,
+                    "quantity": qty,
+                    "notes": (notes or "").strip(),
+                }
+            )
+        return orders
+
+    def _save_order(self):
+        try:
+            orders = self._order_lines()
+        except ValueError as e:
+            QMessageBox.warning(self, "Hoiatus", str(e))
+            return
+        if not orders:
+            QMessageBox.warning(self, "Hoiatus", "Tellimusel pole ridu.")
+            return
+        self.order_save.setEnabled(False)
+        run(
+            create_projects_bulk,
+            orders,
+            on_done=self._order_saved,
+            on_error=self._order_failed,
+        )
+
+    def _order_saved(self, ids):
+        self.order_save.setEnabled(True)
+        nr = self.order_number.text().strip()
+        run(add_history_entry, "Tellimus sisestatud", f"{nr}: {len(ids)} projekti")
+        self._refresh_plan()
+        self._reset_order()
+
+    def _order_failed(self, e):
+        self.order_save.setEnabled(True)
+        QMessageBox.warning(self, "Hoiatus", f"Tellimust ei salvestatud: {e}")
+
+    def _add_order_row(self):
+        r = self.order_table.rowCount()
+        self.order_table.insertRow(r)
+        qty = QTableWidgetItem()
+        qty.setData(Qt.EditRole, 1)  # int → arvuväli
+        self.order_table.setItem(r, 1, qty)
 
     # ───────── Reset ─────────
     def _reset(self):
@@ -175,3 +308,10 @@ class AddProjectWidget(QWidget):
         self.quantity.setValue(1)
         self.desc.clear()
         self.product_combo.setCurrentIndex(0)
+
+    def _reset_order(self):
+        for w in [self.order_delivery, self.order_customer, self.order_number]:
+            w.clear()
+        self.order_table.setRowCount(0)
+        for _ in range(ORDER_ROWS):
+            self._add_order_row()
@@ -1,14 +1,101 @@
-from PySide6.QtCore import Qt
+from datetime import datetime, time, timedelta
+
+from PySide6.QtCore import QAbstractTableModel, QDate, QModelIndex, Qt
 from PySide6.QtWidgets import (
+    QCheckBox,
+    QDateEdit,
+    QFileDialog,
+    QHBoxLayout,
     QLabel,
-    QTableWidget,
-    QTableWidgetItem,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
 
-from database import SessionLocal
-from logic import get_history
+from export import export
+from logic import get_history_page
+from query_executor import Progress, run
+from ui_feedback import show_error, show_status
+
+HEADERS = ["ID", "Aeg", "Projekti ID", "Tegevus", "Detailid"]
+PAGE_SIZE = 200
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """Ajalugu uuemast vanemani; järgmine leht loetakse viimase rea võtmest."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._exhausted = False
+        self._loading = False
+        self._filters = {}
+
+    def set_filters(self, **filters):
+        self._filters = filters
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        after = (self._rows[-1][1], self._rows[-1][0]) if self._rows else None
+        self._loading = True
+        run(
+            get_history_page,
+            PAGE_SIZE,
+            after,
+            **self._filters,
+            on_done=self._append_page,
+            on_error=self._load_failed,
+            key=self,
+        )
+
+    def _load_failed(self, error):
+        self._loading = False
+        self._exhausted = True
+        show_error("Viga", f"Ajaloo laadimine ebaõnnestus: {error}")
+
+    def _append_page(self, page):
+        self._loading = False
+        self._exhausted = len(page) < PAGE_SIZE
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        entry = self._rows[index.row()]
+        col = index.column()
+        if col == 1:
+            ts = entry.timestamp
+            return ts.strftime("%Y-%m-%d %H:%M:%S") if ts else ""
+        if col == 2:
+            return str(entry.project_id) if entry.project_id else "Puudub"
+        return str(entry[col])
 
 
 class HistoryWidget(QWidget):
@@ -25,39 +112,93 @@ class HistoryWidget(QWidget):
         title.setStyleSheet("font-size: 24px; font-weight: bold; margin: 10px;")
         layout.addWidget(title)
 
-        # Ajaloo tabel
-        self.history_table = QTableWidget()
-        self.history_table.setColumnCount(5)
-        self.history_table.setHorizontalHeaderLabels(
-            ["ID", "Aeg", "Projekti ID", "Tegevus", "Detailid"]
+        # Filtrid
+        filters = QHBoxLayout()
+        layout.addLayout(filters)
+        filters.addWidget(QLabel("Tegevus:"))
+        self.action_edit = QLineEdit()
+        self.action_edit.editingFinished.connect(self.refresh)
+        filters.addWidget(self.action_edit)
+
+        filters.addWidget(QLabel("Projekti ID:"))
+        self.project_edit = QLineEdit()
+        self.project_edit.setMaximumWidth(80)
+        self.project_edit.editingFinished.connect(self.refresh)
+        filters.addWidget(self.project_edit)
+
+        self.range_check = QCheckBox("Ajavahemik:")
+        self.range_check.toggled.connect(self.refresh)
+        filters.addWidget(self.range_check)
+        self.date_from = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.date_to = QDateEdit(QDate.currentDate())
+        for de in (self.date_from, self.date_to):
+            de.setCalendarPopup(True)
+            de.dateChanged.connect(
+                lambda _: self.refresh() if self.range_check.isChecked() else None
+            )
+            filters.addWidget(de)
+        filters.addStretch()
+
+        export_btn = QPushButton("Ekspordi…")
+        export_btn.clicked.connect(self.export_history)
+        filters.addWidget(export_btn)
+        self._export_progress = Progress(self)
+        self._export_progress.changed.connect(
+            lambda n: show_status(f"Eksport: {n} rida…")
         )
+
+        # Ajaloo tabel
+        self.model = HistoryTableModel(self)
+        self.history_table = QTableView()
+        self.history_table.setModel(self.model)
+        self._autosize = True
+        self.model.rowsInserted.connect(self._on_rows_inserted)
         layout.addWidget(self.history_table)
 
         self.refresh()
 
+    def _filters(self):
+        filters = {"action": self.action_edit.text().strip() or None}
+        pid = self.project_edit.text().strip()
+        if pid.isdigit():
+            filters["project_id"] = int(pid)
+        if self.range_check.isChecked():
+            start = self.date_from.date().toPython()
+            end = self.date_to.date().toPython() + timedelta(days=1)
+            filters["since"] = datetime.combine(start, time.min)
+            filters["until"] = datetime.combine(end, time.min)
+        return filters
+
+    def export_history(self):
+        """Ekspordib ajaloo (valitud ajavahemikuga) faili, taustal voona."""
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Ekspordi ajalugu",
+            "ajalugu.csv",
+            "CSV (*.csv);;JSON Lines (*.jsonl);;Parquet (*.parquet)",
+        )
+        if not path:
+            return
+        f = self._filters()
+        run(
+            export,
+            "history",
+            path,
+            since=f.get("since"),
+            until=f.get("until"),
+            progress=self._export_progress.report,
+            on_done=lambda n: QMessageBox.information(
+                self, "Eksport", f"{n} rida salvestatud: {path}"
+            ),
+            on_error=lambda e: QMessageBox.critical(self, "Eksport", str(e)),
+        )
+
     def refresh(self):
-        """Laeb tegevuste ajaloo andmebaasist ja kuvab tabelis."""
-        with SessionLocal() as db:
-            history_entries = get_history(db)
-            self.history_table.setRowCount(len(history_entries))
-
-            for i, entry in enumerate(history_entries):
-
-                def create_item(value):
-                    item = QTableWidgetItem(str(value))
-                    item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                    return item
-
-                self.history_table.setItem(i, 0, create_item(entry.id))
-                self.history_table.setItem(
-                    i, 1, create_item(entry.timestamp.strftime("%Y-%m-%d %H:%M:%S"))
-                )
-                self.history_table.setItem(
-                    i,
-                    2,
-                    create_item(entry.project_id if entry.project_id else "Puudub"),
-                )
-                self.history_table.setItem(i, 3, create_item(entry.action))
-                self.history_table.setItem(i, 4, create_item(entry.details))
+        """Laeb ajaloo esimese lehe andmebaasist; ülejäänu kerimisel."""
+        self.model.set_filters(**self._filters())
 
+    def _on_rows_inserted(self, *_):
+        # veerulaiused ainult esimese lehe järgi
+        if self._autosize:
+            self._autosize = False
             self.history_table.resizeColumnsToContents()
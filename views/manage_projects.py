@@ -1,56 +1,234 @@
 # views/manage_projects.py
 from PySide6 import QtGui
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer
 from PySide6.QtWidgets import (
+    QAbstractItemView,
     QComboBox,
     QHBoxLayout,
     QLabel,
     QLineEdit,
     QMessageBox,
-    QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QStyledItemDelegate,
+    QTableView,
     QTabWidget,
     QVBoxLayout,
     QWidget,
 )
 
-from database import SessionLocal
-from logic import delete_project, get_projects, update_project_field
+from logic import PLAN_FIELDS, delete_project, search_projects
+from query_executor import run
+from ui_feedback import show_error, show_status
 from views.add_project import AddProjectWidget
+from write_behind import WriteBehindQueue
 
 STATUS_VALUES = ["-", "Ootel", "Töös", "Valmis"]
-FIELDS = [
-    "delivery",
-    "customer",
-    "order_number",
-    "product",
-    "notes",
-    "quantity",
-    "afterone",
-    "cutting",
-    "laser",
-    "bending",
-    "drilling",
-    "welding",
-    "grinding",
-    "coating",
-    "delivered",
-]
+FIELDS = PLAN_FIELDS  # mudeli rida: (id, *FIELDS), nagu search_projects tagastab
+STATUS_COLS = range(7, len(FIELDS) + 1)
 DEL_COL = len(FIELDS) + 1
 IND_COL = len(FIELDS) + 2
+HEADERS = [
+    "ID",
+    "Tarne",
+    "Tellija",
+    "Tellimuse nr",
+    "Toode",
+    "Märkus",
+    "Kogus",
+    "Afterone",
+    "Lõikus",
+    "Laser",
+    "Painutus",
+    "Puurimine",
+    "Keevitus",
+    "Lihvimine",
+    "Pinnatöötlus",
+    "Tarnitud",
+    "Del",
+    "Ind",
+]
 COLOR_MAP = {
     "Valmis": "#8BC34A",
     "Töös": "#FFEB3B",
     "Ootel": "#F44336",
     "-": "#F44336",
 }
+PAGE_SIZE = 200
+SEARCH_DEBOUNCE_MS = 250
+
+
+# ───────── model ─────────
+class ProjectsTableModel(QAbstractTableModel):
+    """Tootmisplaan lehekülgede kaupa; read on lihtsad listid (id, *FIELDS).
+
+    Muudatused lähevad kirjutusjärjekorda ja salvestatakse partiidena.
+    """
+
+    def __init__(self, writes: WriteBehindQueue, parent=None):
+        super().__init__(parent)
+        self._writes = writes
+        self._rows: list[list] = []
+        self._offset = 0
+        self._exhausted = False
+        self._loading = False
+        self._term = ""
+        self._status = None
+
+    # ---------- loading ----------
+    def set_filter(self, term: str, status: str, force: bool = False):
+        term = term.strip()
+        status = None if status == "Kõik" else status
+        if not force and (term, status) == (self._term, self._status):
+            return
+        self._term = term
+        self._status = status
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self._rows = []
+        self._offset = 0
+        self._exhausted = False
+        self._loading = False  # vana filtri leht tühistatakse run(key=self) kaudu
+        self.endResetModel()
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        # leht loetakse taustal; vaade küsib järgmist alles pärast _append_page
+        self._loading = True
+        run(
+            search_projects,
+            self._term,
+            self._status,
+            PAGE_SIZE,
+            self._offset,
+            on_done=self._append_page,
+            on_error=self._load_failed,
+            key=self,
+        )
+
+    def _load_failed(self, error):
+        self._loading = False
+        self._exhausted = True
+        show_error("Viga", f"Tootmisplaani laadimine ebaõnnestus: {error}")
+
+    def _append_page(self, page):
+        self._loading = False
+        self._offset += len(page)
+        self._exhausted = len(page) < PAGE_SIZE
+        if not page:
+            return
+        new = [list(r) for r in page]
+        # salvestamata muudatused üle, muidu hüppaks lahter vanale väärtusele
+        pending = self._writes.pending()
+        if pending:
+            by_id = {r[0]: r for r in new}
+            for (pid, field), value in pending.items():
+                if pid in by_id:
+                    by_id[pid][FIELDS.index(field) + 1] = value
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+        self._rows.extend(new)
+        self.endInsertRows()
+
+    # ---------- Qt API ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = self._rows[index.row()], index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if col == DEL_COL:
+                return "X"
+            if col == IND_COL:
+                return ""
+            val = row[col]
+            return "" if val is None else str(val)
+        if role == Qt.BackgroundRole and col == IND_COL:
+            return QtGui.QColor(COLOR_MAP.get(row[len(FIELDS)], "#F44336"))
+        if role == Qt.TextAlignmentRole and col == DEL_COL:
+            return Qt.AlignCenter
+        return None
+
+    def flags(self, index):
+        fl = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() not in (0, DEL_COL, IND_COL):
+            fl |= Qt.ItemIsEditable
+        return fl
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not (0 < index.column() < DEL_COL):
+            return False
+        row = self._rows[index.row()]
+        if row[index.column()] == value:
+            return False
+        self._writes.put(row[0], FIELDS[index.column() - 1], row[index.column()], value)
+        self._set_cell(index.row(), index.column(), value)
+        return True
+
+    def _set_cell(self, r: int, col: int, value):
+        self._rows[r][col] = value
+        idx = self.index(r, col)
+        self.dataChanged.emit(idx, idx)
+        if col == len(FIELDS):  # delivered → indikaator
+            ind = self.index(r, IND_COL)
+            self.dataChanged.emit(ind, ind)
+
+    def apply_conflicts(self, conflicts):
+        # näita andmebaasis olevat väärtust, mitte kaotatud muudatust
+        cells = {
+            (c.project_id, FIELDS.index(c.field) + 1): c.current for c in conflicts
+        }
+        for r, row in enumerate(self._rows):
+            for (pid, col), value in cells.items():
+                if pid == row[0]:
+                    self._set_cell(r, col, value)
+
+    def project_id(self, row: int) -> int:
+        return self._rows[row][0]
+
+
+# ───────── delegate ─────────
+class StatusDelegate(QStyledItemDelegate):
+    """Staatuse valik – combo luuakse ainult muudetava lahtri jaoks."""
+
+    def createEditor(self, parent, option, index):
+        cmb = QComboBox(parent)
+        cmb.addItems(STATUS_VALUES)
+        # üks klõps valikul salvestab kohe
+        cmb.activated.connect(lambda _: self._commit(cmb))
+        QTimer.singleShot(0, cmb.showPopup)
+        return cmb
+
+    def setEditorData(self, editor, index):
+        val = index.data(Qt.EditRole)
+        if val in STATUS_VALUES:
+            editor.setCurrentText(val)
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
+
+    def _commit(self, editor):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
 
 
 class ManageProjectsWidget(QWidget):
     def __init__(self):
         super().__init__()
-        self._building = False
         self._ui()
 
     # ---------- UI ----------
@@ -73,164 +251,97 @@ class ManageProjectsWidget(QWidget):
         lay.addLayout(filters)
         filters.addWidget(QLabel("Otsi:"))
         self.search_edit = QLineEdit()
-        self.search_edit.textChanged.connect(self.refresh)
+        # päring alles siis, kui trükkimine korraks peatub
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(lambda: self.refresh(force=False))
+        self.search_edit.textChanged.connect(self._search_timer.start)
         filters.addWidget(self.search_edit)
 
         filters.addWidget(QLabel("Staatus:"))
         self.status_filter = QComboBox()
         self.status_filter.addItems(["Kõik"] + STATUS_VALUES)
-        self.status_filter.currentTextChanged.connect(self.refresh)
+        self.status_filter.currentTextChanged.connect(
+            lambda _: self.refresh(force=False)
+        )
+        filters.addWidget(self.status_filter)
         filters.addStretch()
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(FIELDS) + 3)
-        self.table.setHorizontalHeaderLabels(
-            [
-                "ID",
-                "Tarne",
-                "Tellija",
-                "Tellimuse nr",
-                "Toode",
-                "Märkus",
-                "Kogus",
-                "Afterone",
-                "Lõikus",
-                "Laser",
-                "Painutus",
-                "Puurimine",
-                "Keevitus",
-                "Lihvimine",
-                "Pinnatöötlus",
-                "Tarnitud",
-                "Del",
-                "Ind",
-            ]
+        self.writes = WriteBehindQueue(self)
+        self.writes.conflicts.connect(self._on_conflicts)
+        self.writes.failed.connect(
+            lambda e: show_status(f"Salvestamine ebaõnnestus, proovin uuesti: {e}")
+        )
+        self.model = ProjectsTableModel(self.writes, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(
+            QAbstractItemView.DoubleClicked
+            | QAbstractItemView.SelectedClicked
+            | QAbstractItemView.EditKeyPressed
         )
-        self.table.itemChanged.connect(self._on_item_changed)
+        self._status_delegate = StatusDelegate(self.table)
+        for col in STATUS_COLS:
+            self.table.setItemDelegateForColumn(col, self._status_delegate)
+        self.table.clicked.connect(self._on_clicked)
+        self._autosize = False
+        self.model.rowsInserted.connect(self._on_rows_inserted)
         lay.addWidget(self.table)
 
         # ---- LISA TELLIMUS -------------------------------------------------
         add_tab = AddProjectWidget()
         self.tabs.addTab(add_tab, "Lisa tellimus")
         self.tabs.currentChanged.connect(
-            lambda idx: self.refresh() if idx == 0 else None
+            lambda idx: self.refresh() if idx == 0 else self.flush()
         )
 
         self.refresh()
 
     # ---------- data -------------------------------------------------------
-    def refresh(self):
+    def refresh(self, force: bool = True):
         if self.tabs.currentIndex() != 0:
             return
-        self._building = True
-        with SessionLocal() as db:
-            projects = get_projects(db)
-
-        term = self.search_edit.text().lower().strip()
-        need = self.status_filter.currentText()
-
-        def show(p):
-            if (
-                term
-                and term not in (p.customer or "").lower()
-                and term not in (p.product or "").lower()
-            ):
-                return False
-            if need != "Kõik":
-                if need not in (
-                    p.afterone,
-                    p.cutting,
-                    p.laser,
-                    p.bending,
-                    p.drilling,
-                    p.welding,
-                    p.grinding,
-                    p.coating,
-                    p.delivered,
-                ):
-                    return False
-            return True
-
-        rows = [p for p in projects if show(p)]
-        self.table.setRowCount(len(rows))
-
-        for r, p in enumerate(rows):
-            self._set(r, 0, p.id, lock=True)
-            plain = [
-                p.delivery,
-                p.customer,
-                p.order_number,
-                p.product,
-                p.notes,
-                p.quantity,
-            ]
-            for i, v in enumerate(plain, 1):
-                self._set(r, i, v)
-
-            stats = [
-                p.afterone,
-                p.cutting,
-                p.laser,
-                p.bending,
-                p.drilling,
-                p.welding,
-                p.grinding,
-                p.coating,
-                p.delivered,
-            ]
-            for i, v in enumerate(stats, 7):
-                self._status(r, i, v)
-
-            d = QPushButton("X")
-            d.setFixedSize(28, 28)  # väiksem del-nupp
-            d.clicked.connect(lambda _, pid=p.id: self._delete(pid))
-            self.table.setCellWidget(r, DEL_COL, d)
-
-            self._indicator(r, p.delivered)
-
-        self.table.resizeColumnsToContents()
-        self._building = False
-
-    # ---------- helpers ----------------------------------------------------
-    def _set(self, row, col, val, *, lock=False):
-        it = QTableWidgetItem("" if val is None else str(val))
-        if lock:
-            it.setFlags(it.flags() & ~Qt.ItemIsEditable)
-        self.table.setItem(row, col, it)
-
-    def _status(self, row, col, val):
-        cmb = QComboBox()
-        cmb.addItems(STATUS_VALUES)
-        if val in STATUS_VALUES:
-            cmb.setCurrentText(val)
-        cmb.currentTextChanged.connect(
-            lambda v, r=row, c=col: self._commit_status(r, c, v)
+        self._search_timer.stop()
+        if self.model.rowCount() == 0:
+            self._autosize = True
+        self.model.set_filter(
+            self.search_edit.text(), self.status_filter.currentText(), force
         )
-        cmb.setMinimumHeight(28)
-        self.table.setCellWidget(row, col, cmb)
 
-    def _indicator(self, row, delivered):
-        it = QTableWidgetItem("")
-        it.setFlags(it.flags() & ~Qt.ItemIsEditable)
-        it.setBackground(QtGui.QColor(COLOR_MAP.get(delivered, "#F44336")))
-        self.table.setItem(row, IND_COL, it)
+    def _on_rows_inserted(self, *_):
+        # mõõda veerge ainult esimese lehe järgi
+        if self._autosize:
+            self._autosize = False
+            self.table.resizeColumnsToContents()
+
+    def flush(self, sync: bool = False):
+        """Salvestab ootel muudatused kohe (vaate vahetus, sulgemine)."""
+        if sync:
+            self.writes.flush_sync()
+        else:
+            self.writes.flush()
+
+    def _on_conflicts(self, conflicts):
+        self.model.apply_conflicts(conflicts)
+        lines = [
+            f"#{c.project_id} {HEADERS[FIELDS.index(c.field) + 1]}: "
+            f"'{c.expected}' → '{c.current}'"
+            for c in conflicts
+        ]
+        QMessageBox.warning(
+            self,
+            "Konflikt",
+            "Neid lahtreid muudeti vahepeal mujal, sinu muudatust ei salvestatud:\n"
+            + "\n".join(lines),
+        )
 
     # ---------- events -----------------------------------------------------
-    def _on_item_changed(self, it):
-        if self._building or it.column() in (0, DEL_COL, IND_COL):
-            return
-        field = FIELDS[it.column() - 1]
-        pid = int(self.table.item(it.row(), 0).text())
-        with SessionLocal() as db:
-            update_project_field(db, pid, field, it.text())
-
-    def _commit_status(self, row, col, val):
-        field = FIELDS[col - 1]
-        pid = int(self.table.item(row, 0).text())
-        with SessionLocal() as db:
-            update_project_field(db, pid, field, val)
-        if field == "delivered":
-            self._indicator(row, val)
+    def _on_clicked(self, index):
+        if index.column() == DEL_COL:
+            self._delete(self.model.project_id(index.row()))
+        elif index.column() in STATUS_COLS:
+            self.table.edit(index)
 
     def _delete(self, pid):
         if (
@@ -240,6 +351,4 @@ class ManageProjectsWidget(QWidget):
             != QMessageBox.Yes
         ):
             return
-        with SessionLocal() as db:
-            delete_project(db, pid)
-        self.refresh()
+        run(delete_project, pid, on_done=lambda _: self.refresh())
@@ -1,29 +1,18 @@
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from PySide6.QtCore import QEvent, Qt
+from PySide6.QtCore import QEvent, Qt, QTimer
 from PySide6.QtWidgets import QHBoxLayout, QLabel, QVBoxLayout, QWidget
 
-from database import SessionLocal
-from logic import get_projects
+from logic import STAGE_FIELDS, project_stage_summary
+from query_executor import run
 
-STAGES = [
-    "afterone",
-    "cutting",
-    "laser",
-    "bending",
-    "drilling",
-    "welding",
-    "grinding",
-    "coating",
-]
-WAIT_SET = {"-", "Ootel"}
-PROGRESS_VALUE = "Töös"
-DONE_VALUE = "Valmis"
+STAGES = STAGE_FIELDS[:-1]
 
 
 class OverviewWidget(QWidget):
     def __init__(self):
         super().__init__()
+        self._summary = None
+        self._refresh_pending = False
+        self.fig = self.canvas = None
         self._ui()
 
     # --------------------------------------------------------------------- UI
@@ -42,10 +31,9 @@ class OverviewWidget(QWidget):
         self.lbl_progress = self._kpi("Töös", kpi_row)
         self.lbl_waiting = self._kpi("Ootel", kpi_row)
 
-        # Staatusediagramm
-        self.fig = Figure(figsize=(8, 4))
-        self.canvas = FigureCanvas(self.fig)
-        root.addWidget(self.canvas)
+        # Staatusediagramm – matplotlib laetakse esimesel joonistamisel
+        self._chart_layout = QVBoxLayout()
+        root.addLayout(self._chart_layout, 1)
 
         self.refresh()
 
@@ -70,47 +58,51 @@ class OverviewWidget(QWidget):
 
     # ---------------------------------------------------------------- refresh
     def refresh(self):
-        with SessionLocal() as db:
-            projs = get_projects(db)
-
-        total = len(projs)
-        delivered = sum(p.delivered == DONE_VALUE for p in projs)
-        in_progress = 0
-        waiting = 0
-
-        for p in projs:
-            if p.delivered == DONE_VALUE:
-                continue  # delivered overrides other flags
-            stage_values = [getattr(p, s) for s in STAGES]
-            if any(v == PROGRESS_VALUE for v in stage_values):
-                in_progress += 1
-            elif all(v in WAIT_SET for v in stage_values):
-                waiting += 1
-
-        self.lbl_total.setText(str(total))
-        self.lbl_delivered.setText(str(delivered))
-        self.lbl_progress.setText(str(in_progress))
-        self.lbl_waiting.setText(str(waiting))
-
-        self._draw_chart(projs)
+        # showEvent ja show_view kutsuvad mõlemad – üks päring sündmustsükli kohta
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            QTimer.singleShot(0, self._refresh_now)
+
+    def _refresh_now(self):
+        self._refresh_pending = False
+        run(project_stage_summary, on_done=self._show_summary, key=self)
+
+    def _show_summary(self, summary):
+        if summary == self._summary:
+            return  # numbrid samad – joonist pole vaja uuesti teha
+        self._summary = summary
+
+        self.lbl_total.setText(str(summary.total))
+        self.lbl_delivered.setText(str(summary.delivered))
+        self.lbl_progress.setText(str(summary.in_progress))
+        self.lbl_waiting.setText(str(summary.waiting))
+
+        if self.canvas is None:
+            # esimene joonis järgmises tsüklis – aken ja KPI-d jõuavad enne ekraanile
+            QTimer.singleShot(0, lambda: self._draw_chart(self._summary.stages))
+        else:
+            self._draw_chart(summary.stages)
 
     # ----------------------------------------------------------- chart helper
-    def _draw_chart(self, projs):
+    def _ensure_canvas(self):
+        if self.canvas is not None:
+            return
+        # raske import – alles pärast seda, kui aken on juba ekraanil
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=(8, 4))
+        self.canvas = FigureCanvasQTAgg(self.fig)
+        self._chart_layout.addWidget(self.canvas)
+
+    def _draw_chart(self, stages):
+        self._ensure_canvas()
         self.fig.clear()
         ax = self.fig.add_subplot(111)
 
-        stage_done = []
-        stage_progress = []
-        stage_wait = []
-
-        for s in STAGES:
-            vals = []
-            for p in projs:
-                v = DONE_VALUE if p.delivered == DONE_VALUE else getattr(p, s)
-                vals.append(v)
-            stage_done.append(sum(v == DONE_VALUE for v in vals))
-            stage_progress.append(sum(v == PROGRESS_VALUE for v in vals))
-            stage_wait.append(sum(v in WAIT_SET for v in vals))
+        stage_wait = [w for w, _, _ in stages]
+        stage_progress = [pr for _, pr, _ in stages]
+        stage_done = [d for _, _, d in stages]
 
         x = range(len(STAGES))
         ax.bar(x, stage_wait, label="Ootel")
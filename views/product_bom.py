@@ -1,23 +1,32 @@
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import (
     QDialog,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
     QListWidget,
     QListWidgetItem,
+    QMessageBox,
     QPushButton,
     QSpinBox,
     QVBoxLayout,
     QWidget,
 )
 
+from cutlist import BAR_LENGTH
 from database import SessionLocal
 from logic import (
-    add_material_to_product,
+    BomLine,
     get_materials,
     get_product_parts,
-    remove_material_from_product,
+    get_products,
+    replace_product_bom,
+    search_materials,
 )
 
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_LIMIT = 200
+
 
 class ProductBOMDialog(QDialog):
     def __init__(
@@ -25,10 +34,15 @@ class ProductBOMDialog(QDialog):
     ):
         super().__init__(parent)
         self.product_id = product_id
-        self.setWindowTitle(f"BOM – {product_name}")
+        self.product_name = product_name
+        # muudatused kogutakse siia ja salvestatakse korraga:
+        # (material_id, component_id, cut_length) -> [kogus, nimi]
+        self._lines: dict[tuple, list] = {}
+        self._saved: dict[tuple, int] = {}
         self.setMinimumWidth(600)
         self._ui()
-        self._refresh_lists()
+        self._fill_picker()
+        self._load_bom()
 
     # ───────── UI ─────────
     def _ui(self):
@@ -42,7 +56,16 @@ class ProductBOMDialog(QDialog):
         lists.addLayout(left_box)
 
         left_box.addWidget(QLabel("Lao materjalid"))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Otsi: nimi, mõõt, profiil…")
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._fill_picker)
+        self.search_edit.textChanged.connect(self._search_timer.start)
+        left_box.addWidget(self.search_edit)
         self.materials_list = QListWidget()
+        self.materials_list.currentItemChanged.connect(self._limit_cut)
         left_box.addWidget(self.materials_list)
 
         qty_row = QHBoxLayout()
@@ -51,6 +74,12 @@ class ProductBOMDialog(QDialog):
         self.qty_spin = QSpinBox()
         self.qty_spin.setRange(1, 9999)
         qty_row.addWidget(self.qty_spin)
+        # toru puhul lõike pikkus; 0 = terve latt. Ülempiir on valitud
+        # materjali lati pikkus (_limit_cut)
+        qty_row.addWidget(QLabel("Lõige (mm):"))
+        self.cut_spin = QSpinBox()
+        self.cut_spin.setRange(0, BAR_LENGTH)
+        qty_row.addWidget(self.cut_spin)
 
         add_btn = QPushButton("Lisa →")
         add_btn.clicked.connect(self._add_material)
@@ -68,43 +97,128 @@ class ProductBOMDialog(QDialog):
         del_btn.clicked.connect(self._remove_part)
         right_box.addWidget(del_btn)
 
+        buttons = QHBoxLayout()
+        root.addLayout(buttons)
+        buttons.addStretch()
+        self.save_btn = QPushButton("Salvesta")
+        self.save_btn.clicked.connect(self._save)
+        buttons.addWidget(self.save_btn)
         close = QPushButton("Sulge")
         close.clicked.connect(self.accept)
-        root.addWidget(close)
+        buttons.addWidget(close)
 
     # ───────── Data ─────────
-    def _refresh_lists(self):
+    def _fill_picker(self):
+        self._search_timer.stop()
+        term = self.search_edit.text().strip()
+        with SessionLocal() as db:
+            # otsingu korral FTS-indeksist, parimad vasted eespool
+            materials = (
+                search_materials(db, term, SEARCH_LIMIT) if term else get_materials(db)
+            )
+            products = get_products(db)
+        self.materials_list.clear()
+        for m in materials:
+            itm = QListWidgetItem(f"{m.name} (laos {m.stock_qty})")
+            # Qt.UserRole; lati pikkus ilma None'ita
+            itm.setData(0x0100, ("material", m.id, m.name, m.tube_length or BAR_LENGTH))
+            self.materials_list.addItem(itm)
+
+        # teised tooted alamkomplektina
+        for p in products:
+            if p.id == self.product_id or term.lower() not in p.name.lower():
+                continue
+            itm = QListWidgetItem(f"[Toode] {p.name}")
+            itm.setData(0x0100, ("product", p.id, p.name, 0))
+            self.materials_list.addItem(itm)
+
+    def _load_bom(self):
         with SessionLocal() as db:
-            # materials
-            self.materials_list.clear()
-            for m in get_materials(db):
-                itm = QListWidgetItem(f"{m.name} (laos {m.stock_qty})")
-                itm.setData(0x0100, m.id)  # Qt.UserRole
-                self.materials_list.addItem(itm)
-
-            # bom
-            self.bom_list.clear()
-            for pp in get_product_parts(db, self.product_id):
-                itm = QListWidgetItem(f"{pp.material.name}  x {pp.quantity_required}")
-                itm.setData(0x0100, pp.id)
-                self.bom_list.addItem(itm)
+            parts = get_product_parts(db, self.product_id)
+        self._lines = {}
+        for pp in parts:
+            key = (pp.material_id, pp.component_id, pp.cut_length)
+            name = pp.component.name if pp.component_id else pp.material.name
+            line = self._lines.setdefault(key, [0, name])
+            line[0] += pp.quantity_required
+        self._saved = {k: qty for k, (qty, _) in self._lines.items()}
+        self._show_bom()
+
+    def _show_bom(self):
+        # ainult mälus olevast seisust, andmebaasi ei loeta
+        self.bom_list.clear()
+        for key, (qty, name) in self._lines.items():
+            mid, cid, cut = key
+            label = f"[Toode] {name}" if cid else name
+            if cut:
+                label += f" @ {cut} mm"
+            if self._saved.get(key) != qty:
+                label = "● " + label  # salvestamata
+            self.bom_list.addItem(f"{label}  x {qty}")
+        dirty = self.is_dirty()
+        self.save_btn.setEnabled(dirty)
+        self.setWindowTitle(f"BOM – {self.product_name}{' *' if dirty else ''}")
+
+    def is_dirty(self) -> bool:
+        return {k: qty for k, (qty, _) in self._lines.items()} != self._saved
 
     # ───────── Operations ─────────
+    def _limit_cut(self, current, _previous=None):
+        # alamkomplektil lõiget pole; materjali lõige ei ületa latti
+        if current is None:
+            return
+        kind, _, _, bar = current.data(0x0100)
+        self.cut_spin.setEnabled(kind == "material")
+        if kind == "material":
+            self.cut_spin.setMaximum(bar)
+
     def _add_material(self):
         sel = self.materials_list.currentItem()
         if not sel:
             return
-        material_id = sel.data(0x0100)
-        qty = self.qty_spin.value()
-        with SessionLocal() as db:
-            add_material_to_product(db, self.product_id, material_id, qty)
-        self._refresh_lists()
+        kind, item_id, name, _ = sel.data(0x0100)
+        if kind == "product":
+            key = (None, item_id, None)
+        else:
+            key = (item_id, None, self.cut_spin.value() or None)
+        line = self._lines.setdefault(key, [0, name])
+        line[0] += self.qty_spin.value()
+        self._show_bom()
 
     def _remove_part(self):
-        sel = self.bom_list.currentItem()
-        if not sel:
+        row = self.bom_list.currentRow()
+        if row < 0:
             return
-        pp_id = sel.data(0x0100)
+        # loendi read on _lines järjekorras
+        del self._lines[list(self._lines)[row]]
+        self._show_bom()
+
+    def _save(self) -> bool:
+        lines = [
+            BomLine(mid, cid, qty, cut)
+            for (mid, cid, cut), (qty, _) in self._lines.items()
+        ]
         with SessionLocal() as db:
-            remove_material_from_product(db, pp_id)
-        self._refresh_lists()
+            try:
+                replace_product_bom(db, self.product_id, lines)
+            except ValueError as e:
+                QMessageBox.warning(self, "Hoiatus", str(e))
+                return False
+        self._saved = {k: qty for k, (qty, _) in self._lines.items()}
+        self._show_bom()
+        return True
+
+    def done(self, result):
+        # sulgemine (nupp, Esc, akna rist) küsib salvestamata muudatuste järele
+        if self.is_dirty():
+            answer = QMessageBox.question(
+                self,
+                "Salvestamata muudatused",
+                "Salvesta BOM muudatused?",
+                QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel,
+            )
+            if answer == QMessageBox.Cancel:
+                return
+            if answer == QMessageBox.Save and not self._save():
+                return
+        super().done(result)
@@ -15,10 +15,20 @@ from PySide6.QtWidgets import (
 from database import SessionLocal
 from logic import (
     add_history_entry,
-    get_project_parts,
     get_projects,
+    project_stock_check,
     start_project_deduct_inventory,
 )
+from query_executor import run
+
+
+def _start_and_log(db, project_id, multiplier, project_name):
+    start_project_deduct_inventory(db, project_id, multiplier)
+    add_history_entry(
+        db,
+        "Projekt Käivitatud",
+        f"Käivitas projekti: {project_name} x{multiplier}",
+    )
 
 
 class StartProjectWidget(QWidget):
@@ -65,9 +75,18 @@ class StartProjectWidget(QWidget):
         layout.addWidget(details_label)
 
         self.parts_table = QTableWidget()
-        self.parts_table.setColumnCount(5)
+        # saadaval = laos - teistele broneeritud; selle projekti broneering
+        # kuulub sinna hulka
+        self.parts_table.setColumnCount(6)
         self.parts_table.setHorizontalHeaderLabels(
-            ["Materjali ID", "Materjali Nimi", "Vajalik Kogus", "Laos Kogus", "Staatus"]
+            [
+                "Materjali ID",
+                "Materjali Nimi",
+                "Vajalik Kogus",
+                "Saadaval",
+                "Broneeritud",
+                "Staatus",
+            ]
         )
         layout.addWidget(self.parts_table)
         self.parts_table.resizeColumnsToContents()
@@ -108,38 +127,38 @@ class StartProjectWidget(QWidget):
         multiplier = self.project_quantity_spin.value()
 
         with SessionLocal() as db:
-            project_parts = get_project_parts(db, self.current_project_id)
-            self.parts_table.setRowCount(len(project_parts))
+            # samad vajadused ja sama reegel, mida käivitamine kasutab:
+            # torude puhul terved latid lõikeplaanist, üks rida materjali kohta
+            checks = project_stock_check(db, self.current_project_id, multiplier)
+            self.parts_table.setRowCount(len(checks))
             all_available = True
 
-            for i, part in enumerate(project_parts):
-                material = part.material
-                required_qty = part.quantity_required * multiplier
-
+            for i, check in enumerate(checks):
                 # Lahtrite sisu ja lukustamine (mitte muudetavad)
                 def create_item(value):
                     item = QTableWidgetItem(str(value))
                     item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
                     return item
 
-                self.parts_table.setItem(i, 0, create_item(material.id))
-                self.parts_table.setItem(i, 1, create_item(material.name))
-                self.parts_table.setItem(i, 2, create_item(required_qty))
-                self.parts_table.setItem(i, 3, create_item(material.stock_qty))
+                self.parts_table.setItem(i, 0, create_item(check.material_id))
+                self.parts_table.setItem(
+                    i, 1, create_item(check.material_name or "(kustutatud)")
+                )
+                self.parts_table.setItem(i, 2, create_item(check.required))
+                self.parts_table.setItem(i, 3, create_item(check.available))
+                self.parts_table.setItem(i, 4, create_item(check.held))
 
                 # Laos kontroll ja värvimine
-                if material.stock_qty >= required_qty:
+                if not check.shortage:
                     status_item = QTableWidgetItem("Piisav")
                     status_item.setBackground(Qt.green)
                 else:
-                    status_item = QTableWidgetItem(
-                        f"Puudus ({required_qty - material.stock_qty} puudu)"
-                    )
+                    status_item = QTableWidgetItem(f"Puudus ({check.shortage} puudu)")
                     status_item.setBackground(Qt.red)
                     all_available = False
 
                 status_item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-                self.parts_table.setItem(i, 4, status_item)
+                self.parts_table.setItem(i, 5, status_item)
 
             self.parts_table.resizeColumnsToContents()
             self.start_btn.setEnabled(all_available)
@@ -167,28 +186,34 @@ class StartProjectWidget(QWidget):
             QMessageBox.Yes | QMessageBox.No,
         )
 
-        if reply == QMessageBox.Yes:
-            with SessionLocal() as db:
-                try:
-                    for _ in range(multiplier):
-                        start_project_deduct_inventory(db, self.current_project_id)
-
-                    project_name = self.project_combo.currentText().split(" - ")[0]
-                    add_history_entry(
-                        db,
-                        "Projekt Käivitatud",
-                        f"Käivitas projekti: {project_name} x{multiplier}",
-                    )
-
-                    QMessageBox.information(
-                        self,
-                        "Edukas",
-                        f"Projekt '{project_name}' käivitatud {multiplier} kord(a). Laos olev kogus uuendatud.",
-                    )
-                    self.load_project_details()
-                except ValueError as e:
-                    QMessageBox.critical(self, "Viga", str(e))
-                except Exception as e:
-                    QMessageBox.critical(
-                        self, "Viga", f"Projekti käivitamine ebaõnnestus: {str(e)}"
-                    )
+        if reply != QMessageBox.Yes:
+            return
+
+        # laoseisu lukk võib oodata teist kirjutajat – kasutajaliides ei hangu
+        project_name = self.project_combo.currentText().split(" - ")[0]
+        self.start_btn.setEnabled(False)
+        run(
+            _start_and_log,
+            self.current_project_id,
+            multiplier,
+            project_name,
+            on_done=lambda _: self._started(project_name, multiplier),
+            on_error=self._start_failed,
+        )
+
+    def _started(self, project_name, multiplier):
+        QMessageBox.information(
+            self,
+            "Edukas",
+            f"Projekt '{project_name}' käivitatud {multiplier} kord(a). Laos olev kogus uuendatud.",
+        )
+        self.load_project_details()
+
+    def _start_failed(self, e):
+        self.start_btn.setEnabled(True)
+        if isinstance(e, ValueError):
+            QMessageBox.critical(self, "Viga", str(e))
+        else:
+            QMessageBox.critical(
+                self, "Viga", f"Projekti käivitamine ebaõnnestus: {str(e)}"
+            )
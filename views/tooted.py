@@ -1,4 +1,5 @@
 from PySide6.QtWidgets import (
+    QFileDialog,
     QHBoxLayout,
     QLabel,
     QLineEdit,
@@ -12,6 +13,7 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from bulk_import import import_bom
 from database import SessionLocal
 from logic import (
     assign_product_categories,
@@ -19,6 +21,7 @@ from logic import (
     delete_product,
     get_products,
 )
+from query_executor import run
 from views.product_bom import ProductBOMDialog
 
 
@@ -61,6 +64,11 @@ class ProductsWidget(QWidget):
         add_btn.clicked.connect(self._add_product)
         form.addWidget(add_btn)
 
+        # BOM-fail: product; material või component; quantity; cut_length
+        import_btn = QPushButton("Impordi BOM…")
+        import_btn.clicked.connect(self._import_bom)
+        form.addWidget(import_btn)
+
         # tabel
         self.table = QTableWidget()
         self.table.setColumnCount(7)
@@ -71,35 +79,35 @@ class ProductsWidget(QWidget):
 
     # ───────── data ─────────
     def refresh(self):
-        with SessionLocal() as db:
-            products = get_products(db)
-            self.table.setRowCount(len(products))
-            for r, p in enumerate(products):
-                self.table.setItem(r, 0, QTableWidgetItem(str(p.id)))
-                self.table.setItem(r, 1, QTableWidgetItem(p.name))
-                self.table.setItem(
-                    r, 2, QTableWidgetItem(", ".join(c.name for c in p.categories))
-                )
-                self.table.setItem(
-                    r,
-                    3,
-                    QTableWidgetItem(
-                        "" if p.production_time is None else str(p.production_time)
-                    ),
-                )
-                self.table.setItem(r, 4, QTableWidgetItem(p.description or ""))
-
-                bom_btn = QPushButton("BOM")
-                bom_btn.clicked.connect(
-                    lambda _, pid=p.id, pn=p.name: self._open_bom(pid, pn)
-                )
-                self.table.setCellWidget(r, 5, bom_btn)
-
-                del_btn = QPushButton("X")
-                del_btn.clicked.connect(lambda _, pid=p.id: self._delete_product(pid))
-                self.table.setCellWidget(r, 6, del_btn)
-
-            self.table.resizeColumnsToContents()
+        # vahemälu hetktõmmis – muutmata andmete korral päringut ei tehta
+        run(get_products, on_done=self._fill_table, key=self)
+
+    def _fill_table(self, products):
+        self.table.setRowCount(len(products))
+        for r, p in enumerate(products):
+            self.table.setItem(r, 0, QTableWidgetItem(str(p.id)))
+            self.table.setItem(r, 1, QTableWidgetItem(p.name))
+            self.table.setItem(r, 2, QTableWidgetItem(", ".join(p.categories)))
+            self.table.setItem(
+                r,
+                3,
+                QTableWidgetItem(
+                    "" if p.production_time is None else str(p.production_time)
+                ),
+            )
+            self.table.setItem(r, 4, QTableWidgetItem(p.description or ""))
+
+            bom_btn = QPushButton("BOM")
+            bom_btn.clicked.connect(
+                lambda _, pid=p.id, pn=p.name: self._open_bom(pid, pn)
+            )
+            self.table.setCellWidget(r, 5, bom_btn)
+
+            del_btn = QPushButton("X")
+            del_btn.clicked.connect(lambda _, pid=p.id: self._delete_product(pid))
+            self.table.setCellWidget(r, 6, del_btn)
+
+        self.table.resizeColumnsToContents()
 
     # ───────── ops ─────────
     def _add_product(self):
@@ -131,8 +139,29 @@ class ProductsWidget(QWidget):
         self.refresh()
 
     def _delete_product(self, pid: int):
-        with SessionLocal() as db:
-            delete_product(db, pid)
+        run(delete_product, pid, on_done=lambda _: self.refresh())
+
+    def _import_bom(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Impordi BOM", "", "BOM (*.csv *.xlsx)"
+        )
+        if not path:
+            return
+        run(
+            import_bom,
+            path,
+            on_done=self._bom_imported,
+            on_error=lambda e: QMessageBox.critical(self, "Import", str(e)),
+        )
+
+    def _bom_imported(self, result):
+        msg = f"Lisatud {result.inserted}, uuendatud {result.updated} rida."
+        if result.errors:
+            lines = [f"rida {e.line}: {e.message}" for e in result.errors[:20]]
+            msg += f"\n\nVahele jäi {len(result.errors)} rida:\n" + "\n".join(lines)
+            QMessageBox.warning(self, "Import", msg)
+        else:
+            QMessageBox.information(self, "Import", msg)
         self.refresh()
 
     def _open_bom(self, pid: int, pname: str):
@@ -0,0 +1,93 @@
+# write_behind.py
+"""Coalescing write-behind queue for production plan cell edits.
+
+Edits are keyed by (project_id, field); clicking a stage through several
+values in a row leaves one pending write holding the value the cell was
+read with and the last one chosen. Pending writes go to the database in one
+transaction when the flush interval runs out or flush() is called.
+"""
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, Signal
+
+from database import SessionLocal
+from logic import update_project_fields
+from query_executor import executor, run
+
+FLUSH_INTERVAL_MS = 2000
+
+
+class WriteBehindQueue(QObject):
+    # list[FieldConflict] – edits someone else overtook, not written
+    conflicts = Signal(list)
+    # exception of a failed flush; the batch is queued again
+    failed = Signal(object)
+
+    def __init__(self, parent=None, interval_ms: int = FLUSH_INTERVAL_MS):
+        super().__init__(parent)
+        self._edits: dict[tuple[int, str], tuple[object, object]] = {}
+        self._inflight: dict[tuple[int, str], tuple[object, object]] = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def put(self, project_id: int, field: str, expected, value):
+        key = (project_id, field)
+        if key in self._edits:
+            expected = self._edits[key][0]  # the value the first edit saw
+        if value == expected:
+            self._edits.pop(key, None)  # clicked back to where it was
+        else:
+            self._edits[key] = (expected, value)
+        # interval counts from the first unsaved edit, not the last one
+        if self._edits and not self._timer.isActive():
+            self._timer.start()
+
+    def pending(self) -> dict[tuple[int, str], object]:
+        # values not yet committed, for overlaying freshly read rows
+        merged = {k: v for k, (_, v) in self._inflight.items()}
+        merged.update((k, v) for k, (_, v) in self._edits.items())
+        return merged
+
+    def flush(self):
+        self._timer.stop()
+        # one batch at a time, so writes to a cell land in edit order
+        if not self._edits or self._inflight:
+            return
+        self._inflight, self._edits = self._edits, {}
+        batch = [(pid, f, exp, val) for (pid, f), (exp, val) in self._inflight.items()]
+        run(
+            update_project_fields,
+            batch,
+            on_done=self._flushed,
+            on_error=self._flush_failed,
+        )
+
+    def flush_sync(self):
+        # on exit: no event loop left to deliver results, write here and now
+        self._timer.stop()
+        executor().wait()
+        QCoreApplication.processEvents()  # settles the in-flight batch
+        if not self._edits:
+            return
+        batch = [(pid, f, exp, val) for (pid, f), (exp, val) in self._edits.items()]
+        self._edits = {}
+        with SessionLocal() as db:
+            update_project_fields(db, batch)
+
+    def _flushed(self, conflicts):
+        self._inflight = {}
+        if conflicts:
+            self.conflicts.emit(conflicts)
+        if self._edits:
+            self._timer.start()
+
+    def _flush_failed(self, error):
+        # nothing was committed; newer edits to the same cell keep their value
+        for key, (expected, value) in self._inflight.items():
+            if key in self._edits:
+                value = self._edits[key][1]
+            self._edits[key] = (expected, value)
+        self._inflight = {}
+        self._timer.start()
+        self.failed.emit(error)